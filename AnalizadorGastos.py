@@ -6,12 +6,22 @@ from collections import defaultdict
 import warnings
 import json
 import shutil
+import sys
+import pydoc
+import argparse
+import hashlib
+import pickle
 
 warnings.filterwarnings('ignore')
 
+# Las rutas relativas (config/, ruta_csv) se resuelven desde la carpeta del proyecto,
+# no desde el directorio en el que se lanza el programa
+DIRECTORIO_PROYECTO = os.path.dirname(os.path.abspath(__file__))
+
 
 class ConfigManager:
     def __init__(self, config_dir="config"):
+        config_dir = os.path.join(DIRECTORIO_PROYECTO, config_dir)
         self.config_dir = config_dir
         self.crear_directorio_config()
 
@@ -89,7 +99,8 @@ class ConfigManager:
                 "idioma": "es",
                 "tema": "claro",
                 "mostrar_graficos": True,
-                "resumen_automatico": True
+                "resumen_automatico": True,
+                "paginador": False  # Tablas largas con el paginador del sistema ($PAGER o less)
             }
         }
 
@@ -232,13 +243,40 @@ class ConfigManager:
 
 
 class AnalizadorGastos:
-    def __init__(self):
+    # Dimensiones del cubo de agregados sobre el que trabajan los informes
+    DIMENSIONES_CUBO = ['año', 'mes', 'tipo', 'categoria', 'subcategoria', 'nombre_empresa']
+
+    # Columnas de texto repetitivo que se guardan como categóricas y si sus valores se
+    # normalizan a mayúsculas (los nombres de empresa se muestran tal cual)
+    COLUMNAS_CATEGORICAS = {'tipo': True, 'categoria': True, 'subcategoria': True, 'operacion': True,
+                            'nombre_empresa': False}
+
+    # Instantánea del CSV ya preparado. Cambiar la versión si cambia cargar_csv o tipar_columnas
+    VERSION_INSTANTANEA = 1
+
+    def __init__(self, extractos=None):
         # Sistema de configuración
         self.config_manager = ConfigManager()
         self.configs = self.config_manager.cargar_todas_configuraciones()
 
-        self.csv_path = self.configs['usuario']['ruta_csv']
-        self.df = self.cargar_datos()
+        self.csv_path = os.path.join(DIRECTORIO_PROYECTO, self.configs['usuario']['ruta_csv'])
+        # Particiones por año y mes que escribe lector.py. Sin catálogo se usa el CSV plano
+        self.directorio_particiones = os.path.join(os.path.dirname(self.csv_path), 'particiones')
+        self.ruta_instantanea = os.path.join(os.path.dirname(self.csv_path), '.cache', 'instantanea_analisis.pkl')
+        self._firma_datos = self.firma_datos()
+        self.extractos = extractos
+        self._particiones = {}
+        self._cubo = None
+        self._indice_meses = None
+        if extractos:
+            # PDFs leídos en memoria con lector.py, sin CSV ni particiones
+            self.catalogo = None
+            self._df = self.ordenar_por_meses(self.leer_extractos(extractos))
+            self._df_cargado = True
+        else:
+            self.catalogo = self.cargar_catalogo()
+            self._df = None
+            self._df_cargado = False
 
         # ---- INICIO DEL ARREGLO: Mover este bloque HACIA ARRIBA ----
         # Cargar configuraciones específicas ANTES de usarlas
@@ -249,10 +287,15 @@ class AnalizadorGastos:
         # ---- FIN DEL ARREGLO ----
 
         # Ahora este bloque funcionará porque self.preferencias ya existe
-        if self.df is not None and not self.df.empty:
-            ultimo_registro = self.df.sort_values(by=['año', 'mes']).iloc[-1]
-            self.ultimo_mes = int(ultimo_registro['mes'])
-            self.ultimo_año = int(ultimo_registro['año'])
+        meses = self.obtener_meses_disponibles()
+        if meses:
+            self.ultimo_año, self.ultimo_mes = int(meses[-1][0]), int(meses[-1][1])
+            if self.catalogo is not None:
+                # Al arrancar sólo se lee la partición del último mes
+                ultimo_df = self.datos_mes(self.ultimo_año, self.ultimo_mes)
+                if ultimo_df is not None:
+                    print(f"✅ Datos cargados: {len(ultimo_df)} transacciones del último mes "
+                          f"({len(meses)} meses disponibles)")
             print(
                 f"ℹ️  Análisis enfocado en el último mes con datos: {self.nombre_mes(self.ultimo_mes)} {self.ultimo_año}")
         else:
@@ -261,14 +304,329 @@ class AnalizadorGastos:
 
         self.alertas_activas = []
 
+    @property
+    def df(self):
+        """Todo el histórico. Con catálogo de particiones se lee la primera vez que un menú lo necesita,
+        sin mensajes: saldrían en medio del informe que lo ha pedido."""
+        if not self._df_cargado:
+            self._df_cargado = True
+            if self.catalogo is not None:
+                self._df = self.ordenar_por_meses(self.cargar_todas_particiones(silencioso=True))
+            else:
+                self._df = self.cargar_datos()
+        return self._df
+
+    def ordenar_por_meses(self, df):
+        """Ordena el histórico por año, mes, fecha e índice original e indexa dónde empieza cada mes.
+
+        Con las filas de cada mes contiguas, datos_mes devuelve una vista por
+        posición (iloc) en lugar de recorrer la tabla entera con una máscara,
+        y la vista ya viene ordenada por fecha.
+        """
+        self._indice_meses = {}
+        if df is None:
+            return None
+
+        df = df.sort_values(['año', 'mes', 'fecha_operacion', 'index'], kind='stable', ignore_index=True)
+        claves = df[['año', 'mes']].to_numpy(dtype=float)
+        cambios = np.flatnonzero((claves[1:] != claves[:-1]).any(axis=1)) + 1
+        inicios = np.concatenate(([0], cambios))
+        fines = np.concatenate((cambios, [len(df)]))
+        for inicio, fin in zip(inicios, fines):
+            if fin == inicio:
+                continue
+            año, mes = claves[inicio]
+            # Las filas sin año o mes quedan al final y no forman parte de ningún mes
+            if not (np.isnan(año) or np.isnan(mes)):
+                self._indice_meses[(int(año), int(mes))] = (int(inicio), int(fin))
+        return df
+
+    @property
+    def cubo(self):
+        """Agregados de todo el histórico, calculados la primera vez que un informe los necesita.
+
+        Cada fila es una combinación de DIMENSIONES_CUBO con la suma, el número,
+        el mínimo y el máximo de sus importes, y 'primera', el índice original
+        de su primera operación. Son unos cientos de filas frente a miles de
+        operaciones, así que los informes agregan sobre el cubo en vez de
+        volver a recorrer self.df.
+        """
+        if self._cubo is None and self.df is not None:
+            self._cubo = self.df.groupby(self.DIMENSIONES_CUBO, dropna=False, observed=True).agg(
+                total=('importe', 'sum'),
+                transacciones=('importe', 'count'),
+                minimo=('importe', 'min'),
+                maximo=('importe', 'max'),
+                primera=('index', 'min')
+            ).reset_index()
+        return self._cubo
+
+    def filtrar_cubo(self, tipo=None, año=None, mes=None):
+        """Filas del cubo de un tipo ('GASTO' o 'INGRESO') y/o de un mes concreto"""
+        cubo = self.cubo
+        if tipo is not None:
+            cubo = cubo[cubo['tipo'] == tipo]
+        if año is not None:
+            cubo = cubo[(cubo['año'] == año) & (cubo['mes'] == mes)]
+        return cubo
+
+    def empresas_mas_frecuentes(self, tipo, limite=15):
+        """Empresas con más transacciones de un tipo, como haría value_counts().head(limite).
+
+        A igualdad de transacciones quedan en el orden en que aparecieron por primera vez.
+        """
+        cubo = self.filtrar_cubo(tipo)
+        cubo = cubo[cubo['nombre_empresa'].notna() & (cubo['nombre_empresa'] != '')]
+        empresas = cubo.groupby('nombre_empresa', observed=True).agg(
+            transacciones=('transacciones', 'sum'), primera=('primera', 'min'))
+        empresas = empresas.sort_values('primera').sort_values('transacciones', ascending=False, kind='stable')
+        return empresas['transacciones'].head(limite)
+
+    def firma_datos(self):
+        """Fechas de modificación del CSV y del catálogo, para notar que lector.py ha actualizado los datos"""
+        firma = []
+        for ruta in (self.csv_path, os.path.join(self.directorio_particiones, 'catalogo.json')):
+            try:
+                firma.append(os.stat(ruta).st_mtime_ns)
+            except OSError:
+                firma.append(None)
+        return tuple(firma)
+
+    def recargar_si_cambia(self):
+        """Vuelve a leer los datos si lector.py (p. ej. con --vigilar) los ha actualizado.
+
+        lector.py sustituye el CSV, las particiones y el catálogo de forma
+        atómica, así que basta con olvidar lo cargado y volver a empezar.
+        Devuelve True si ha habido recarga.
+        """
+        firma = self.firma_datos()
+        if self.extractos or firma == self._firma_datos:
+            return False
+
+        self._firma_datos = firma
+        print("🔄 Hay datos nuevos, recargando")
+        self.catalogo = self.cargar_catalogo()
+        self._df = None
+        self._df_cargado = False
+        self._particiones = {}
+        self._cubo = None
+        self._indice_meses = None
+        meses = self.obtener_meses_disponibles()
+        if meses:
+            self.ultimo_año, self.ultimo_mes = int(meses[-1][0]), int(meses[-1][1])
+        return True
+
+    def leer_extractos(self, rutas):
+        """Lee extractos PDF (o carpetas con PDFs) con la API de lector.py, sin pasar por el CSV.
+
+        lector.leer_extractos ya devuelve las columnas con sus tipos; sólo se
+        añade la columna 'index' que usa el resto del análisis para desempatar.
+        """
+        directorio_lector = os.path.join(DIRECTORIO_PROYECTO, 'Archivos PDF')
+        if directorio_lector not in sys.path:
+            sys.path.insert(0, directorio_lector)
+        try:
+            import lector
+            df = lector.leer_extractos(rutas)
+        except Exception as e:
+            print(f"❌ Error leyendo los extractos: {e}")
+            return None
+
+        df.insert(0, 'index', range(len(df)))
+        df = self.tipar_columnas(df)
+        print(f"✅ Datos cargados: {len(df)} transacciones de los extractos")
+        return df
+
     def cargar_datos(self):
-        """Carga y limpia el CSV con los datos de gastos."""
-        if not os.path.exists(self.csv_path):
-            print(f"❌ Error: No se encuentra el archivo {self.csv_path}")
+        """Carga el CSV plano con todo el histórico, ordenado e indexado por meses.
+
+        Si el CSV no ha cambiado desde la última vez se usa la instantánea y no
+        se vuelve a leer ni a preparar nada.
+        """
+        instantanea = self.leer_instantanea(self.csv_path)
+        if instantanea is not None:
+            self._indice_meses = instantanea['indice_meses']
+            df = instantanea['df']
+            print(f"✅ Datos cargados: {len(df)} transacciones (instantánea)")
+            return df
+
+        df = self.ordenar_por_meses(self.cargar_csv(self.csv_path, informe_memoria=True))
+        if df is not None:
+            print(f"✅ Datos cargados: {len(df)} transacciones")
+            self.guardar_instantanea(self.csv_path, df, self._indice_meses)
+        return df
+
+    @staticmethod
+    def calcular_hash_archivo(ruta):
+        """SHA-256 del contenido de un archivo"""
+        sha = hashlib.sha256()
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                sha.update(bloque)
+        return sha.hexdigest()
+
+    def clave_instantanea(self, ruta_csv, con_hash=True):
+        """Identifica el CSV del que sale una instantánea: ruta, tamaño, fecha de modificación y hash"""
+        estado = os.stat(ruta_csv)
+        return {
+            'version': self.VERSION_INSTANTANEA,
+            'pandas': pd.__version__,
+            'ruta': os.path.abspath(ruta_csv),
+            'tamaño': estado.st_size,
+            'mtime': estado.st_mtime_ns,
+            'hash': self.calcular_hash_archivo(ruta_csv) if con_hash else None
+        }
+
+    def leer_instantanea(self, ruta_csv):
+        """Devuelve {'df', 'indice_meses'} de la instantánea si sigue valiendo para ruta_csv, o None.
+
+        El archivo guarda primero la clave y luego los datos, así que una
+        instantánea caducada se descarta sin cargar el DataFrame. Si sólo ha
+        cambiado la fecha de modificación (p. ej. lector.py ha reescrito el CSV
+        con el mismo contenido) se compara el hash y se sigue usando.
+        """
+        try:
+            actual = self.clave_instantanea(ruta_csv, con_hash=False)
+            with open(self.ruta_instantanea, 'rb') as f:
+                clave = pickle.load(f)
+                fijos = ('version', 'pandas', 'ruta', 'tamaño')
+                if any(clave.get(campo) != actual[campo] for campo in fijos):
+                    return None
+                tocado = clave['mtime'] != actual['mtime']
+                if tocado and clave['hash'] != self.calcular_hash_archivo(ruta_csv):
+                    return None
+                instantanea = pickle.load(f)
+        except Exception:
+            # Sin instantánea, o ilegible: se vuelve a preparar desde el CSV
+            return None
+
+        if tocado:
+            self.guardar_instantanea(ruta_csv, instantanea['df'], instantanea['indice_meses'])
+        return instantanea
+
+    def guardar_instantanea(self, ruta_csv, df, indice_meses):
+        """Guarda el DataFrame ya preparado y su índice de meses para el próximo arranque"""
+        try:
+            clave = self.clave_instantanea(ruta_csv)
+            os.makedirs(os.path.dirname(self.ruta_instantanea), exist_ok=True)
+            ruta_temporal = f"{self.ruta_instantanea}.tmp"
+            with open(ruta_temporal, 'wb') as f:
+                pickle.dump(clave, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump({'df': df, 'indice_meses': indice_meses}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(ruta_temporal, self.ruta_instantanea)
+        except Exception as e:
+            print(f"⚠️  No se pudo guardar la instantánea de los datos: {e}")
+
+    def cargar_catalogo(self):
+        """Lee el catálogo de particiones de lector.py.
+
+        Devuelve None (y se usa el CSV plano) si no hay catálogo, si está vacío,
+        si el CSV es más reciente (se ha editado a mano) o si hay particiones
+        Feather y no está instalado pyarrow.
+        """
+        ruta_catalogo = os.path.join(self.directorio_particiones, 'catalogo.json')
+        if not os.path.exists(ruta_catalogo):
+            return None
+        if os.path.exists(self.csv_path) and os.path.getmtime(self.csv_path) > os.path.getmtime(ruta_catalogo):
+            return None
+
+        try:
+            with open(ruta_catalogo, 'r', encoding='utf-8') as f:
+                catalogo = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  No se pudo leer {ruta_catalogo}, se usa el CSV: {e}")
+            return None
+
+        if not catalogo.get('particiones'):
+            return None
+        if any(p['archivo'].endswith('.feather') for p in catalogo['particiones']):
+            try:
+                import pyarrow.feather  # noqa: F401
+            except ImportError:
+                return None
+        return catalogo
+
+    def entrada_catalogo(self, año, mes):
+        """Entrada del catálogo para un año y mes, o None"""
+        for entrada in self.catalogo['particiones']:
+            if entrada['año'] == año and entrada['mes'] == mes:
+                return entrada
+        return None
+
+    def particion(self, entrada):
+        """Devuelve la partición de una entrada del catálogo, leyéndola sólo la primera vez"""
+        clave = (entrada['año'], entrada['mes'])
+        if clave not in self._particiones:
+            self._particiones[clave] = self.cargar_particion(entrada)
+        return self._particiones[clave]
+
+    def cargar_particion(self, entrada):
+        """Lee una partición: Feather con memory_map o CSV con la limpieza de cargar_csv.
+
+        La columna posicion (fila en el CSV completo) pasa a ser 'index', el
+        índice original que se usa para desempatar.
+        """
+        ruta = os.path.join(self.directorio_particiones, entrada['archivo'])
+        if ruta.endswith('.feather'):
+            # Los tipos y las categorías ya vienen en el archivo, no hace falta limpiar nada
+            try:
+                import pyarrow.feather as feather
+                df = feather.read_table(ruta, memory_map=True).to_pandas(split_blocks=True)
+            except Exception as e:
+                print(f"❌ Error cargando {ruta}: {e}")
+                return None
+            df = self.tipar_columnas(df)
+        else:
+            df = self.cargar_csv(ruta)
+            if df is None:
+                return None
+            df = df.drop(columns='index')
+
+        df.insert(0, 'index', df.pop('posicion'))
+        # Mismo orden que las vistas de datos_mes una vez cargado todo el histórico
+        return df.sort_values(['fecha_operacion', 'index'], kind='stable', ignore_index=True)
+
+    def cargar_todas_particiones(self, silencioso=False):
+        """Une todas las particiones del catálogo en un único DataFrame, en el orden del CSV completo.
+
+        Con silencioso no se muestra cuántas transacciones se han cargado.
+        """
+        partes = [self.particion(entrada) for entrada in self.catalogo['particiones']]
+        partes = [parte for parte in partes if parte is not None]
+        if not partes:
+            return None
+
+        # Las particiones van en el orden del catálogo, ya ordenadas por fecha
+        df = pd.concat(partes, ignore_index=True)
+        # concat pierde las categorías cuando cada mes tiene su propio diccionario
+        for columna in partes[0].select_dtypes('category').columns:
+            df[columna] = df[columna].astype('category')
+        if not silencioso:
+            print(f"✅ Datos cargados: {len(df)} transacciones de {len(partes)} meses")
+        return df
+
+    def datos_mes(self, año, mes):
+        """Operaciones de un mes ordenadas por fecha. Con catálogo sólo se lee la partición de ese mes."""
+        if self.catalogo is not None and not self._df_cargado:
+            entrada = self.entrada_catalogo(año, mes)
+            if entrada is not None:
+                df = self.particion(entrada)
+                if df is not None:
+                    return df
+
+        if self.df is None:
+            return None
+        inicio, fin = self._indice_meses.get((año, mes), (0, 0))
+        return self.df.iloc[inicio:fin]
+
+    def cargar_csv(self, ruta_csv, informe_memoria=False):
+        """Carga y limpia un CSV con los datos de gastos."""
+        if not os.path.exists(ruta_csv):
+            print(f"❌ Error: No se encuentra el archivo {ruta_csv}")
             return None
 
         try:
-            df = pd.read_csv(self.csv_path, encoding='utf-8-sig')
+            df = pd.read_csv(ruta_csv, encoding='utf-8-sig')
 
             # ---- INICIO DEL ARREGLO: Renombrar columnas antiguas si existen ----
             columnas_a_renombrar = {
@@ -281,11 +639,10 @@ class AnalizadorGastos:
             # ---- FIN DEL ARREGLO ----
 
             # --- MEJORAS EN LIMPIEZA DE DATOS ---
-            # 1. Convertir a datetime real
-            df['fecha_operacion'] = pd.to_datetime(df['fecha_operacion'], format='%d/%m')
+            # 1. La fecha completa se calcula en tipar_columnas, que necesita el mes como número
 
             # 2. Convertir mes de texto a número si es necesario
-            if 'mes' in df.columns and df['mes'].dtype == 'object':
+            if 'mes' in df.columns and not pd.api.types.is_numeric_dtype(df['mes']):
                 meses_dict = {
                     'ENERO': 1, 'FEBRERO': 2, 'MARZO': 3, 'ABRIL': 4, 'MAYO': 5, 'JUNIO': 6,
                     'JULIO': 7, 'AGOSTO': 8, 'SEPTIEMBRE': 9, 'OCTUBRE': 10, 'NOVIEMBRE': 11, 'DICIEMBRE': 12
@@ -300,29 +657,73 @@ class AnalizadorGastos:
             df.reset_index(inplace=True)
             # ----------------------------------------------------------------
 
-            print(f"✅ Datos cargados: {len(df)} transacciones")
+            # 4. Tipos compactos: categóricas, enteros pequeños y fecha completa
+            memoria_antes = df.memory_usage(deep=True).sum()
+            df = self.tipar_columnas(df)
+            if informe_memoria:
+                memoria_despues = df.memory_usage(deep=True).sum()
+                print(f"💾 Memoria de los datos: {memoria_antes / 1024 ** 2:.2f} MB → "
+                      f"{memoria_despues / 1024 ** 2:.2f} MB "
+                      f"(ahorro {(1 - memoria_despues / memoria_antes) * 100:.0f}%)")
+
             return df
 
         except Exception as e:
             print(f"❌ Error cargando CSV: {e}")
             return None
 
+    def tipar_columnas(self, df):
+        """Aplica el esquema de tipos del análisis a un DataFrame de operaciones.
+
+        - año y mes pasan a int16 e int8 (si no falta ninguno).
+        - fecha_operacion pasa a ser la fecha completa: el día y mes de la
+          operación con el año del extracto. Un movimiento de diciembre que sale
+          en el extracto de enero es del año anterior.
+        - Las COLUMNAS_CATEGORICAS pasan a categóricas, normalizando a mayúsculas
+          sólo las categorías (no toda la columna). Así los filtros por igualdad
+          y los groupby trabajan sobre los códigos enteros.
+        """
+        if df['año'].notna().all():
+            df['año'] = df['año'].astype('int16')
+        if df['mes'].notna().all():
+            df['mes'] = df['mes'].astype('int8')
+
+        fecha = df['fecha_operacion']
+        if pd.api.types.is_datetime64_any_dtype(fecha):
+            dia, mes_operacion = fecha.dt.day, fecha.dt.month
+        else:
+            partes = fecha.astype(str).str.split('/', n=1, expand=True)
+            dia = pd.to_numeric(partes[0], errors='coerce')
+            mes_operacion = pd.to_numeric(partes[1], errors='coerce') if 1 in partes else np.nan
+        año_operacion = df['año'] - (mes_operacion > df['mes'])
+        df['fecha_operacion'] = pd.to_datetime(
+            pd.DataFrame({'year': año_operacion, 'month': mes_operacion, 'day': dia}), errors='coerce')
+
+        for columna, mayusculas in self.COLUMNAS_CATEGORICAS.items():
+            valores = df[columna]
+            if not isinstance(valores.dtype, pd.CategoricalDtype):
+                valores = valores.astype('category')
+            if mayusculas:
+                # Dos categorías que sólo difieren en mayúsculas se funden en una
+                categorias = valores.cat.categories.astype(str).str.upper()
+                unicas = pd.Index(categorias.unique())
+                recodificar = np.append(unicas.get_indexer(categorias), -1)
+                valores = pd.Categorical.from_codes(recodificar[valores.cat.codes.to_numpy()], categories=unicas)
+            df[columna] = valores
+        return df
+
     def obtener_resumen_ultimo_mes(self):
         """Calcula el resumen financiero del mes actual."""
-        if self.df is None: return None
-
-        mes_actual_df = self.df[
-            (self.df['año'] == self.ultimo_año) &
-            (self.df['mes'] == self.ultimo_mes)
-            ]
+        mes_actual_df = self.datos_mes(self.ultimo_año, self.ultimo_mes)
+        if mes_actual_df is None: return None
 
         total_ingresos = mes_actual_df[mes_actual_df['tipo'] == 'INGRESO']['importe'].sum()
         total_gastos = mes_actual_df[mes_actual_df['tipo'] == 'GASTO']['importe'].sum()
         balance = total_ingresos - total_gastos
 
-        # MEJORA: Obtener el saldo de forma segura ordenando por fecha e índice original
+        # MEJORA: Obtener el saldo de forma segura. datos_mes ya ordena por fecha e índice original
         if not mes_actual_df.empty:
-            saldo_actual = mes_actual_df.sort_values(by=['fecha_operacion', 'index']).iloc[-1]['saldo']
+            saldo_actual = mes_actual_df.iloc[-1]['saldo']
         else:
             # Si el último mes no tiene datos (improbable), busca el último saldo detodo el historial
             saldo_actual = self.df.sort_values(by=['fecha_operacion', 'index']).iloc[-1][
@@ -357,8 +758,10 @@ class AnalizadorGastos:
         NUEVA FUNCIÓN: Muestra el progreso visual de las metas de gasto para el último mes.
         """
         # Filtrar los datos para obtener solo los del último mes analizado
-        df_mes = self.df[(self.df['año'] == self.ultimo_año) & (self.df['mes'] == self.ultimo_mes)]
+        df_mes = self.datos_mes(self.ultimo_año, self.ultimo_mes)
         gastos_mes = df_mes[df_mes['tipo'] == 'GASTO']
+        # Las categorías ya están en mayúsculas: un único groupby sobre los códigos para todas las metas
+        gasto_por_categoria = gastos_mes.groupby('categoria', observed=True)['importe'].sum()
 
         print(f"\n🎯 SEGUIMIENTO DE METAS - {self.nombre_mes(self.ultimo_mes).upper()} {self.ultimo_año}")
         print("-" * 70)
@@ -374,7 +777,7 @@ class AnalizadorGastos:
                 categoria = meta.replace("limite_", "").upper()
 
                 # Calcular el gasto actual para esa categoría en el mes
-                gasto_actual = gastos_mes[gastos_mes['categoria'].str.upper() == categoria]['importe'].sum()
+                gasto_actual = gasto_por_categoria.get(categoria, 0)
 
                 # Calcular el porcentaje y la barra de progreso
                 porcentaje = (gasto_actual / limite) * 100 if limite > 0 else 0
@@ -402,12 +805,15 @@ class AnalizadorGastos:
 
     def obtener_meses_disponibles(self):
         """Obtiene lista de meses/años disponibles ordenados"""
+        # Con catálogo los meses salen de él, sin leer ninguna partición
+        if self.catalogo is not None:
+            return [(entrada['año'], entrada['mes']) for entrada in self.catalogo['particiones']]
+
         if self.df is None:
             return []
 
-        # CORREGIDO: Usar columnas en minúsculas
-        meses = self.df[['año', 'mes']].drop_duplicates().sort_values(['año', 'mes'])
-        return [(row['año'], row['mes']) for _, row in meses.iterrows()]
+        # El índice de meses ya está en orden de año y mes
+        return list(self._indice_meses)
 
     def nombre_mes(self, numero_mes):
         """Devuelve el nombre del mes desde la configuración."""
@@ -444,9 +850,8 @@ class AnalizadorGastos:
         # Agrupar por año y mes para sumar los importes
         totales_por_mes = filtro_df.groupby(['año', 'mes'])['importe'].sum()
 
-        # Obtener la lista de meses únicos de los datos ya filtrados
-        meses_disponibles = filtro_df[['año', 'mes']].drop_duplicates().sort_values(['año', 'mes'])
-        meses = [(row['año'], row['mes']) for _, row in meses_disponibles.iterrows()]
+        # Los meses de los datos ya filtrados son los del agrupado, que groupby ya ordena
+        meses = list(totales_por_mes.index)
 
         print(f"\n{titulo}")
         print("0. ↩️  Volver al menú anterior")
@@ -459,49 +864,88 @@ class AnalizadorGastos:
 
         return meses
 
+    # ---- Tablas de transacciones ----
+    # Cada columna se formatea entera con operaciones de pandas y la tabla se
+    # escribe de una vez, en lugar de un print por fila con iterrows().
+
+    @staticmethod
+    def columna_texto(valores, ancho, corte=None):
+        """Columna de texto de 'ancho' caracteres. Lo que no cabe se recorta con '..' al final,
+        o a 'corte' caracteres sin marca si se indica."""
+        # Los vacíos se muestran como 'nan', igual que str() con cualquier versión de pandas
+        texto = valores.astype(object).fillna('nan').astype(str)
+        if corte is not None:
+            texto = texto.str[:corte]
+        else:
+            texto = texto.where(texto.str.len() <= ancho, texto.str[:ancho - 2] + '..')
+        return texto.str.ljust(ancho)
+
+    @classmethod
+    def columna_descripcion(cls, df, ancho):
+        """Concepto de la operación o, si no tiene (p. ej. fuera de los Bizums), la operación"""
+        concepto = df['concepto'].astype(object)
+        usar_concepto = concepto.notna() & (concepto != '')
+        return cls.columna_texto(concepto.where(usar_concepto, df['operacion'].astype(object)), ancho)
+
+    @staticmethod
+    def columna_fecha(df, ancho=10):
+        return df['fecha_operacion'].dt.strftime('%d/%m').fillna('').str.ljust(ancho)
+
+    @staticmethod
+    def columna_importe(df, signo, ancho=10):
+        """Importes con su signo ('+', '-' o un array por fila) alineados a la derecha"""
+        importes = pd.Series(np.char.mod('%7.2f', df['importe'].to_numpy(dtype=float)), index=df.index)
+        return (signo + importes + '€').str.rjust(ancho)
+
+    @staticmethod
+    def filas_tabla(*columnas):
+        """Une columnas ya formateadas en líneas separadas por un espacio"""
+        lineas = columnas[0]
+        for columna in columnas[1:]:
+            lineas = lineas + ' ' + columna
+        return lineas.tolist()
+
+    def escribir(self, lineas):
+        """Escribe un bloque de líneas en una sola escritura.
+
+        Con la preferencia 'paginador' activa y más líneas de las que caben en
+        la terminal, el bloque se muestra con el paginador del sistema.
+        """
+        texto = '\n'.join(lineas) + '\n'
+        if self.preferencias.get('paginador', False) and sys.stdout.isatty():
+            if texto.count('\n') > shutil.get_terminal_size().lines - 2:
+                pydoc.pager(texto)
+                return
+        sys.stdout.write(texto)
+        sys.stdout.flush()
+
     def mostrar_transacciones_mes(self, año, mes):
         """Muestra transacciones de un mes específico - ACTUALIZADO"""
-        if self.df is None:
+        # datos_mes ya devuelve el mes ordenado por fecha
+        transacciones_mes = self.datos_mes(año, mes)
+        if transacciones_mes is None:
             return
 
-        transacciones_mes = self.df[
-            (self.df['año'] == año) &
-            (self.df['mes'] == mes)
-            ].sort_values('fecha_operacion')
-
-        print(f"\n📄 TRANSACCIONES - {self.nombre_mes(mes)} {año}")
-        print("=" * 120)
-        print(f"{'Fecha':10} {'Operación':15} {'Concepto':25} {'Empresa':20} {'Importe':>10} {'Categoría':15}")
-        print("-" * 120)
-
-        for _, trans in transacciones_mes.iterrows():
-            # Para Bizums, mostrar concepto; para otros, mostrar operación
-            if pd.notna(trans.get('concepto')) and trans['concepto'] != '':
-                descripcion = trans['concepto'][:23] + '..' if len(trans['concepto']) > 25 else trans['concepto']
-            else:
-                descripcion = trans['operacion'][:23] + '..' if len(trans['operacion']) > 25 else trans['operacion']
-
-            empresa = str(trans['nombre_empresa'])[:18] + '..' if len(str(trans['nombre_empresa'])) > 20 else str(
-                trans['nombre_empresa'])
-
-            # Formatear importe según tipo
-            if trans['tipo'] == 'INGRESO':
-                importe_str = f"+{trans['importe']:>7.2f}€"
-            else:
-                importe_str = f"-{trans['importe']:>7.2f}€"
-
-            categoria = trans['categoria'][:13] + '..' if len(trans['categoria']) > 15 else trans['categoria']
-
-            print(
-                f"{trans['fecha_operacion']:10} {trans['operacion'][:13]:15} {descripcion:25} {empresa:20} {importe_str:>10} {categoria:15}")
-
         # Resumen del mes (actualizado)
         ingresos = transacciones_mes[transacciones_mes['tipo'] == 'INGRESO']['importe'].sum()
         gastos = transacciones_mes[transacciones_mes['tipo'] == 'GASTO']['importe'].sum()
-
-        print("-" * 120)
-        print(
-            f"{'RESUMEN:':76} Ingresos: {ingresos:>8.2f}€ | Gastos: {gastos:>8.2f}€ | Balance: {(ingresos - gastos):>8.2f}€")
+        signos = np.where(transacciones_mes['tipo'] == 'INGRESO', '+', '-')
+
+        self.escribir([
+            f"\n📄 TRANSACCIONES - {self.nombre_mes(mes)} {año}",
+            "=" * 120,
+            f"{'Fecha':10} {'Operación':15} {'Concepto':25} {'Empresa':20} {'Importe':>10} {'Categoría':15}",
+            "-" * 120,
+            *self.filas_tabla(
+                self.columna_fecha(transacciones_mes),
+                self.columna_texto(transacciones_mes['operacion'], 15, corte=13),
+                self.columna_descripcion(transacciones_mes, 25),
+                self.columna_texto(transacciones_mes['nombre_empresa'], 20),
+                self.columna_importe(transacciones_mes, signos),
+                self.columna_texto(transacciones_mes['categoria'], 15)),
+            "-" * 120,
+            f"{'RESUMEN:':76} Ingresos: {ingresos:>8.2f}€ | Gastos: {gastos:>8.2f}€ | Balance: {(ingresos - gastos):>8.2f}€"
+        ])
 
     def opcion_transacciones(self):
         """Maneja la opción de mostrar transacciones"""
@@ -557,10 +1001,7 @@ class AnalizadorGastos:
         if self.df is None:
             return
 
-        # CAMBIO: Usar columna 'tipo' en lugar del signo de Importe
-        categorias_ingresos = self.df[
-            self.df['tipo'] == 'INGRESO'
-            ]['categoria'].unique()  # CAMBIO: 'Categoria_Principal' → 'categoria'
+        categorias_ingresos = self.filtrar_cubo('INGRESO')['categoria'].unique()
 
         print("\n💵 CATEGORÍAS DE INGRESOS")
         print("0. ↩️  Volver al menú anterior")
@@ -587,10 +1028,7 @@ class AnalizadorGastos:
         if self.df is None:
             return
 
-        # CAMBIO: Usar columna 'tipo' en lugar del signo de Importe
-        categorias_gastos = self.df[
-            self.df['tipo'] == 'GASTO'
-            ]['categoria'].unique()  # CAMBIO: 'Categoria_Principal' → 'categoria'
+        categorias_gastos = self.filtrar_cubo('GASTO')['categoria'].unique()
 
         print("\n💸 CATEGORÍAS DE GASTOS")
         print("0. ↩️  Volver al menú anterior")
@@ -651,40 +1089,26 @@ class AnalizadorGastos:
 
     def mostrar_ingresos_categoria_mes(self, filtro, año, mes, categoria):
         """Muestra ingresos de categoría por mes específico - ACTUALIZADO"""
-        # CAMBIO: Usar nombres de columnas actualizados
+        # filtro sale de self.df, que ya está ordenado por año, mes y fecha
         ingresos_mes = filtro[
             (filtro['año'] == año) &  # CAMBIO: 'Año' → 'año'
             (filtro['mes'] == mes)  # CAMBIO: 'Mes' → 'mes'
-            ].sort_values('fecha_operacion')  # CAMBIO: 'Fecha_Operacion' → 'fecha_operacion'
-
-        print(f"\n💵 {categoria} - {self.nombre_mes(mes)} {año}")
-        print("=" * 100)
-        print(f"{'Fecha':10} {'Concepto':40} {'Empresa':25} {'Importe':>10} {'Subcategoría':15}")
-        print("-" * 100)
-
-        total_ingresos = 0
-
-        for _, ingreso in ingresos_mes.iterrows():
-            # Para Bizums mostrar concepto, para otros mostrar operación
-            if pd.notna(ingreso.get('concepto')) and ingreso['concepto'] != '':
-                descripcion = ingreso['concepto'][:38] + '..' if len(ingreso['concepto']) > 40 else ingreso['concepto']
-            else:
-                descripcion = ingreso['operacion'][:38] + '..' if len(ingreso['operacion']) > 40 else ingreso[
-                    'operacion']
-
-            empresa = str(ingreso['nombre_empresa'])[:23] + '..' if len(str(ingreso['nombre_empresa'])) > 25 else str(
-                ingreso['nombre_empresa'])
-
-            # Importe siempre positivo para ingresos
-            importe_str = f"+{ingreso['importe']:>7.2f}€"
-
-            subcat = str(ingreso['subcategoria'])[:13] + '..' if len(str(ingreso['subcategoria'])) > 15 else str(ingreso['subcategoria'])
-
-            print(f"{ingreso['fecha_operacion']:10} {descripcion:40} {empresa:25} {importe_str:>10} {subcat:15}")
-            total_ingresos += ingreso['importe']  # CAMBIO: 'Importe' → 'importe'
+            ]
 
-        print("-" * 100)
-        print(f"{'TOTAL INGRESOS:':76} {total_ingresos:>8.2f}€")
+        self.escribir([
+            f"\n💵 {categoria} - {self.nombre_mes(mes)} {año}",
+            "=" * 100,
+            f"{'Fecha':10} {'Concepto':40} {'Empresa':25} {'Importe':>10} {'Subcategoría':15}",
+            "-" * 100,
+            *self.filas_tabla(
+                self.columna_fecha(ingresos_mes),
+                self.columna_descripcion(ingresos_mes, 40),
+                self.columna_texto(ingresos_mes['nombre_empresa'], 25),
+                self.columna_importe(ingresos_mes, '+'),  # Importe siempre positivo para ingresos
+                self.columna_texto(ingresos_mes['subcategoria'], 15)),
+            "-" * 100,
+            f"{'TOTAL INGRESOS:':76} {ingresos_mes['importe'].sum():>8.2f}€"
+        ])
 
     def mostrar_gastos_categoria(self, categoria, subcategoria=None):
         """Muestra gastos por categoría - ACTUALIZADO"""
@@ -730,58 +1154,45 @@ class AnalizadorGastos:
 
     def mostrar_gastos_categoria_mes(self, filtro, año, mes, categoria, subcategoria=None):
         """Muestra gastos de categoría por mes específico - ACTUALIZADO"""
-        # CAMBIO: Usar nombres de columnas actualizados
+        # filtro sale de self.df, que ya está ordenado por año, mes y fecha
         gastos_mes = filtro[
             (filtro['año'] == año) &  # CAMBIO: 'Año' → 'año'
             (filtro['mes'] == mes)  # CAMBIO: 'Mes' → 'mes'
-            ].sort_values('fecha_operacion')  # CAMBIO: 'Fecha_Operacion' → 'fecha_operacion'
+            ]
 
         if subcategoria:
             titulo = f"{categoria} > {subcategoria} - {self.nombre_mes(mes)} {año}"
         else:
             titulo = f"{categoria} - {self.nombre_mes(mes)} {año}"
 
-        print(f"\n📊 {titulo}")
-        print("=" * 100)
-        print(f"{'Fecha':10} {'Concepto':40} {'Empresa':25} {'Importe':>10} {'Subcategoría':15}")
-        print("-" * 100)
-
-        total_gastos = 0
-
-        for _, gasto in gastos_mes.iterrows():
-            # Para Bizums mostrar concepto, para otros mostrar operación
-            if pd.notna(gasto.get('concepto')) and gasto['concepto'] != '':
-                descripcion = gasto['concepto'][:38] + '..' if len(gasto['concepto']) > 40 else gasto['concepto']
-            else:
-                descripcion = gasto['operacion'][:38] + '..' if len(gasto['operacion']) > 40 else gasto['operacion']
-
-            empresa = str(gasto['nombre_empresa'])[:23] + '..' if len(str(gasto['nombre_empresa'])) > 25 else str(
-                gasto['nombre_empresa'])
-
-            # Importe siempre negativo para gastos
-            importe_str = f"-{gasto['importe']:>7.2f}€"
-
-            subcat = str(gasto['subcategoria'])[:13] + '..' if len(str(gasto['subcategoria'])) > 15 else str(gasto['subcategoria'])
-
-            print(f"{gasto['fecha_operacion']:10} {descripcion:40} {empresa:25} {importe_str:>10} {subcat:15}")
-            total_gastos += gasto['importe']  # CAMBIO: Eliminar abs() porque 'importe' es positivo
-
-        print("-" * 100)
-        print(f"{'TOTAL GASTOS:':76} {total_gastos:>8.2f}€")
+        self.escribir([
+            f"\n📊 {titulo}",
+            "=" * 100,
+            f"{'Fecha':10} {'Concepto':40} {'Empresa':25} {'Importe':>10} {'Subcategoría':15}",
+            "-" * 100,
+            *self.filas_tabla(
+                self.columna_fecha(gastos_mes),
+                self.columna_descripcion(gastos_mes, 40),
+                self.columna_texto(gastos_mes['nombre_empresa'], 25),
+                self.columna_importe(gastos_mes, '-'),  # Importe siempre negativo para gastos
+                self.columna_texto(gastos_mes['subcategoria'], 15)),
+            "-" * 100,
+            f"{'TOTAL GASTOS:':76} {gastos_mes['importe'].sum():>8.2f}€"
+        ])
 
     def mostrar_subcategorias_gastos(self):
         """Muestra submenú de subcategorías de gastos - ACTUALIZADO"""
         # CORREGIDO: Usar 'tipo' y columnas en minúsculas
-        subcategorias = sorted(self.df[
-                                   self.df['tipo'] == 'GASTO'
-                                   ]['subcategoria'].unique())
+        subcategorias = sorted(self.filtrar_cubo('GASTO')['subcategoria'].unique())
+        # Categoría de la primera operación de cada subcategoría
+        categoria_de = self.cubo.sort_values('primera').drop_duplicates('subcategoria') \
+            .set_index('subcategoria')['categoria']
 
         print("\n📊 SUBCATEGORÍAS DE GASTOS")
         print("0. ↩️  Volver al menú anterior")
 
         for i, subcat in enumerate(subcategorias, 1):
-            # Obtener categoría principal para esta subcategoría - CORREGIDO
-            cat_principal = self.df[self.df['subcategoria'] == subcat]['categoria'].iloc[0]
+            cat_principal = categoria_de[subcat]
             print(f"{i}. {cat_principal} > {subcat}")
 
         try:
@@ -791,7 +1202,7 @@ class AnalizadorGastos:
                 return
             elif 1 <= opcion <= len(subcategorias):
                 subcat_seleccionada = subcategorias[opcion - 1]
-                cat_principal = self.df[self.df['subcategoria'] == subcat_seleccionada]['categoria'].iloc[0]
+                cat_principal = categoria_de[subcat_seleccionada]
                 self.mostrar_gastos_categoria(cat_principal, subcat_seleccionada)
             else:
                 print("❌ Opción no válida")
@@ -830,11 +1241,7 @@ class AnalizadorGastos:
         if self.df is None:
             return
 
-        # CAMBIO: Usar columna 'tipo' y nombres de columnas actualizados
-        empresas_ingresos = self.df[
-            (self.df['tipo'] == 'INGRESO') &  # CAMBIO: 'Importe' > 0 → 'tipo' == 'INGRESO'
-            (self.df['nombre_empresa'] != '')  # CAMBIO: 'Nombre_Empresa' → 'nombre_empresa'
-            ]['nombre_empresa'].value_counts().head(15)  # CAMBIO: 'Nombre_Empresa' → 'nombre_empresa'
+        empresas_ingresos = self.empresas_mas_frecuentes('INGRESO')
 
         print("\n💵 EMPRESAS DE INGRESOS")
         print("0. ↩️  Volver al menú anterior")
@@ -861,11 +1268,7 @@ class AnalizadorGastos:
         if self.df is None:
             return
 
-        # CAMBIO: Usar columna 'tipo' y nombres de columnas actualizados
-        empresas_gastos = self.df[
-            (self.df['tipo'] == 'GASTO') &  # CAMBIO: 'Importe' < 0 → 'tipo' == 'GASTO'
-            (self.df['nombre_empresa'] != '')  # CAMBIO: 'Nombre_Empresa' → 'nombre_empresa'
-            ]['nombre_empresa'].value_counts().head(15)  # CAMBIO: 'Nombre_Empresa' → 'nombre_empresa'
+        empresas_gastos = self.empresas_mas_frecuentes('GASTO')
 
         print("\n💸 EMPRESAS DE GASTOS")
         print("0. ↩️  Volver al menú anterior")
@@ -921,38 +1324,26 @@ class AnalizadorGastos:
 
     def mostrar_ingresos_empresa_mes(self, filtro, año, mes, empresa):
         """Muestra ingresos de empresa por mes específico - ACTUALIZADO"""
-        # CAMBIO: Usar nombres de columnas actualizados
+        # filtro sale de self.df, que ya está ordenado por año, mes y fecha
         ingresos_mes = filtro[
             (filtro['año'] == año) &  # CAMBIO: 'Año' → 'año'
             (filtro['mes'] == mes)  # CAMBIO: 'Mes' → 'mes'
-            ].sort_values('fecha_operacion')  # CAMBIO: 'Fecha_Operacion' → 'fecha_operacion'
-
-        print(f"\n💵 {empresa} - {self.nombre_mes(mes)} {año}")
-        print("=" * 100)
-        print(f"{'Fecha':10} {'Concepto':40} {'Categoría':25} {'Importe':>10} {'Subcategoría':15}")
-        print("-" * 100)
-
-        total_ingresos = 0
-
-        for _, trans in ingresos_mes.iterrows():
-            # Para Bizums mostrar concepto, para otros mostrar operación
-            if pd.notna(trans.get('concepto')) and trans['concepto'] != '':
-                descripcion = trans['concepto'][:38] + '..' if len(trans['concepto']) > 40 else trans['concepto']
-            else:
-                descripcion = trans['operacion'][:38] + '..' if len(trans['operacion']) > 40 else trans['operacion']
-
-            categoria = trans['categoria'][:23] + '..' if len(trans['categoria']) > 25 else trans['categoria']
-
-            # Importe siempre positivo para ingresos
-            importe_str = f"+{trans['importe']:>7.2f}€"
-
-            subcat = str(trans['subcategoria'])[:13] + '..' if len(str(trans['subcategoria'])) > 15 else str(trans['subcategoria'])
-
-            print(f"{trans['fecha_operacion']:10} {descripcion:40} {categoria:25} {importe_str:>10} {subcat:15}")
-            total_ingresos += trans['importe']  # CAMBIO: 'Importe' → 'importe'
+            ]
 
-        print("-" * 100)
-        print(f"{'TOTAL INGRESOS:':76} {total_ingresos:>8.2f}€")
+        self.escribir([
+            f"\n💵 {empresa} - {self.nombre_mes(mes)} {año}",
+            "=" * 100,
+            f"{'Fecha':10} {'Concepto':40} {'Categoría':25} {'Importe':>10} {'Subcategoría':15}",
+            "-" * 100,
+            *self.filas_tabla(
+                self.columna_fecha(ingresos_mes),
+                self.columna_descripcion(ingresos_mes, 40),
+                self.columna_texto(ingresos_mes['categoria'], 25),
+                self.columna_importe(ingresos_mes, '+'),  # Importe siempre positivo para ingresos
+                self.columna_texto(ingresos_mes['subcategoria'], 15)),
+            "-" * 100,
+            f"{'TOTAL INGRESOS:':76} {ingresos_mes['importe'].sum():>8.2f}€"
+        ])
 
     def buscar_empresa_por_nombre(self):
         """Busca empresa por nombre - ACTUALIZADO"""
@@ -965,6 +1356,8 @@ class AnalizadorGastos:
         empresas_encontradas = self.df[
             self.df['nombre_empresa'].str.contains(nombre_buscar, case=False, na=False)
         ]['nombre_empresa'].value_counts()
+        # En una categórica value_counts cuenta también las empresas que no coinciden (con 0)
+        empresas_encontradas = empresas_encontradas[empresas_encontradas > 0]
 
         if empresas_encontradas.empty:
             print("❌ No se encontraron empresas con ese nombre")
@@ -1031,38 +1424,26 @@ class AnalizadorGastos:
 
     def mostrar_gastos_empresa_mes(self, filtro, año, mes, empresa):
         """Muestra gastos de empresa por mes específico - ACTUALIZADO"""
-        # CAMBIO: Usar nombres de columnas actualizados
+        # filtro sale de self.df, que ya está ordenado por año, mes y fecha
         gastos_mes = filtro[
             (filtro['año'] == año) &  # CAMBIO: 'Año' → 'año'
             (filtro['mes'] == mes)  # CAMBIO: 'Mes' → 'mes'
-            ].sort_values('fecha_operacion')  # CAMBIO: 'Fecha_Operacion' → 'fecha_operacion'
-
-        print(f"\n🏢 {empresa} - {self.nombre_mes(mes)} {año}")
-        print("=" * 100)
-        print(f"{'Fecha':10} {'Concepto':40} {'Categoría':25} {'Importe':>10} {'Subcategoría':15}")
-        print("-" * 100)
-
-        total_gastos = 0
-
-        for _, trans in gastos_mes.iterrows():
-            # Para Bizums mostrar concepto, para otros mostrar operación
-            if pd.notna(trans.get('concepto')) and trans['concepto'] != '':
-                descripcion = trans['concepto'][:38] + '..' if len(trans['concepto']) > 40 else trans['concepto']
-            else:
-                descripcion = trans['operacion'][:38] + '..' if len(trans['operacion']) > 40 else trans['operacion']
-
-            categoria = trans['categoria'][:23] + '..' if len(trans['categoria']) > 25 else trans['categoria']
-
-            # Importe siempre negativo para gastos (pero mostramos valor absoluto en total)
-            importe_str = f"-{trans['importe']:>7.2f}€"
-
-            subcat = str(trans['subcategoria'])[:13] + '..' if len(str(trans['subcategoria'])) > 15 else str(trans['subcategoria'])
-
-            print(f"{trans['fecha_operacion']:10} {descripcion:40} {categoria:25} {importe_str:>10} {subcat:15}")
-            total_gastos += trans['importe']  # CAMBIO: Ya no necesitamos abs() porque 'importe' es positivo
+            ]
 
-        print("-" * 100)
-        print(f"{'TOTAL GASTOS:':76} {total_gastos:>8.2f}€")
+        self.escribir([
+            f"\n🏢 {empresa} - {self.nombre_mes(mes)} {año}",
+            "=" * 100,
+            f"{'Fecha':10} {'Concepto':40} {'Categoría':25} {'Importe':>10} {'Subcategoría':15}",
+            "-" * 100,
+            *self.filas_tabla(
+                self.columna_fecha(gastos_mes),
+                self.columna_descripcion(gastos_mes, 40),
+                self.columna_texto(gastos_mes['categoria'], 25),
+                self.columna_importe(gastos_mes, '-'),  # Importe siempre negativo para gastos
+                self.columna_texto(gastos_mes['subcategoria'], 15)),
+            "-" * 100,
+            f"{'TOTAL GASTOS:':76} {gastos_mes['importe'].sum():>8.2f}€"
+        ])
 
     def opcion_estadisticas(self):
         """Muestra estadísticas generales - COMPLETAMENTE MEJORADO"""
@@ -1129,36 +1510,35 @@ class AnalizadorGastos:
 
     def mostrar_estadisticas_mes_detalladas(self, año, mes):
         """Muestra estadísticas detalladas de un mes - ACTUALIZADO"""
-        # CORREGIDO: Usar columnas en minúsculas
-        mes_df = self.df[
-            (self.df['año'] == año) &
-            (self.df['mes'] == mes)
-            ]
+        # Todo sale del cubo: una fila por categoría, subcategoría y empresa del mes
+        if self.cubo is None:
+            return
+        mes_cubo = self.filtrar_cubo(año=año, mes=mes)
 
         print(f"\n📈 ESTADÍSTICAS DETALLADAS - {self.nombre_mes(mes)} {año}")
         print("=" * 70)
 
         # GASTOS POR CATEGORÍA - CORREGIDO: Usar 'tipo' en lugar del signo de importe
-        gastos_mes = mes_df[mes_df['tipo'] == 'GASTO']
-        total_gastos = gastos_mes['importe'].sum()
+        gastos_mes = mes_cubo[mes_cubo['tipo'] == 'GASTO']
+        total_gastos = gastos_mes['total'].sum()
 
         print(f"\n💸 GASTOS POR CATEGORÍA (Total: {total_gastos:.2f}€)")
         print("-" * 50)
 
-        gastos_por_categoria = gastos_mes.groupby('categoria')['importe'].sum().sort_values(ascending=False)
+        gastos_por_categoria = gastos_mes.groupby('categoria', observed=True)['total'].sum().sort_values(ascending=False)
 
         for categoria, gasto in gastos_por_categoria.items():
             porcentaje = (gasto / total_gastos) * 100 if total_gastos > 0 else 0
             print(f"  {categoria:20} {gasto:>8.2f}€ ({porcentaje:5.1f}%)")
 
         # INGRESOS POR CATEGORÍA - CORREGIDO: Usar 'tipo'
-        ingresos_mes = mes_df[mes_df['tipo'] == 'INGRESO']
-        total_ingresos = ingresos_mes['importe'].sum()
+        ingresos_mes = mes_cubo[mes_cubo['tipo'] == 'INGRESO']
+        total_ingresos = ingresos_mes['total'].sum()
 
         print(f"\n💵 INGRESOS POR CATEGORÍA (Total: {total_ingresos:.2f}€)")
         print("-" * 50)
 
-        ingresos_por_categoria = ingresos_mes.groupby('categoria')['importe'].sum().sort_values(ascending=False)
+        ingresos_por_categoria = ingresos_mes.groupby('categoria', observed=True)['total'].sum().sort_values(ascending=False)
 
         for categoria, ingreso in ingresos_por_categoria.items():
             porcentaje = (ingreso / total_ingresos) * 100 if total_ingresos > 0 else 0
@@ -1170,7 +1550,7 @@ class AnalizadorGastos:
 
         gastos_por_empresa = gastos_mes[
             gastos_mes['nombre_empresa'] != ''
-            ].groupby('nombre_empresa')['importe'].sum().sort_values(ascending=False).head(10)
+            ].groupby('nombre_empresa', observed=True)['total'].sum().sort_values(ascending=False).head(10)
 
         for empresa, gasto in gastos_por_empresa.items():
             porcentaje = (gasto / total_gastos) * 100 if total_gastos > 0 else 0
@@ -1192,14 +1572,14 @@ class AnalizadorGastos:
             print(f"  ⚠️  Mes NEGATIVO - Has gastado {abs(balance):.2f}€ más de lo ingresado")
 
         # Comparación con meses anteriores (si existen) - CORREGIDO
-        meses_anteriores = self.df[
-            (self.df['año'] <= año) &
-            ((self.df['año'] < año) | (self.df['mes'] < mes))
+        meses_anteriores = self.cubo[
+            (self.cubo['año'] <= año) &
+            ((self.cubo['año'] < año) | (self.cubo['mes'] < mes))
             ]
 
         if not meses_anteriores.empty:
             # CORREGIDO: Usar 'tipo' en lugar del signo de importe
-            gasto_promedio = meses_anteriores[meses_anteriores['tipo'] == 'GASTO']['importe'].sum() / len(
+            gasto_promedio = meses_anteriores[meses_anteriores['tipo'] == 'GASTO']['total'].sum() / len(
                 meses_anteriores['mes'].unique())
 
             if total_gastos > gasto_promedio * 1.2:
@@ -1212,9 +1592,12 @@ class AnalizadorGastos:
         print("\n📈 ANÁLISIS FINANCIERO DETALLADO")
         print("=" * 60)
 
-        # CORRECCIÓN: Usar la columna 'tipo' para filtrar
-        total_ingresos = self.df[self.df['tipo'] == 'INGRESO']['importe'].sum()
-        total_gastos = self.df[self.df['tipo'] == 'GASTO']['importe'].sum()
+        if self.cubo is None:
+            return
+        ingresos = self.filtrar_cubo('INGRESO')
+        gastos = self.filtrar_cubo('GASTO')
+        total_ingresos = ingresos['total'].sum()
+        total_gastos = gastos['total'].sum()
         balance_total = total_ingresos - total_gastos
 
         print("💰 BALANCE GENERAL:")
@@ -1225,8 +1608,8 @@ class AnalizadorGastos:
         print("\n📅 EVOLUCIÓN MENSUAL (Últimos 6 meses):")
 
         # Agregación más robusta
-        ingresos_mensuales = self.df[self.df['tipo'] == 'INGRESO'].groupby(['año', 'mes'])['importe'].sum()
-        gastos_mensuales = self.df[self.df['tipo'] == 'GASTO'].groupby(['año', 'mes'])['importe'].sum()
+        ingresos_mensuales = ingresos.groupby(['año', 'mes'])['total'].sum()
+        gastos_mensuales = gastos.groupby(['año', 'mes'])['total'].sum()
         evolucion = pd.DataFrame({'Ingresos': ingresos_mensuales, 'Gastos': gastos_mensuales}).fillna(0)
         evolucion['Balance'] = evolucion['Ingresos'] - evolucion['Gastos']
 
@@ -1235,8 +1618,7 @@ class AnalizadorGastos:
                 f"  {self.nombre_mes(mes)} {año}: Balance {datos['Balance']:>8.2f}€ (I: {datos['Ingresos']:.0f}€, G: {datos['Gastos']:.0f}€)")
 
         print("\n🏷️  TOP 5 CATEGORÍAS DE GASTO:")
-        gastos_por_categoria = self.df[self.df['tipo'] == 'GASTO'].groupby('categoria')['importe'].sum().sort_values(
-            ascending=False)
+        gastos_por_categoria = gastos.groupby('categoria', observed=True)['total'].sum().sort_values(ascending=False)
 
         for categoria, gasto in gastos_por_categoria.head(5).items():
             porcentaje = (gasto / total_gastos) * 100 if total_gastos > 0 else 0
@@ -1249,7 +1631,7 @@ class AnalizadorGastos:
         print("\n📈 COMPARATIVA DE GASTOS POR CATEGORÍA")
 
         # Obtener y mostrar la lista de categorías de gasto disponibles
-        gastos_df = self.df[self.df['tipo'] == 'GASTO']
+        gastos_df = self.filtrar_cubo('GASTO') if self.cubo is not None else pd.DataFrame()
         if gastos_df.empty:
             print("❌ No hay datos de gastos para analizar.")
             return
@@ -1269,11 +1651,8 @@ class AnalizadorGastos:
                 cat_seleccionada = categorias_gastos[opcion - 1]
 
                 # Filtrar los datos para la categoría seleccionada y agrupar por mes
-                filtro_df = self.df[
-                    (self.df['tipo'] == 'GASTO') &
-                    (self.df['categoria'] == cat_seleccionada)
-                    ]
-                gastos_mensuales = filtro_df.groupby(['año', 'mes'])['importe'].sum().sort_index()
+                filtro_df = gastos_df[gastos_df['categoria'] == cat_seleccionada]
+                gastos_mensuales = filtro_df.groupby(['año', 'mes'])['total'].sum().sort_index()
 
                 print(f"\n📈 COMPARATIVA - {cat_seleccionada.upper()}")
                 print("-" * 45)
@@ -1313,16 +1692,16 @@ class AnalizadorGastos:
         print(f"Buscando gastos en: {', '.join(subcategorias_hormiga)}")
         print("-" * 50)
 
-        # Filtrar el DataFrame para obtener solo las transacciones de esas subcategorías
-        filtro_df = self.df[self.df['subcategoria'].isin(subcategorias_hormiga)]
+        # Filtrar el cubo para quedarse sólo con esas subcategorías
+        filtro_df = self.cubo[self.cubo['subcategoria'].isin(subcategorias_hormiga)]
 
         if filtro_df.empty:
             print("✅ ¡Felicidades! No se encontraron 'gastos hormiga' en el periodo analizado.")
             return
 
         # Agrupar por mes y subcategoría, y calcular la suma y el número de transacciones
-        gastos_agrupados = filtro_df.groupby(['año', 'mes', 'subcategoria'])['importe'].agg(
-            ['sum', 'count']).sort_index()
+        gastos_agrupados = filtro_df.groupby(['año', 'mes', 'subcategoria'], observed=True).agg(
+            sum=('total', 'sum'), count=('transacciones', 'sum')).sort_index()
 
         # Iterar sobre los resultados para mostrarlos de forma ordenada
         for (año, mes), grupo in gastos_agrupados.groupby(level=[0, 1]):
@@ -1351,8 +1730,10 @@ class AnalizadorGastos:
             print("❌ No hay gastos fijos definidos en config_analisis.json")
             return
 
-        # Filtrar datos para el último mes
-        df_mes = self.df[(self.df['año'] == self.ultimo_año) & (self.df['mes'] == self.ultimo_mes)]
+        # Datos del último mes
+        df_mes = self.datos_mes(self.ultimo_año, self.ultimo_mes)
+        if df_mes is None:
+            return
 
         total_fijos_pagados = 0
         print(f"Estado para {self.nombre_mes(self.ultimo_mes)} {self.ultimo_año}:")
@@ -1387,8 +1768,10 @@ class AnalizadorGastos:
         """
         print(f"\n--- Desglose de {self.nombre_mes(mes)} {año} ---")
 
-        # 1. Filtrar los datos para el mes y tipo de gasto seleccionados
-        mes_df = self.df[(self.df['año'] == año) & (self.df['mes'] == mes) & (self.df['tipo'] == 'GASTO')]
+        # 1. Filas del cubo para el mes y tipo de gasto seleccionados
+        if self.cubo is None:
+            return
+        mes_df = self.filtrar_cubo('GASTO', año, mes)
 
         if mes_df.empty:
             print("  No hay gastos registrados en este mes.")
@@ -1396,9 +1779,9 @@ class AnalizadorGastos:
 
         # 2. Agrupar por subcategoría, calculando la suma y el número de transacciones
         #    Rellenamos las subcategorías vacías para que no se pierdan en el análisis
-        desglose = mes_df.fillna({'subcategoria': 'Sin Subcategoría'}) \
-            .groupby('subcategoria')['importe'] \
-            .agg(['sum', 'count']) \
+        desglose = mes_df.astype({'subcategoria': object}).fillna({'subcategoria': 'Sin Subcategoría'}) \
+            .groupby('subcategoria', observed=True) \
+            .agg(sum=('total', 'sum'), count=('transacciones', 'sum')) \
             .sort_values('sum', ascending=False)
 
         # 3. Mostrar los resultados con el formato deseado
@@ -1406,7 +1789,7 @@ class AnalizadorGastos:
             print(f"  - {subcat:<20} {datos['sum']:>8.2f}€ ({int(datos['count'])} trans.)")
 
         # 4. Mostrar el total del mes
-        total_mes = mes_df['importe'].sum()
+        total_mes = mes_df['total'].sum()
         print("-" * 45)
         print(f"  {'TOTAL MES:':<22} {total_mes:>8.2f}€")
 
@@ -1706,10 +2089,12 @@ class AnalizadorGastos:
 
     def ejecutar(self):
         """Ejecuta la aplicación principal"""
-        if self.df is None:
+        # Con catálogo los meses salen de él: comprobar que hay datos no lee el histórico
+        if not self.obtener_meses_disponibles():
             return
 
         while True:
+            self.recargar_si_cambia()
             os.system('cls' if os.name == 'nt' else 'clear')
             self.mostrar_cabecera()
             self.mostrar_menu_principal()
@@ -1741,5 +2126,10 @@ class AnalizadorGastos:
 
 # Ejecutar la aplicación
 if __name__ == "__main__":
-    app = AnalizadorGastos()
+    parser = argparse.ArgumentParser(description="Analizador de gastos personales")
+    parser.add_argument("--extractos", nargs="+", metavar="RUTA",
+                        help="analiza directamente estos PDFs (o carpetas con PDFs) sin usar el CSV de operaciones")
+    args = parser.parse_args()
+
+    app = AnalizadorGastos(extractos=args.extractos)
     app.ejecutar()
\ No newline at end of file
@@ -0,0 +1,392 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import lector
+
+TAMAÑOS_POR_DEFECTO = [1000, 10000, 100000]
+DIRECTORIO_RESULTADOS = os.path.join(lector.DIRECTORIO_LECTOR, 'resultados_benchmark')
+VERSION_RESULTADOS = 1
+MOVIMIENTOS_POR_PAGINA = 30
+MOVIMIENTOS_POR_MES = 120
+# Páginas de PDF sintético que se extraen como muestra (la extracción es la
+# etapa más lenta, así que para tamaños grandes se mide una muestra y se
+# estima el total)
+PAGINAS_EXTRACCION = 40
+
+# Conceptos y detalles con el mismo formato que el texto que sale de los
+# extractos: (concepto, detalle, signo, importe máximo)
+PLANTILLAS_MOVIMIENTO = [
+    ("PAGOCONTARJETAENSUPERMERCADOS", "4188202100000000SUPERMERCADOCENTRAL ELCHE ES", -1, 80),
+    ("PAGOCONTARJETAENRESTAURANTESYCAFETERIAS", "4188202100000000CAFETERIALAPLAZA ELCHE ES", -1, 40),
+    ("PAGOCONTARJETADESERVICIOSVARIOS", "4188202100000000LABORESDETABACO12 ELCHE/ELX ES", -1, 20),
+    ("PAGOCONTARJETADECOMPRASADISTANCIAYSUSCRIPCIONES", "4188202100000000Spotify", -1, 20),
+    ("PAGOCONTARJETAENHOGAR,MUEBLES,DECORACIONYELECTR", "4188202100000000LEROYMERLIN ELCHE ES", -1, 150),
+    ("PAGOCONTARJETAENSECTORDELAUTOMOVIL", "4188202100000000ESTACIONDESERVICIO ELCHE ES", -1, 70),
+    ("PAGOCONTARJETAENMODA,CALZADOYCOMPLEMENTOS", "4188202100000000ZARAELCHE ELCHE ES", -1, 90),
+    ("CARGOPORCOMPRACONTARJETAENCOMERCIOS", "4188202100000000REVOLUT**8111*", -1, 300),
+    ("BIZUM", "RECIBIDO:Sinconcepto", 1, 60),
+    ("BIZUM", "ENVIADO:cena", -1, 60),
+    ("ABONODENOMINAPORTRANSFERENCIA", "NOMINA.EMPRESA", 1, 1500),
+    ("ADEUDOASUCARGO", "N2025251000000000GIMNASIOCENTRO-FitnessPark", -1, 50),
+    ("ABONOPORTRANSFERENCIAASUFAVORRECIBIDAENEUROS", "LIQ.OP.Nº 000410862970001", 1, 100),
+    ("TRANSFERENCIAS", "TRANSFERENCIAMENSUAL", -1, 200),
+    ("COMISIONESPORSERVICIOS", "", -1, 5),
+]
+
+
+def iterar_movimientos_por_lineas(paginas):
+    """Parser anterior, línea a línea con re.match, que se mantiene como referencia"""
+    archivo_actual = None
+    mes = "DESCONOCIDO"
+    año = "2025"
+    patron = r'^(\d{2}/\d{2})\s+(\d{2}/\d{2})\s+([A-Z].*?)\s+(-?[\d.,]+)\s+(-?[\d.,]+)$'
+
+    for archivo, _, pagina in paginas:
+        if archivo != archivo_actual:
+            archivo_actual = archivo
+            mes = "DESCONOCIDO"
+
+        mes_match = re.search(r'EXTRACTODE(\w+)2025', pagina)
+        if mes_match:
+            mes = mes_match.group(1)
+
+        lineas = pagina.split('\n')
+        i = 0
+
+        while i < len(lineas):
+            linea = lineas[i].strip()
+            match = re.match(patron, linea)
+
+            if match:
+                f_oper, f_valor, concepto, importe, saldo = match.groups()
+
+                detalle = ""
+                if i + 1 < len(lineas):
+                    siguiente = lineas[i + 1].strip()
+                    if (siguiente and
+                            not re.match(r'^\d{2}/\d{2}', siguiente) and
+                            not re.match(r'^SALDO', siguiente) and
+                            not re.match(r'^Todoslosimportes', siguiente) and
+                            not re.match(r'^F\d+', siguiente) and
+                            len(siguiente) > 5):
+                        detalle = siguiente
+                        i += 1
+
+                yield año, mes, f_oper, f_valor, concepto, importe, saldo, detalle
+
+            i += 1
+
+
+def cargar_paginas_muestra():
+    """Extrae una vez las páginas de los PDFs de la carpeta"""
+    return list(lector.iterar_paginas_pdf(lector.listar_extractos([lector.DIRECTORIO_LECTOR])))
+
+
+def formatear_importe(valor):
+    """Importe con el formato de los extractos: punto de miles y coma decimal"""
+    return f"{valor:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def generar_paginas_sinteticas(num_movimientos, semilla=0, movimientos_por_pagina=MOVIMIENTOS_POR_PAGINA,
+                               movimientos_por_mes=MOVIMIENTOS_POR_MES):
+    """Genera (archivo, número de página, texto) con el formato de texto de los extractos.
+
+    Cada mes es un extracto distinto (un archivo) que empieza en enero de
+    2020, con su cabecera EXTRACTODE<MES><AÑO> en todas las páginas, las
+    líneas de movimiento con su detalle y el pie de página.
+    """
+    aleatorio = random.Random(semilla)
+    paginas = []
+    saldo = 1000.0
+    for inicio_mes in range(0, num_movimientos, movimientos_por_mes):
+        indice_mes = inicio_mes // movimientos_por_mes
+        año, mes = 2020 + indice_mes // 12, indice_mes % 12 + 1
+        archivo = f"sintetico_{año}_{mes:02d}.pdf"
+        movimientos_mes = min(movimientos_por_mes, num_movimientos - inicio_mes)
+
+        for num_pagina, inicio_pagina in enumerate(range(0, movimientos_mes, movimientos_por_pagina), 1):
+            lineas = [
+                "EXTRACTOMENSUALDE CUENTASPERSONALES",
+                f"EXTRACTODE{lector.MESES[mes - 1]}{año} Fechadeemisión: 01/{mes:02d}/{año}",
+                f"IBAN ES00 0000 0000 0000 0000 0000 BIC: HOJA {num_pagina:03d}",
+                "F.Oper. F.Valor Concepto Importe Saldo",
+                f"SALDOANTERIOR--------------------- {formatear_importe(saldo)}",
+            ]
+            for _ in range(min(movimientos_por_pagina, movimientos_mes - inicio_pagina)):
+                concepto, detalle, signo, maximo = aleatorio.choice(PLANTILLAS_MOVIMIENTO)
+                importe = signo * round(aleatorio.uniform(1, maximo), 2)
+                saldo = round(saldo + importe, 2)
+                dia = aleatorio.randint(1, 28)
+                lineas.append(f"{dia:02d}/{mes:02d} {dia:02d}/{mes:02d} {concepto} "
+                              f"{formatear_importe(importe)} {formatear_importe(saldo)}")
+                if detalle:
+                    lineas.append(detalle)
+            lineas += [
+                "Todoslosimportesdeesteextractoseexpresanen: SALDOANUESTROFAVOR SALDOASUFAVOR",
+                f"EURO {formatear_importe(saldo)}",
+                "F00201",
+            ]
+            paginas.append((archivo, num_pagina, "\n".join(lineas)))
+    return paginas
+
+
+def escribir_pdf_sintetico(textos, ruta_pdf):
+    """Escribe un PDF mínimo (Helvetica 8 pt, WinAnsi) con una página por texto.
+
+    No necesita ninguna librería: cada línea es un objeto de texto, con el mismo
+    tamaño de página A4 que los extractos reales, para medir la extracción.
+    """
+    def escapar(linea):
+        return linea.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # /Pages, cuando se conocen las páginas
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    paginas = []
+    for texto in textos:
+        contenido = ["BT", "/F1 8 Tf", "10 TL", "20 780 Td"]
+        for linea in texto.split("\n"):
+            contenido.append(f"({escapar(linea)}) Tj T*")
+        contenido.append("ET")
+        flujo = "\n".join(contenido).encode("cp1252", errors="replace")
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(flujo) + flujo + b"\nendstream")
+        objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 589.6 836.21] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objetos)))
+        paginas.append(len(objetos))
+    hijos = b" ".join(b"%d 0 R" % numero for numero in paginas)
+    objetos[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (hijos, len(paginas))
+
+    salida = bytearray(b"%PDF-1.4\n")
+    posiciones = []
+    for numero, objeto in enumerate(objetos, 1):
+        posiciones.append(len(salida))
+        salida += b"%d 0 obj\n" % numero + objeto + b"\nendobj\n"
+    inicio_xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicion in posiciones:
+        salida += b"%010d 00000 n \n" % posicion
+    salida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    Path(ruta_pdf).write_bytes(bytes(salida))
+
+
+def cronometrar(funcion, repeticiones):
+    """Mejor tiempo (s) de varias ejecuciones de funcion() y su último resultado"""
+    mejor = float("inf")
+    resultado = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor, resultado
+
+
+def limpiar_caches():
+    """Vacía las cachés en memoria de lector para medir cada etapa en frío"""
+    lector.reiniciar_caches()
+
+
+def medida(segundos, elementos):
+    return {"segundos": round(segundos, 6), "elementos": elementos,
+            "por_segundo": round(elementos / segundos, 1) if segundos > 0 else None}
+
+
+def benchmark_extraccion(archivos_pdf, extractores):
+    """Tiempo de extracción de texto de cada backend sobre archivos_pdf"""
+    resultados = {}
+    for extractor in extractores:
+        t0 = time.perf_counter()
+        num_paginas = sum(1 for _ in lector.iterar_paginas_pdf(archivos_pdf, extractor))
+        resultados[extractor] = medida(time.perf_counter() - t0, num_paginas)
+    return resultados
+
+
+def extractores_disponibles():
+    import importlib.util
+    return [nombre for nombre in lector.EXTRACTORES
+            if nombre != 'rapido' or importlib.util.find_spec('pypdfium2') is not None]
+
+
+def benchmark_etapas(num_movimientos, semilla=0, con_pdf=False):
+    """Mide por separado cada etapa de la ingesta sobre num_movimientos sintéticos"""
+    t0 = time.perf_counter()
+    paginas = generar_paginas_sinteticas(num_movimientos, semilla)
+    etapas = {"generacion": medida(time.perf_counter() - t0, len(paginas))}
+
+    if con_pdf:
+        # Muestra de páginas en PDF; el total se estima con el ritmo medido
+        muestra = [texto for _, _, texto in paginas[:PAGINAS_EXTRACCION]]
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta_pdf = Path(directorio) / "sintetico.pdf"
+            escribir_pdf_sintetico(muestra, ruta_pdf)
+            for extractor, resultado in benchmark_extraccion([ruta_pdf], extractores_disponibles()).items():
+                if resultado["por_segundo"]:
+                    resultado["estimado_total_segundos"] = round(len(paginas) / resultado["por_segundo"], 3)
+                etapas[f"extraccion_{extractor}"] = resultado
+
+    limpiar_caches()
+    t0 = time.perf_counter()
+    movimientos = list(lector.iterar_movimientos(paginas))
+    etapas["parseo"] = medida(time.perf_counter() - t0, len(movimientos))
+
+    conceptos = [movimiento.concepto.upper() for movimiento in movimientos]
+    detalles = [movimiento.detalle for movimiento in movimientos]
+
+    limpiar_caches()
+    t0 = time.perf_counter()
+    for concepto in conceptos:
+        lector.aplicar_reglas_bancarias(concepto)
+    etapas["aplicar_reglas_bancarias"] = medida(time.perf_counter() - t0, len(conceptos))
+
+    # Incluye sus propias llamadas a aplicar_reglas_bancarias, con la caché vacía
+    limpiar_caches()
+    t0 = time.perf_counter()
+    operaciones_formateadas = [lector.formatear_concepto(concepto) for concepto in conceptos]
+    etapas["formatear_concepto"] = medida(time.perf_counter() - t0, len(conceptos))
+
+    t0 = time.perf_counter()
+    empresas = [lector.separar_empresa(detalle) for detalle in detalles]
+    etapas["separar_empresa"] = medida(time.perf_counter() - t0, len(detalles))
+
+    t0 = time.perf_counter()
+    for operacion, (_, nombre_empresa) in zip(operaciones_formateadas, empresas):
+        lector.determinar_categoria(operacion, nombre_empresa)
+    etapas["determinar_categoria"] = medida(time.perf_counter() - t0, len(empresas))
+
+    limpiar_caches()
+    t0 = time.perf_counter()
+    operaciones = list(lector.iterar_operaciones(paginas))
+    etapas["pipeline_operaciones"] = medida(time.perf_counter() - t0, len(operaciones))
+
+    lector.ColumnasOperaciones().a_dataframe()  # importa pandas fuera de la medida
+    limpiar_caches()
+    t0 = time.perf_counter()
+    df = lector.columnas_operaciones(paginas).a_dataframe()
+    etapas["pipeline_columnas_dataframe"] = medida(time.perf_counter() - t0, len(df))
+
+    with tempfile.TemporaryDirectory() as directorio:
+        t0 = time.perf_counter()
+        filas = lector.escribir_operaciones_csv(operaciones, os.path.join(directorio, "operaciones.csv"))
+        etapas["escritura_csv"] = medida(time.perf_counter() - t0, filas)
+
+    return etapas
+
+
+def benchmark_parser(paginas, repeticiones=20):
+    """Compara el parser compilado (finditer por página) con el recorrido línea a línea"""
+    t_lineas, ref = cronometrar(lambda: list(iterar_movimientos_por_lineas(paginas)), repeticiones)
+    t_compilado, nuevos = cronometrar(lambda: [tuple(m) for m in lector.iterar_movimientos(paginas)],
+                                      repeticiones)
+
+    if ref != nuevos:
+        print("❌ El parser compilado no devuelve los mismos movimientos que el de referencia")
+
+    print(f"📄 {len(paginas)} páginas, {len(ref)} movimientos")
+    print(f"  Línea a línea: {t_lineas * 1000:8.2f} ms")
+    print(f"  Compilado:     {t_compilado * 1000:8.2f} ms  (x{t_lineas / t_compilado:.1f})")
+    return {"lineas": medida(t_lineas, len(ref)), "compilado": medida(t_compilado, len(nuevos)),
+            "iguales": ref == nuevos}
+
+
+def version_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def mostrar_etapas(num_movimientos, etapas):
+    print(f"\n📊 {num_movimientos} movimientos")
+    for nombre, resultado in etapas.items():
+        ritmo = f"{resultado['por_segundo']:>12,.0f}/s" if resultado["por_segundo"] else " " * 14
+        print(f"  {nombre:28} {resultado['segundos'] * 1000:10.1f} ms {ritmo}")
+
+
+def comparar_resultados(anteriores, actuales, tolerancia):
+    """Compara dos ejecuciones etapa a etapa. Devuelve True si ninguna es más lenta que la tolerancia"""
+    sin_regresiones = True
+    por_tamaño = {resultado["movimientos"]: resultado["etapas"] for resultado in anteriores["resultados"]}
+    print(f"\n🔍 Comparación con {anteriores.get('fecha')} ({anteriores.get('git') or 'sin git'})")
+    for resultado in actuales["resultados"]:
+        etapas_antes = por_tamaño.get(resultado["movimientos"])
+        if not etapas_antes:
+            continue
+        for nombre, medida_actual in resultado["etapas"].items():
+            medida_antes = etapas_antes.get(nombre)
+            if not medida_antes or not medida_antes["segundos"]:
+                continue
+            ratio = medida_actual["segundos"] / medida_antes["segundos"]
+            regresion = ratio > 1 + tolerancia
+            sin_regresiones &= not regresion
+            print(f"  {'❌' if regresion else '✅'} {resultado['movimientos']:>8} {nombre:28} x{ratio:.2f}")
+    return sin_regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de la ingesta de extractos")
+    parser.add_argument("--movimientos", type=int, nargs="+", default=TAMAÑOS_POR_DEFECTO,
+                        help="tamaños (número de movimientos sintéticos) a medir, hasta 1000000")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--pdf", action="store_true",
+                        help="genera también PDFs sintéticos para medir la extracción")
+    parser.add_argument("--repeticiones", type=int, default=20,
+                        help="repeticiones de la comparación de parsers sobre los PDFs de la carpeta")
+    parser.add_argument("--salida", default=None,
+                        help=f"JSON de resultados (por defecto {DIRECTORIO_RESULTADOS}/ingesta_<fecha>.json)")
+    parser.add_argument("--comparar", metavar="JSON",
+                        help="resultados anteriores con los que comparar para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="ralentización relativa que se considera regresión al comparar")
+    args = parser.parse_args()
+
+    fecha = datetime.now()
+    resultados = {
+        "version": VERSION_RESULTADOS,
+        "fecha": fecha.isoformat(timespec="seconds"),
+        "git": version_git(),
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+        "semilla": args.semilla,
+        "resultados": [],
+    }
+
+    for num_movimientos in args.movimientos:
+        etapas = benchmark_etapas(num_movimientos, args.semilla, args.pdf)
+        mostrar_etapas(num_movimientos, etapas)
+        resultados["resultados"].append({"movimientos": num_movimientos, "etapas": etapas})
+
+    archivos_pdf = lector.listar_extractos([lector.DIRECTORIO_LECTOR])
+    if archivos_pdf:
+        print(f"\n📄 Extracción de los {len(archivos_pdf)} PDFs de la carpeta")
+        resultados["extraccion_muestra"] = benchmark_extraccion(archivos_pdf, extractores_disponibles())
+        for extractor, resultado in resultados["extraccion_muestra"].items():
+            print(f"  {extractor:12} {resultado['segundos']:.2f}s ({resultado['por_segundo']} páginas/s)")
+        resultados["parser_muestra"] = benchmark_parser(cargar_paginas_muestra(), args.repeticiones)
+
+    ruta_salida = args.salida or os.path.join(DIRECTORIO_RESULTADOS, f"ingesta_{fecha:%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(ruta_salida) or ".", exist_ok=True)
+    with open(ruta_salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Resultados guardados en {ruta_salida}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anteriores = json.load(f)
+        if not comparar_resultados(anteriores, resultados, args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,131 @@
+import argparse
+import contextlib
+import csv
+import hashlib
+import itertools
 import json
+import mmap
 import os
 import re
-import pandas as pd
-import pdfplumber
+import struct
+import time
+import unicodedata
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
 
+# Extractos con más páginas que esto se reparten en varias tareas del pool
+PAGINAS_POR_TAREA = 4
+# Tareas enviadas al pool por proceso antes de esperar a la primera
+TAREAS_POR_PROCESO = 2
+
+# Backends de extracción de texto: pdfplumber (referencia) o rapido (capa de
+# texto de pypdfium2, recortada a la tabla de movimientos)
+EXTRACTOR_POR_DEFECTO = 'pdfplumber'
+# Franja vertical (top, bottom) en puntos que conserva la cabecera con el mes y
+# la tabla de movimientos, sin el título ni el pie de página del extracto
+AREA_TABLA = (45, 790)
+# Tolerancias de pdfplumber para unir caracteres en palabras y líneas
+TOLERANCIA_X = 3
+TOLERANCIA_Y = 3
+
+# Rutas relativas al proyecto (no al directorio de trabajo), para poder lanzar
+# lector.py desde cualquier sitio
+DIRECTORIO_LECTOR = os.path.dirname(os.path.abspath(__file__))
+DIRECTORIO_PROYECTO = os.path.dirname(DIRECTORIO_LECTOR)
+
+RUTA_CSV_OPERACIONES = os.path.join(DIRECTORIO_PROYECTO, 'Archivos csv', 'operaciones.csv')
+RUTA_CSV_MOVIMIENTOS = os.path.join(DIRECTORIO_PROYECTO, 'Archivos csv', 'movimientos.csv')
+# Almacén que lee AnalizadorGastos: una partición por año y mes (Feather / Arrow
+# IPC, o CSV si no está pyarrow) y un catálogo con las particiones que hay. El
+# CSV plano se sigue escribiendo para consultarlo a mano
+DIRECTORIO_PARTICIONES = os.path.join(DIRECTORIO_PROYECTO, 'Archivos csv', 'particiones')
+RUTA_CATALOGO = os.path.join(DIRECTORIO_PARTICIONES, 'catalogo.json')
+VERSION_CATALOGO = 1
+COLUMNAS_CATEGORICAS = ['operacion', 'categoria', 'tipo']
+
+MESES = ['ENERO', 'FEBRERO', 'MARZO', 'ABRIL', 'MAYO', 'JUNIO', 'JULIO', 'AGOSTO', 'SEPTIEMBRE',
+         'OCTUBRE', 'NOVIEMBRE', 'DICIEMBRE']
+
+# Manifiesto de extractos ya procesados, indexado por el hash de su contenido
+DIRECTORIO_CACHE = os.path.join(DIRECTORIO_LECTOR, '.cache')
+RUTA_MANIFIESTO = os.path.join(DIRECTORIO_CACHE, 'manifiesto_ingesta.json')
+VERSION_MANIFIESTO = 2
+
+# Operaciones descartadas por duplicadas en la última escritura del almacén
+RUTA_CSV_DUPLICADOS = os.path.join(DIRECTORIO_CACHE, 'duplicados.csv')
+
+# Bloqueo entre procesos de la ingesta (lector.py a mano y el modo --vigilar)
+RUTA_BLOQUEO = os.path.join(DIRECTORIO_CACHE, 'ingesta.lock')
+# En Windows no se puede comprobar si el pid del bloqueo sigue vivo sin
+# riesgo, así que allí se da por abandonado pasado este tiempo (segundos)
+BLOQUEO_ABANDONADO = 3600
+# Segundos entre sondeos de las carpetas en el modo --vigilar
+INTERVALO_VIGILANCIA = 10
+
+# Informe de tiempos y contadores de la última ingesta con --instrumentar
+RUTA_INFORME_INGESTA = os.path.join(DIRECTORIO_CACHE, 'informe_ingesta.json')
+VERSION_INFORME = 1
+
+# Patrones del parser, compilados una sola vez. [^\S\n] es "espacio en blanco
+# salvo salto de línea", para que ninguna parte cruce de una línea a otra.
+PATRON_MOVIMIENTO = re.compile(
+    # Línea del movimiento: F.Oper F.Valor Concepto Importe Saldo
+    r'^[^\S\n]*(\d{2}/\d{2})[^\S\n]+(\d{2}/\d{2})[^\S\n]+([A-Z][^\n]*?)'
+    r'[^\S\n]+(-?[\d.,]+)[^\S\n]+(-?[\d.,]+)[^\S\n]*$'
+    # Línea de detalle opcional: al menos 6 caracteres y que no sea otro
+    # movimiento, un saldo, el pie de página ni una referencia F...
+    r'(?:\n[^\S\n]*(?!\d{2}/\d{2}|SALDO|Todoslosimportes|F\d)(\S[^\n]{4,}\S)[^\S\n]*$)?',
+    re.MULTILINE
+)
+# Cabecera de cada página: EXTRACTODE<MES><AÑO>, p. ej. EXTRACTODESEPTIEMBRE2025
+PATRON_MES = re.compile(r'EXTRACTODE([A-Z]+)(\d{4})')
+# 16 dígitos (tarjeta), N + 13 dígitos (N20251950006340), 12 dígitos o 9 dígitos
+PATRON_ID_EMPRESA = re.compile(r'\d{16}|N\d{13}|\d{12}|\d{9}')
+PATRON_DIGITO_INICIAL = re.compile(r'\d')
+PATRON_NO_ALFANUMERICO = re.compile(r'[^A-Z0-9]')
+PATRON_ID_Y_NOMBRE = re.compile(r'(\d+)([A-Z].*)')
+
+Movimiento = namedtuple('Movimiento', ['año', 'mes', 'fecha_operacion', 'fecha_valor', 'concepto',
+                                       'importe', 'saldo', 'detalle'])
+
+COLUMNAS = ['año', 'mes', 'fecha_operacion', 'fecha_valor', 'operacion', 'id_empresa', 'nombre_empresa',
+            'concepto', 'categoria', 'subcategoria', 'tipo', 'importe', 'saldo']
+
+RUTA_CONFIG_CATEGORIAS = os.path.join(DIRECTORIO_PROYECTO, 'config', 'config_categorias.json')
+RUTA_CONFIG_REGLAS = os.path.join(DIRECTORIO_PROYECTO, 'config', 'config_reglas_bancarias.json')
+
+# Memoria persistente (operación, empresa) -> (categoría, subcategoría), sellada
+# con el hash de config_categorias.json
+RUTA_MEMO_CATEGORIAS = os.path.join(DIRECTORIO_CACHE, 'memo_categorias.json')
+VERSION_MEMO_CATEGORIAS = 1
+
+# Diccionario precompilado a partir de dics/*.txt (ver construir_diccionario)
+DIRECTORIO_DICS = os.path.join(DIRECTORIO_LECTOR, 'dics')
+RUTA_DICCIONARIO_COMPILADO = os.path.join(DIRECTORIO_CACHE, 'diccionario.bin')
+VERSION_DICCIONARIO = 2
+
+# Segmentación de conceptos pegados (ver segmentar_concepto). Las palabras más
+# cortas que LONGITUD_MINIMA_PALABRA sólo se separan si están en PALABRAS_CORTAS.
+LONGITUD_MINIMA_PALABRA = 3
+PALABRAS_CORTAS = frozenset(['A', 'Y', 'EN', 'DE', 'EL', 'LA', 'LO', 'AL', 'SU', 'UN'])
+# Coste, en caracteres, de cada fragmento desconocido y, además, de los más
+# cortos que LONGITUD_MINIMA_PALABRA
+PENALIZACION_DESCONOCIDO = 2
+PENALIZACION_DESCONOCIDO_CORTO = 3
+
 # Cargar diccionario
 _palabras_espanol = None
 
+
 def cargar_mapeo_categorias():
     """Carga las reglas de categorización desde el archivo JSON."""
-    ruta_config = os.path.join('..', 'config', 'config_categorias.json')
     try:
-        with open(ruta_config, 'r', encoding='utf-8') as f:
+        with open(RUTA_CONFIG_CATEGORIAS, 'r', encoding='utf-8') as f:
             config = json.load(f)
         # Convertir la lista de reglas a un diccionario para una búsqueda más rápida
         mapeo = {regla['palabra_clave']: (regla['categoria'], regla['subcategoria']) for regla in config['mapeo_categorias']}
@@ -21,7 +134,85 @@ def cargar_mapeo_categorias():
         print(f"❌ Error cargando la configuración de categorías: {e}")
         return {}
 
-Mapeo_CATEGORIAS = cargar_mapeo_categorias()
+
+# Se carga la primera vez que se categoriza (importar lector no lee ningún archivo)
+Mapeo_CATEGORIAS = None
+
+
+def obtener_mapeo_categorias():
+    """Mapeo de categorías, leyendo config_categorias.json la primera vez"""
+    global Mapeo_CATEGORIAS
+    if Mapeo_CATEGORIAS is None:
+        Mapeo_CATEGORIAS = cargar_mapeo_categorias()
+    return Mapeo_CATEGORIAS
+
+
+class AutomataPalabrasClave:
+    """Autómata de Aho-Corasick que busca todas las palabras clave en una sola pasada.
+
+    Cada palabra conserva su posición en la lista como prioridad; buscar()
+    devuelve la de menor posición que aparezca en el texto, que es la misma que
+    encontraría un recorrido lineal de la lista con `palabra in texto`.
+    """
+
+    def __init__(self, palabras):
+        self.palabras = list(palabras)
+        sin_coincidencia = len(self.palabras)
+        self.transiciones = [{}]
+        self.fallo = [0]
+        self.prioridad = [sin_coincidencia]
+
+        # 1. Trie con la mejor prioridad que termina en cada nodo
+        for posicion, palabra in enumerate(self.palabras):
+            estado = 0
+            for caracter in palabra:
+                siguiente = self.transiciones[estado].get(caracter)
+                if siguiente is None:
+                    siguiente = len(self.transiciones)
+                    self.transiciones[estado][caracter] = siguiente
+                    self.transiciones.append({})
+                    self.fallo.append(0)
+                    self.prioridad.append(sin_coincidencia)
+                estado = siguiente
+            self.prioridad[estado] = min(self.prioridad[estado], posicion)
+
+        # 2. Enlaces de fallo en anchura, propagando la prioridad de los sufijos
+        cola = list(self.transiciones[0].values())
+        for estado in cola:
+            for caracter, siguiente in self.transiciones[estado].items():
+                fallo = self.fallo[estado]
+                while fallo and caracter not in self.transiciones[fallo]:
+                    fallo = self.fallo[fallo]
+                self.fallo[siguiente] = self.transiciones[fallo].get(caracter, 0)
+                self.prioridad[siguiente] = min(self.prioridad[siguiente], self.prioridad[self.fallo[siguiente]])
+                cola.append(siguiente)
+
+    def buscar(self, texto):
+        """Devuelve la posición de la palabra más prioritaria contenida en texto, o None"""
+        transiciones, fallo, prioridad = self.transiciones, self.fallo, self.prioridad
+        mejor = prioridad[0]
+        estado = 0
+        for caracter in texto:
+            while estado and caracter not in transiciones[estado]:
+                estado = fallo[estado]
+            estado = transiciones[estado].get(caracter, 0)
+            if prioridad[estado] < mejor:
+                mejor = prioridad[estado]
+                if mejor == 0:
+                    break
+        return mejor if mejor < len(self.palabras) else None
+
+
+_categorizador = None
+
+
+def obtener_categorizador():
+    """Compila (una vez por mapeo) el autómata de las palabras clave de Mapeo_CATEGORIAS"""
+    global _categorizador
+    mapeo = obtener_mapeo_categorias()
+    if _categorizador is None or _categorizador[0] is not mapeo:
+        _categorizador = (mapeo, AutomataPalabrasClave(mapeo), list(mapeo.values()))
+    return _categorizador[1], _categorizador[2]
 
 
 def determinar_categoria(operacion, nombre_empresa):
@@ -37,18 +228,17 @@ def determinar_categoria(operacion, nombre_empresa):
     if "NOMINA" in operacion:
         return "TRANSFERENCIAS", "NÓMINA"
 
-    # Buscar en el nombre de la empresa
-    nombre_empresa_upper = nombre_empresa.upper()
+    automata, resultados = obtener_categorizador()
 
-    for palabra, (categoria, subcategoria) in Mapeo_CATEGORIAS.items():
-        if palabra in nombre_empresa_upper:
-            return categoria, subcategoria
+    # Buscar en el nombre de la empresa
+    posicion = automata.buscar(nombre_empresa.upper())
+    if posicion is not None:
+        return resultados[posicion]
 
     # Buscar en la operación
-    operacion_upper = operacion.upper()
-    for palabra, (categoria, subcategoria) in Mapeo_CATEGORIAS.items():
-        if palabra in operacion_upper:
-            return categoria, subcategoria
+    posicion = automata.buscar(operacion.upper())
+    if posicion is not None:
+        return resultados[posicion]
 
     # Categorías por tipo de operación
     if "PAGO CON TARJETA" in operacion:
@@ -63,79 +253,327 @@ def determinar_categoria(operacion, nombre_empresa):
     return "OTROS", "VARIOS"
 
 
-def cargar_diccionario():
-    global _palabras_espanol
-    if _palabras_espanol is not None:
-        return _palabras_espanol
+_memo_categorias = None
 
-    _palabras_espanol = set()
-    directorio_dics = Path("dics")
 
-    if not directorio_dics.exists():
-        return set()
+def firma_categorias():
+    """Sello de la memoria de categorías: versión y hash de config_categorias.json"""
+    try:
+        return f"{VERSION_MEMO_CATEGORIAS}:{calcular_hash_archivo(RUTA_CONFIG_CATEGORIAS)}"
+    except OSError:
+        return f"{VERSION_MEMO_CATEGORIAS}:"
+
+
+def cargar_memo_categorias():
+    """Carga (una vez por proceso) la memoria de categorías.
 
-    for archivo_txt in directorio_dics.glob("*.txt"):
+    Si se guardó con otras reglas de categorización se descarta entera.
+    """
+    global _memo_categorias
+    if _memo_categorias is None:
+        firma = firma_categorias()
+        categorias = {}
+        try:
+            with open(RUTA_MEMO_CATEGORIAS, 'r', encoding='utf-8') as f:
+                memo = json.load(f)
+            if memo.get('firma') == firma:
+                categorias = memo['categorias']
+        except (OSError, ValueError, KeyError):
+            pass
+        _memo_categorias = {'firma': firma, 'categorias': categorias, 'nuevas': 0}
+    return _memo_categorias
+
+
+def categorizar(operacion, nombre_empresa):
+    """determinar_categoria con memoria persistente por pareja (operación, empresa).
+
+    Es la función que usan todos los importadores; las reglas sólo se evalúan
+    para las parejas que no están en la memoria.
+    """
+    memo = cargar_memo_categorias()
+    clave = f"{operacion}\x1f{nombre_empresa}"
+    resultado = memo['categorias'].get(clave)
+    if resultado is None:
+        resultado = list(determinar_categoria(operacion, nombre_empresa))
+        memo['categorias'][clave] = resultado
+        memo['nuevas'] += 1
+    return resultado[0], resultado[1]
+
+
+def guardar_memo_categorias():
+    """Guarda la memoria de categorías de forma atómica, si se ha añadido alguna pareja"""
+    memo = _memo_categorias
+    if memo is None or not memo['nuevas']:
+        return
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    ruta_temporal = f"{RUTA_MEMO_CATEGORIAS}.tmp"
+    with open(ruta_temporal, 'w', encoding='utf-8') as f:
+        json.dump({'firma': memo['firma'], 'categorias': memo['categorias']}, f, ensure_ascii=False)
+    os.replace(ruta_temporal, RUTA_MEMO_CATEGORIAS)
+    memo['nuevas'] = 0
+
+
+def firma_diccionario(directorio_dics=DIRECTORIO_DICS):
+    """Firma de los .txt del diccionario (nombre, tamaño y fecha de modificación)"""
+    sha = hashlib.sha256(f"v{VERSION_DICCIONARIO}".encode())
+    for archivo_txt in sorted(Path(directorio_dics).glob("*.txt")):
+        estado = archivo_txt.stat()
+        sha.update(f"{archivo_txt.name}:{estado.st_size}:{estado.st_mtime_ns};".encode())
+    return sha.hexdigest()
+
+
+def normalizar_entrada_diccionario(linea):
+    """Convierte una línea de los .txt en las palabras que pueden aparecer en un concepto.
+
+    - 'abacalero, ra' se expande en ABACALERO y ABACALERA
+    - los verbos añaden su participio regular: 'emitir' da EMITIDO y EMITIDA
+      (los plurales los prueba segmentar_concepto)
+    - se quita el número de acepción ('abalear1', 'acolchar 1')
+    - se eliminan las tildes (los extractos no las llevan), pero no la Ñ
+    - se descartan locuciones con espacios, que nunca coinciden con un concepto pegado
+    """
+    entrada = linea.strip().lower()
+    if not entrada:
+        return []
+
+    formas = [entrada]
+    if ',' in entrada:
+        base, sufijo = (parte.strip() for parte in entrada.split(',', 1))
+        formas = [base]
+        if sufijo and base:
+            if len(sufijo) == 1:
+                femenino = base[:-1] + sufijo if base[-1] in 'oe' else base + sufijo
+            else:
+                corte = base.rfind(sufijo[0], max(0, len(base) - len(sufijo) - 2))
+                femenino = base[:corte] + sufijo if corte > 0 else base + sufijo
+            formas.append(femenino)
+
+    palabras = []
+    for forma in formas:
+        forma = forma.rstrip('0123456789').strip()
+        forma = forma.translate(_SIN_TILDES).upper()
+        if len(forma) > 1 and ' ' not in forma:
+            palabras.append(forma)
+            if len(forma) > 3 and forma[-2:] in ('AR', 'ER', 'IR'):
+                participio = forma[:-2] + ('AD' if forma[-2:] == 'AR' else 'ID')
+                palabras.extend([participio + 'O', participio + 'A'])
+    return palabras
+
+
+_SIN_TILDES = str.maketrans('áéíóúàèìòùäëïöüâêîôû', 'aeiouaeiouaeiouaeiou')
+
+
+def compilar_diccionario(directorio_dics=DIRECTORIO_DICS):
+    """Normaliza los .txt del diccionario y los compila en un único bloque de bytes ordenado.
+
+    Formato: firma (64 bytes ASCII), número de palabras (uint32), 4 bytes de
+    relleno, tabla de n + 1 desplazamientos (uint32) y las palabras en UTF-8
+    concatenadas y ordenadas por bytes. Devuelve (número de palabras, bytes).
+    """
+    palabras = set()
+    for archivo_txt in sorted(Path(directorio_dics).glob("*.txt")):
         try:
             with open(archivo_txt, 'r', encoding='utf-8') as f:
                 for linea in f:
-                    palabra = linea.strip().upper()
-                    if palabra and len(palabra) > 1:
-                        _palabras_espanol.add(palabra)
+                    palabras.update(normalizar_entrada_diccionario(linea))
         except Exception:
             continue
 
+    palabras = sorted(palabra.encode('utf-8') for palabra in palabras)
+    desplazamientos = array('I', [0])
+    for palabra in palabras:
+        desplazamientos.append(desplazamientos[-1] + len(palabra))
+
+    return len(palabras), b"".join([firma_diccionario(directorio_dics).encode('ascii'),
+                                    struct.pack('<II', len(palabras), 0), desplazamientos.tobytes()] + palabras)
+
+
+def construir_diccionario(directorio_dics=DIRECTORIO_DICS, ruta_salida=RUTA_DICCIONARIO_COMPILADO):
+    """Compila el diccionario (ver compilar_diccionario) en ruta_salida y devuelve el número de palabras"""
+    total, datos = compilar_diccionario(directorio_dics)
+    os.makedirs(os.path.dirname(ruta_salida), exist_ok=True)
+    ruta_temporal = f"{ruta_salida}.tmp"
+    with open(ruta_temporal, 'wb') as f:
+        f.write(datos)
+    os.replace(ruta_temporal, ruta_salida)
+    return total
+
+
+class DiccionarioCompilado:
+    """Diccionario ordenado leído con mmap: cargarlo no copia ni procesa las palabras.
+
+    Admite `palabra in diccionario` mediante búsqueda binaria sobre la tabla
+    de desplazamientos. Con datos (los bytes de compilar_diccionario) se usa
+    ese bloque en memoria en lugar de leer ruta.
+    """
+
+    TAMAÑO_CABECERA = 72
+
+    def __init__(self, ruta, firma, datos=None):
+        if datos is None:
+            with open(ruta, 'rb') as f:
+                datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapa = datos
+        if self._mapa[:64] != firma.encode('ascii'):
+            if isinstance(self._mapa, mmap.mmap):
+                self._mapa.close()
+            raise ValueError("Diccionario compilado desactualizado")
+        self._total, _ = struct.unpack_from('<II', self._mapa, 64)
+        fin_tabla = self.TAMAÑO_CABECERA + 4 * (self._total + 1)
+        self._desplazamientos = memoryview(self._mapa)[self.TAMAÑO_CABECERA:fin_tabla].cast('I')
+        self._inicio_datos = fin_tabla
+
+    def __len__(self):
+        return self._total
+
+    def palabra(self, i):
+        """Palabra i-ésima (en bytes UTF-8)"""
+        inicio = self._inicio_datos
+        return self._mapa[inicio + self._desplazamientos[i]:inicio + self._desplazamientos[i + 1]]
+
+    def __contains__(self, palabra):
+        objetivo = palabra.encode('utf-8')
+        lo, hi = 0, self._total
+        while lo < hi:
+            medio = (lo + hi) // 2
+            actual = self.palabra(medio)
+            if actual < objetivo:
+                lo = medio + 1
+            elif actual > objetivo:
+                hi = medio
+            else:
+                return True
+        return False
+
+    def rango_prefijo(self, prefijo, lo=0, hi=None):
+        """Rango [lo, hi) de las palabras que empiezan por prefijo (bytes).
+
+        La búsqueda se limita a [lo, hi), que debe ser el rango de un prefijo
+        anterior de este mismo prefijo: así se desciende como por un trie.
+        """
+        if hi is None:
+            hi = self._total
+        n = len(prefijo)
+
+        # Primera palabra cuyo comienzo es >= prefijo
+        izquierda, derecha = lo, hi
+        while izquierda < derecha:
+            medio = (izquierda + derecha) // 2
+            if self.palabra(medio)[:n] < prefijo:
+                izquierda = medio + 1
+            else:
+                derecha = medio
+        inicio = izquierda
+
+        # Primera palabra cuyo comienzo es > prefijo
+        derecha = hi
+        while izquierda < derecha:
+            medio = (izquierda + derecha) // 2
+            if self.palabra(medio)[:n] <= prefijo:
+                izquierda = medio + 1
+            else:
+                derecha = medio
+        return inicio, izquierda
+
+    def finales_de_palabra(self, texto, inicio):
+        """Genera las posiciones fin tales que texto[inicio:fin] es una palabra (texto en bytes).
+
+        Recorre el texto carácter a carácter estrechando el rango de palabras
+        con ese prefijo y se detiene en cuanto ninguna palabra lo comparte.
+        """
+        lo, hi = 0, self._total
+        for fin in range(inicio + 1, len(texto) + 1):
+            prefijo = texto[inicio:fin]
+            lo, hi = self.rango_prefijo(prefijo, lo, hi)
+            if lo == hi:
+                return
+            if (fin == len(texto) or texto[fin] & 0xC0 != 0x80) and self.palabra(lo) == prefijo:
+                yield fin
+
+
+def cargar_diccionario(guardar=True):
+    """Carga el diccionario precompilado.
+
+    Si el archivo compilado no existe o los .txt han cambiado desde que se
+    generó, se vuelve a construir antes de cargarlo. Con guardar=False no se
+    escribe en .cache: se compila y se usa sólo en memoria.
+    """
+    global _palabras_espanol
+    if _palabras_espanol is not None:
+        return _palabras_espanol
+
+    if not Path(DIRECTORIO_DICS).exists():
+        return set()
+
+    firma = firma_diccionario()
+    try:
+        _palabras_espanol = DiccionarioCompilado(RUTA_DICCIONARIO_COMPILADO, firma)
+    except (OSError, ValueError):
+        if guardar:
+            construir_diccionario()
+            _palabras_espanol = DiccionarioCompilado(RUTA_DICCIONARIO_COMPILADO, firma)
+        else:
+            _palabras_espanol = DiccionarioCompilado(None, firma, compilar_diccionario()[1])
+
     return _palabras_espanol
 
 
+def cargar_reglas_bancarias():
+    """Carga las reglas de reescritura de conceptos bancarios desde el archivo JSON."""
+    try:
+        with open(RUTA_CONFIG_REGLAS, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return [(regla['patron'], regla['reemplazo']) for regla in config['reglas_bancarias']]
+    except Exception as e:
+        print(f"❌ Error cargando las reglas bancarias: {e}")
+        return []
+
+
+_reglas_compiladas = None
+
+
+def obtener_reglas_compiladas():
+    """Compila (una vez) cada regla en su propia expresión regular, en el orden del archivo.
+
+    Las reglas se aplican en cascada, cada una sobre el resultado de la
+    anterior, igual que los str.replace uno detrás de otro: un reemplazo
+    puede crear o romper la coincidencia de una regla posterior.
+    """
+    global _reglas_compiladas
+    if _reglas_compiladas is None:
+        _reglas_compiladas = [(re.compile(re.escape(patron)), reemplazo)
+                              for patron, reemplazo in cargar_reglas_bancarias() if patron]
+    return _reglas_compiladas
+
+
+def reescribir_con_reglas(texto):
+    """Aplica las reglas compiladas en cascada, sin quitar espacios"""
+    for expresion, reemplazo in obtener_reglas_compiladas():
+        texto = expresion.sub(lambda _, reemplazo=reemplazo: reemplazo, texto)
+    return texto
+
+
+@lru_cache(maxsize=4096)
 def aplicar_reglas_bancarias(texto):
     """Aplica reglas específicas para conceptos bancarios comunes"""
-    patrones = [
-        (r'ABONODENOMINAPOR', 'ABONO DENOMINA POR '),
-        (r'PAGOCONTARJETA', 'PAGO CON TARJETA '),
-        (r'ENRESTAURANTES', 'EN RESTAURANTES '),
-        (r'YCAFETERIAS', 'Y CAFETERIAS'),
-        (r'ENESPECTACULOS', 'EN ESPECTACULOS '),
-        (r'MUSEOSYDEPORTES', 'MUSEOS Y DEPORTES'),
-        (r'DECOMPRAS', 'DE COMPRAS '),
-        (r'ADISTANCIA', 'A DISTANCIA '),
-        (r'YSUSCRIPCIONES', 'Y SUSCRIPCIONES'),
-        (r'ADEUDOASUCARGO', 'ADEUDO A SU CARGO'),
-        (r'ENSUPERMERCADOS', 'EN SUPERMERCADOS'),
-        (r'DESERVICIOS', 'DE SERVICIOS '),
-        (r'VARIOS', 'VARIOS'),
-        (r'ENSECTORDEL', 'EN SECTOR DEL '),
-        (r'AUTOMOVIL', 'AUTOMOVIL'),
-        (r'RETEFECTIVO', 'RET EFECTIVO '),
-        (r'ADEBITOCONTARJ', 'A DEBITO CONTARJ '),
-        (r'ENCAJEROAUT', 'EN CAJERO AUT'),
-        (r'CARGOPORCOMPRA', 'CARGO POR COMPRA '),
-        (r'ENCOMERCIOS', 'EN COMERCIOS'),
-        (r'ABONODELINEM', 'ABONO DELINEM '),
-        (r'PAGODEDESEMPLEO', 'PAGO DE DESEMPLEO'),
-        (r'ENMODA', 'EN MODA '),
-        (r'CALZADOYCOMPLEMENTOS', 'CALZADO Y COMPLEMENTOS'),
-        (r'ENDEPORTES', 'EN DEPORTES '),
-        (r'YJUGUETES', 'Y JUGUETES'),
-        (r'ENDISCOS', 'EN DISCOS '),
-        (r'LIBROSFOTOS', 'LIBROS FOTOS '),
-        (r'YPC', 'Y PC'),
-        (r'ENHOGAR', 'EN HOGAR '),
-        (r'MUEBLESDECORACION', 'MUEBLES DECORACION '),
-        (r'YELECTR', 'Y ELECTR'),
-        (r'ENDROGUERIAS', 'EN DROGUERIAS '),
-        (r'YPERFUMERIAS', 'Y PERFUMERIAS'),
-        (r'COMISIONESPORSERVICIOS', 'COMISIONES POR SERVICIOS'),
-        (r'COMPRAENCOMERCIOEXTRANJERO', 'COMPRA EN COMERCIO EXTRANJERO '),
-        (r'COMISION3%INCLUIDA', 'COMISION 3% INCLUIDA'),
-        (r'ABONOBONIFICACION', 'ABONO BONIFICACION '),
-        (r'PACKVIAJES', 'PACK VIAJES'),
-    ]
+    return reescribir_con_reglas(texto).strip()
+
+
+def aplicar_reglas_bancarias_lote(textos):
+    """Aplica las reglas bancarias a una columna entera de conceptos.
 
-    resultado = texto
-    for patron, reemplazo in patrones:
-        resultado = resultado.replace(patron, reemplazo)
+    Los conceptos distintos se unen en un solo texto y cada regla se aplica
+    una vez sobre todo él; como ningún patrón contiene saltos de línea, el
+    resultado es el mismo que concepto a concepto. Después se reparte.
+    """
+    textos = list(textos)
+    distintos = list(dict.fromkeys(textos))
+    if any("\n" in texto for texto in distintos):
+        return [aplicar_reglas_bancarias(texto) for texto in textos]
 
-    return resultado.strip()
+    reescritos = reescribir_con_reglas("\n".join(distintos)).split("\n")
+    resultado = {texto: reescrito.strip() for texto, reescrito in zip(distintos, reescritos)}
+    return [resultado[texto] for texto in textos]
 
 
 def formatear_concepto(concepto):
@@ -153,32 +591,87 @@ def formatear_concepto(concepto):
         return concepto
 
     # Intentar con diccionario si no hay espacios
+    return segmentar_concepto(concepto)
+
+
+@lru_cache(maxsize=4096)
+def segmentar_concepto(concepto):
+    """Separa en palabras un concepto sin espacios usando el diccionario.
+
+    Programación dinámica sobre los fragmentos que empiezan en cada posición:
+    palabras del diccionario (o sus plurales en -S/-ES), recorriéndolo como un
+    trie, o tramos de caracteres desconocidos. Cada tramo desconocido cuesta
+    sus caracteres más PENALIZACION_DESCONOCIDO, y PENALIZACION_DESCONOCIDO_CORTO
+    si es más corto que LONGITUD_MINIMA_PALABRA: así se prefiere dejar entera
+    una palabra que no está en el diccionario antes que partirla en letras
+    sueltas y palabras cortas ('E MI T IDAS'). Las palabras más cortas
+    que LONGITUD_MINIMA_PALABRA sólo cuentan si están en PALABRAS_CORTAS. Se
+    elige la división de menor coste; a igualdad, la de menos fragmentos y
+    palabras más largas. Igual que antes, si el concepto no empieza por una
+    palabra conocida se devuelve sin cambios.
+
+    Los extractos repiten los mismos conceptos una y otra vez, así que el
+    resultado se guarda en una caché LRU.
+    """
     palabras_espanol = cargar_diccionario()
-    if palabras_espanol:
-        palabras_encontradas = []
-        i = 0
-        n = len(concepto)
-
-        while i < n:
-            encontrado = False
-            for longitud in range(min(10, n - i), 2, -1):
-                palabra = concepto[i:i + longitud]
-                if palabra in palabras_espanol:
-                    palabras_encontradas.append(palabra)
-                    i += longitud
-                    encontrado = True
-                    break
+    if not palabras_espanol:
+        return concepto
 
-            if not encontrado:
-                if i == 0:
-                    return concepto
-                else:
-                    palabras_encontradas.append(concepto[i:])
-                    break
+    texto = concepto.encode('utf-8')
+    n = len(texto)
+    inicios = [i for i in range(n + 1) if i == n or texto[i] & 0xC0 != 0x80]  # sin bytes intermedios UTF-8
+    caracteres = {posicion: numero for numero, posicion in enumerate(inicios)}
+
+    # mejor[i] = (coste de texto[i:], fin del primer fragmento, es palabra), con
+    # coste = (penalización, fragmentos, -suma de longitudes al cuadrado)
+    mejor = {n: ((0, 0, 0), n, True)}
+    for k in range(len(inicios) - 2, -1, -1):
+        i = inicios[k]
+        candidato = None
+
+        # Opción 1: un tramo desconocido texto[i:fin], seguido de una palabra o del final
+        for fin in inicios[k + 1:]:
+            (penalizacion, fragmentos, puntos), _, es_palabra = mejor[fin]
+            if not es_palabra:
+                continue
+            longitud = caracteres[fin] - caracteres[i]
+            penalizacion += longitud + PENALIZACION_DESCONOCIDO
+            if longitud < LONGITUD_MINIMA_PALABRA:
+                penalizacion += PENALIZACION_DESCONOCIDO_CORTO
+            opcion = ((penalizacion, fragmentos + 1, puntos), fin, False)
+            if candidato is None or opcion[0] < candidato[0]:
+                candidato = opcion
+
+        # Opción 2: una palabra del diccionario (o su plural) que empieza en i
+        finales = set(palabras_espanol.finales_de_palabra(texto, i))
+        finales.update(i + len(corta) for corta in PALABRAS_CORTAS if texto.startswith(corta.encode(), i))
+        for fin in sorted(finales):
+            longitud = caracteres[fin] - caracteres[i]
+            corta = longitud < LONGITUD_MINIMA_PALABRA
+            if corta and texto[i:fin].decode('utf-8') not in PALABRAS_CORTAS:
+                continue
+            for sufijo in (b'',) if corta else (b'', b'S', b'ES'):
+                if not texto.startswith(sufijo, fin):
+                    continue
+                final = fin + len(sufijo)
+                (penalizacion, fragmentos, puntos), _, _ = mejor[final]
+                total = longitud + len(sufijo)
+                opcion = ((penalizacion, fragmentos + 1, puntos - total * total), final, True)
+                if opcion[0] < candidato[0]:
+                    candidato = opcion
+        mejor[i] = candidato
+
+    if not mejor[0][2]:
+        return concepto
 
-        return " ".join(palabras_encontradas)
+    fragmentos = []
+    i = 0
+    while i < n:
+        _, fin, _ = mejor[i]
+        fragmentos.append(texto[i:fin].decode('utf-8'))
+        i = fin
 
-    return concepto
+    return " ".join(fragmentos)
 
 
 def separar_empresa(detalle):
@@ -186,33 +679,23 @@ def separar_empresa(detalle):
     if not detalle:
         return "", ""
 
-    # Patrones para identificar IDs
-    patrones_id = [
-        r'^\d{16}',  # 16 dígitos (tarjeta)
-        r'^N\d{13}',  # N + 13 dígitos (N20251950006340)
-        r'^\d{12}',  # 12 dígitos
-        r'^\d{9}',  # 9 dígitos
-    ]
-
     id_empresa = ""
     nombre_empresa = detalle
 
-    for patron in patrones_id:
-        match = re.match(patron, detalle)
-        if match:
-            id_empresa = match.group()
-            nombre_empresa = detalle[len(id_empresa):].strip()
-            break
+    match = PATRON_ID_EMPRESA.match(detalle)
+    if match:
+        id_empresa = match.group()
+        nombre_empresa = detalle[len(id_empresa):].strip()
 
     # Si no se encontró patrón numérico, verificar si es solo nombre
     if not id_empresa:
         # Si parece ser solo un nombre (sin números al inicio)
-        if not re.match(r'^\d', detalle):
+        if not PATRON_DIGITO_INICIAL.match(detalle):
             id_empresa = ""
             nombre_empresa = detalle
         else:
             # Intentar separar por el primer grupo de letras después de números
-            match = re.match(r'^(\d+)([A-Z].*)', detalle)
+            match = PATRON_ID_Y_NOMBRE.match(detalle)
             if match:
                 id_empresa = match.group(1)
                 nombre_empresa = match.group(2).strip()
@@ -222,6 +705,7 @@ def separar_empresa(detalle):
 
 def extraer_texto_pdf(ruta_pdf):
     """Extrae texto de un PDF"""
+    import pdfplumber
     try:
         with pdfplumber.open(ruta_pdf) as pdf:
             texto_total = f"ARCHIVO: {ruta_pdf.name}\n"
@@ -233,117 +717,1609 @@ def extraer_texto_pdf(ruta_pdf):
         return f"ARCHIVO: {ruta_pdf.name}\nERROR\n"
 
 
+def contar_paginas_pdf(ruta_pdf):
+    """Devuelve el número de páginas de un PDF (0 si no se puede abrir)"""
+    import pdfplumber
+    try:
+        with pdfplumber.open(ruta_pdf) as pdf:
+            return len(pdf.pages)
+    except Exception:
+        return 0
+
+
+def textos_pdfplumber(ruta_pdf, inicio=0, fin=None):
+    """Genera el texto de las páginas [inicio, fin) de un PDF con pdfplumber"""
+    import pdfplumber
+    with pdfplumber.open(ruta_pdf) as pdf:
+        for pagina in pdf.pages[inicio:fin]:
+            yield pagina.extract_text() or ""
+
+
+def caracteres_pagina_pdfium(pagina, area=AREA_TABLA):
+    """Devuelve los caracteres (top, x0, x1, texto) de una página de pypdfium2 dentro de area.
+
+    x0 y top salen de la caja del carácter, igual que en pdfplumber. x1 se
+    calcula con el ancho del glifo, porque la caja de las fuentes cursivas
+    sobresale y taparía el hueco entre dos palabras.
+    """
+    import ctypes
+    import pypdfium2.raw as pdfium_c
+
+    alto = pagina.get_height()
+    ancho_glifo = ctypes.c_float()
+    caracteres = []
+    textpage = pagina.get_textpage()
+    try:
+        for i in range(textpage.count_chars()):
+            # Los saltos de línea y espacios que inventa pdfium no están en el PDF
+            if pdfium_c.FPDFText_IsGenerated(textpage.raw, i):
+                continue
+            x0, _, x1, y1 = textpage.get_charbox(i, loose=True)
+            top = alto - y1
+            if not area[0] <= top <= area[1]:
+                continue
+            codigo = pdfium_c.FPDFText_GetUnicode(textpage.raw, i)
+            fuente = pdfium_c.FPDFTextObj_GetFont(pdfium_c.FPDFText_GetTextObject(textpage.raw, i))
+            tamaño = ctypes.c_float(pdfium_c.FPDFText_GetFontSize(textpage.raw, i))
+            if pdfium_c.FPDFFont_GetGlyphWidth(fuente, codigo, tamaño, ancho_glifo):
+                x1 = x0 + ancho_glifo.value
+            caracteres.append((top, x0, x1, chr(codigo)))
+    finally:
+        textpage.close()
+    return caracteres
+
+
+def componer_texto_pagina(caracteres):
+    """Une caracteres (top, x0, x1, texto) en líneas y palabras como pagina.extract_text() de pdfplumber"""
+    # Agrupar en líneas los top que están a menos de TOLERANCIA_Y del anterior
+    linea_de_top = {}
+    num_lineas = 0
+    anterior = None
+    for top in sorted({caracter[0] for caracter in caracteres}):
+        if anterior is not None and top > anterior + TOLERANCIA_Y:
+            num_lineas += 1
+        linea_de_top[top] = num_lineas
+        anterior = top
+
+    lineas = [[] for _ in range(num_lineas + 1)]
+    for caracter in caracteres:
+        lineas[linea_de_top[caracter[0]]].append(caracter)
+
+    texto_lineas = []
+    for linea in lineas:
+        linea.sort(key=lambda caracter: caracter[1])
+        palabras = []
+        palabra = []
+        previo = None
+        for caracter in linea:
+            top, x0, _, texto = caracter
+            if texto.isspace():
+                if palabra:
+                    palabras.append(''.join(palabra))
+                palabra = []
+                previo = None
+                continue
+            if previo is not None and (x0 < previo[1] or x0 > previo[2] + TOLERANCIA_X
+                                       or abs(top - previo[0]) > TOLERANCIA_Y):
+                palabras.append(''.join(palabra))
+                palabra = []
+            palabra.append(texto)
+            previo = caracter
+        if palabra:
+            palabras.append(''.join(palabra))
+        if palabras:
+            texto_lineas.append(' '.join(palabras))
+    return '\n'.join(texto_lineas)
+
+
+def textos_rapido(ruta_pdf, inicio=0, fin=None):
+    """Genera el texto de las páginas [inicio, fin) de un PDF leyendo solo su capa de texto con pypdfium2"""
+    import pypdfium2
+    pdf = pypdfium2.PdfDocument(str(ruta_pdf))
+    try:
+        total = len(pdf)
+        for i in range(inicio, total if fin is None else min(fin, total)):
+            pagina = pdf[i]
+            try:
+                yield componer_texto_pagina(caracteres_pagina_pdfium(pagina))
+            finally:
+                pagina.close()
+    finally:
+        pdf.close()
+
+
+EXTRACTORES = {
+    'pdfplumber': textos_pdfplumber,
+    'rapido': textos_rapido,
+}
+
+
+def extraer_paginas_pdf(tarea):
+    """Extrae el texto de un rango de páginas [inicio, fin) de un PDF.
+
+    Se ejecuta dentro de los procesos del pool, por eso recibe y devuelve
+    tuplas sencillas que se puedan serializar.
+    """
+    ruta_pdf, inicio, fin, extractor = tarea
+    t0 = time.perf_counter()
+    try:
+        textos = list(EXTRACTORES[extractor](ruta_pdf, inicio, fin))
+    except Exception:
+        textos = None
+    return ruta_pdf, inicio, textos, time.perf_counter() - t0, os.getpid()
+
+
+def planificar_tareas(archivos_pdf, paginas_por_tarea=PAGINAS_POR_TAREA, extractor=EXTRACTOR_POR_DEFECTO):
+    """Divide cada PDF en rangos de páginas, en orden de archivo y página"""
+    tareas = []
+    for archivo_pdf in archivos_pdf:
+        total = contar_paginas_pdf(archivo_pdf)
+        if total <= paginas_por_tarea:
+            tareas.append((archivo_pdf, 0, max(total, 1), extractor))
+            continue
+        for inicio in range(0, total, paginas_por_tarea):
+            tareas.append((archivo_pdf, inicio, min(inicio + paginas_por_tarea, total), extractor))
+    return tareas
+
+
+def clave_extracto(archivo_pdf):
+    """Ruta absoluta de un PDF: lo identifica aunque otra carpeta tenga uno con el mismo nombre"""
+    return str(Path(archivo_pdf).resolve())
+
+
+def iterar_paginas_pdf(archivos_pdf, extractor=EXTRACTOR_POR_DEFECTO):
+    """Genera (ruta absoluta del archivo, número de página, texto) leyendo los PDFs página a página"""
+    for archivo_pdf in archivos_pdf:
+        try:
+            for i, texto_pagina in enumerate(EXTRACTORES[extractor](archivo_pdf), 1):
+                yield clave_extracto(archivo_pdf), i, texto_pagina
+        except Exception:
+            print(f"❌ Error leyendo {archivo_pdf.name}")
+
+
+def iterar_paginas_paralelo(archivos_pdf, procesos=None, paginas_por_tarea=PAGINAS_POR_TAREA,
+                            estadisticas=None, extractor=EXTRACTOR_POR_DEFECTO):
+    """Como iterar_paginas_pdf, pero repartiendo archivos y páginas en un pool de procesos.
+
+    Las páginas salen en el mismo orden de archivo y página que en serie. Si se
+    pasa un diccionario en estadisticas, se rellena con {pid: [páginas, segundos]}.
+
+    Sólo hay TAREAS_POR_PROCESO tareas en vuelo por proceso: cada vez que se
+    entrega una se envía la siguiente, así que los textos ya extraídos que aún
+    no se han consumido no crecen con el número de PDFs.
+    """
+    if estadisticas is None:
+        estadisticas = {}
+    tareas = iter(planificar_tareas(archivos_pdf, paginas_por_tarea, extractor))
+    procesos = procesos or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        # Ventana de futuros en el orden de las tareas, aunque terminen desordenadas
+        en_vuelo = deque(pool.submit(extraer_paginas_pdf, tarea)
+                         for tarea in itertools.islice(tareas, TAREAS_POR_PROCESO * procesos))
+        while en_vuelo:
+            ruta_pdf, inicio, textos, segundos, pid = en_vuelo.popleft().result()
+            for tarea in itertools.islice(tareas, 1):
+                en_vuelo.append(pool.submit(extraer_paginas_pdf, tarea))
+            if textos is None:
+                if inicio == 0:
+                    print(f"❌ Error leyendo {ruta_pdf.name}")
+                continue
+            estadisticas.setdefault(pid, [0, 0.0])
+            estadisticas[pid][0] += len(textos)
+            estadisticas[pid][1] += segundos
+            for i, texto_pagina in enumerate(textos, inicio + 1):
+                yield clave_extracto(ruta_pdf), i, texto_pagina
+
+
+def iterar_paginas_texto(texto_completo):
+    """Genera (archivo, número de página, texto) a partir del texto concatenado de extraer_texto_pdf"""
+    for archivo in texto_completo.split("ARCHIVO: ")[1:]:
+        nombre = archivo.split("\n", 1)[0]
+        for i, pagina in enumerate(archivo.split("--- PÁGINA")[1:], 1):
+            yield nombre, i, pagina
+
+
+def mostrar_rendimiento_workers(estadisticas):
+    """Muestra el rendimiento (páginas/s) de cada proceso del pool"""
+    for pid, (num_paginas, segundos) in sorted(estadisticas.items()):
+        ritmo = num_paginas / segundos if segundos > 0 else 0
+        print(f"⚙️  Proceso {pid}: {num_paginas} páginas en {segundos:.2f}s ({ritmo:.1f} páginas/s)")
+
+
+_instrumentacion = None
+
+
+class Instrumentacion:
+    """Tiempos de reloj y de CPU por etapa, archivo y página, y contadores de una ingesta.
+
+    Sólo existe si se activa con activar_instrumentacion(). El pipeline mira
+    _instrumentacion una vez por etapa o por página, nunca por fila, así que
+    desactivada no cuesta nada. Con varios procesos, el tiempo de CPU de la
+    extracción es el del proceso principal esperando al pool.
+    """
+
+    def __init__(self):
+        self.reloj_inicio = time.perf_counter()
+        self.cpu_inicio = time.process_time()
+        self.fecha = datetime.now()
+        self.etapas = {}
+        self.archivos = {}
+        self.paginas = {}
+        self.caches_inicio = self.estado_caches()
+
+    @staticmethod
+    def estado_caches():
+        return {'segmentar_concepto': segmentar_concepto.cache_info(),
+                'aplicar_reglas_bancarias': aplicar_reglas_bancarias.cache_info()}
+
+    @contextlib.contextmanager
+    def etapa(self, nombre):
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.sumar_etapa(nombre, time.perf_counter() - t0, time.process_time() - c0)
+
+    def sumar_etapa(self, nombre, reloj, cpu):
+        etapa = self.etapas.setdefault(nombre, {'reloj': 0.0, 'cpu': 0.0})
+        etapa['reloj'] += reloj
+        etapa['cpu'] += cpu
+
+    def archivo(self, nombre):
+        return self.archivos.setdefault(nombre, {
+            'paginas': 0, 'extraccion_reloj': 0.0, 'extraccion_cpu': 0.0, 'procesado_reloj': 0.0,
+            'procesado_cpu': 0.0, 'lineas': 0, 'lineas_movimiento': 0, 'operaciones': 0, 'sin_categoria': 0
+        })
+
+    def pagina(self, archivo, num_pagina):
+        return self.paginas.setdefault((archivo, num_pagina), {
+            'archivo': archivo, 'pagina': num_pagina, 'extraccion_reloj': 0.0, 'extraccion_cpu': 0.0,
+            'procesado_reloj': 0.0, 'procesado_cpu': 0.0, 'lineas': 0, 'lineas_movimiento': 0
+        })
+
+    def sumar(self, archivo, num_pagina, campo, valor):
+        self.archivo(archivo)[campo] += valor
+        self.pagina(archivo, num_pagina)[campo] += valor
+
+    def medir_extraccion(self, paginas):
+        """Envuelve un iterador de páginas apuntando lo que tarda en llegar cada una"""
+        iterador = iter(paginas)
+        while True:
+            t0, c0 = time.perf_counter(), time.process_time()
+            pagina = next(iterador, None)
+            reloj, cpu = time.perf_counter() - t0, time.process_time() - c0
+            if pagina is None:
+                return
+            archivo, num_pagina, _ = pagina
+            self.sumar_etapa('extraccion', reloj, cpu)
+            self.archivo(archivo)['paginas'] += 1
+            self.sumar(archivo, num_pagina, 'extraccion_reloj', reloj)
+            self.sumar(archivo, num_pagina, 'extraccion_cpu', cpu)
+            yield pagina
+
+    def medir_procesado(self, paginas):
+        """Envuelve un iterador de páginas apuntando lo que tarda quien las consume
+        (parseo, limpieza y categorización) en pedir la siguiente"""
+        for pagina in paginas:
+            archivo, num_pagina, _ = pagina
+            t0, c0 = time.perf_counter(), time.process_time()
+            yield pagina
+            reloj, cpu = time.perf_counter() - t0, time.process_time() - c0
+            self.sumar_etapa('procesado', reloj, cpu)
+            self.sumar(archivo, num_pagina, 'procesado_reloj', reloj)
+            self.sumar(archivo, num_pagina, 'procesado_cpu', cpu)
+
+    def registrar_lineas(self, archivo, num_pagina, texto, movimientos):
+        self.sumar(archivo, num_pagina, 'lineas', texto.count('\n') + 1)
+        self.sumar(archivo, num_pagina, 'lineas_movimiento', movimientos)
+
+    def registrar_operaciones(self, archivo, operaciones):
+        datos = self.archivo(archivo)
+        datos['operaciones'] += len(operaciones)
+        datos['sin_categoria'] += sum(1 for operacion in operaciones
+                                      if operacion['categoria'] == 'OTROS' and operacion['subcategoria'] == 'VARIOS')
+
+    def informe(self):
+        """Diccionario serializable a JSON con todo lo medido hasta ahora"""
+        caches = {}
+        for nombre, fin in self.estado_caches().items():
+            inicio = self.caches_inicio[nombre]
+            aciertos, fallos = fin.hits - inicio.hits, fin.misses - inicio.misses
+            caches[nombre] = {'aciertos': aciertos, 'fallos': fallos,
+                              'tasa_aciertos': round(aciertos / (aciertos + fallos), 4) if aciertos + fallos else None}
+
+        contadores = {'archivos': len(self.archivos)}
+        for campo in ('paginas', 'lineas', 'lineas_movimiento', 'operaciones', 'sin_categoria'):
+            contadores[campo] = sum(datos[campo] for datos in self.archivos.values())
+
+        def redondear(datos):
+            return {campo: round(valor, 6) if isinstance(valor, float) else valor for campo, valor in datos.items()}
+
+        return {
+            'version': VERSION_INFORME,
+            'fecha': self.fecha.isoformat(timespec='seconds'),
+            'reloj': round(time.perf_counter() - self.reloj_inicio, 6),
+            'cpu': round(time.process_time() - self.cpu_inicio, 6),
+            'etapas': {nombre: redondear(etapa) for nombre, etapa in self.etapas.items()},
+            'contadores': contadores,
+            'caches': caches,
+            'archivos': {nombre: redondear(datos) for nombre, datos in self.archivos.items()},
+            'paginas': [redondear(datos) for datos in self.paginas.values()]
+        }
+
+
+def activar_instrumentacion():
+    """Empieza a medir la ingesta en este proceso y devuelve la Instrumentacion"""
+    global _instrumentacion
+    _instrumentacion = Instrumentacion()
+    return _instrumentacion
+
+
+def medir_etapa(nombre):
+    """Contexto que mide una etapa si la instrumentación está activa; si no, no hace nada"""
+    if _instrumentacion is None:
+        return contextlib.nullcontext()
+    return _instrumentacion.etapa(nombre)
+
+
+def guardar_informe(informe, ruta=RUTA_INFORME_INGESTA):
+    """Guarda el informe de una ingesta en JSON de forma atómica"""
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    ruta_temporal = f"{ruta}.tmp"
+    with open(ruta_temporal, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+    os.replace(ruta_temporal, ruta)
+
+
+def resumen_informe(informe):
+    """Una línea con lo principal del informe: tiempos por etapa, contadores y cachés"""
+    etapas = " · ".join(f"{nombre} {etapa['reloj']:.2f}s" for nombre, etapa in informe['etapas'].items())
+    contadores = informe['contadores']
+    segmentacion = informe['caches']['segmentar_concepto']['tasa_aciertos']
+    partes = [
+        f"⏱️  {informe['reloj']:.2f}s (CPU {informe['cpu']:.2f}s)",
+        etapas,
+        f"{contadores['archivos']} archivos, {contadores['paginas']} páginas",
+        f"{contadores['lineas_movimiento']}/{contadores['lineas']} líneas con movimiento",
+        f"{contadores['operaciones']} operaciones, {contadores['sin_categoria']} sin categoría",
+        f"segmentación {segmentacion:.0%} en caché" if segmentacion is not None else "segmentación sin uso",
+    ]
+    return " | ".join(parte for parte in partes if parte)
+
+
+def parsear_pagina(pagina, año, mes):
+    """Genera los Movimiento de una página con una sola pasada de PATRON_MOVIMIENTO.
+
+    Cada coincidencia incluye la línea del movimiento y, si la hay, su línea
+    de detalle, con las mismas reglas que el recorrido línea a línea.
+    """
+    for match in PATRON_MOVIMIENTO.finditer(pagina):
+        f_oper, f_valor, concepto, importe, saldo, detalle = match.groups()
+        yield Movimiento(año, mes, f_oper, f_valor, concepto, importe, saldo, detalle or "")
+
+
+def iterar_movimientos(paginas):
+    """Genera los movimientos en bruto (Movimiento) encontrados en cada página."""
+    archivo_actual = None
+    mes = "DESCONOCIDO"
+    año = "DESCONOCIDO"
+
+    for archivo, num_pagina, pagina in paginas:
+        if archivo != archivo_actual:
+            archivo_actual = archivo
+            mes = "DESCONOCIDO"
+            año = "DESCONOCIDO"
+
+        # Extraer mes y año (la cabecera se repite en todas las páginas)
+        mes_match = PATRON_MES.search(pagina)
+        if mes_match:
+            mes, año = mes_match.groups()
+
+        if _instrumentacion is None:
+            yield from parsear_pagina(pagina, año, mes)
+        else:
+            movimientos = list(parsear_pagina(pagina, año, mes))
+            _instrumentacion.registrar_lineas(archivo, num_pagina, pagina, len(movimientos))
+            yield from movimientos
+
+
+def limpiar_movimiento(año, mes, f_oper, f_valor, concepto, importe, saldo, detalle):
+    """Limpia y categoriza un movimiento. Devuelve la tupla de valores en el orden de COLUMNAS o None"""
+    # Separar empresa en ID y Nombre
+    id_empresa, nombre_empresa = separar_empresa(detalle)
+
+    # Procesar BIZUM
+    concepto_bizum = ""
+    operacion_limpia = formatear_concepto(concepto)
+    id_empresa_limpio = id_empresa
+    nombre_empresa_limpio = nombre_empresa
+
+    if "BIZUM" in concepto and detalle:
+        for prefijo in ["RECIBIDO:", "ENVIADO:", "COMPRA:"]:
+            if prefijo in detalle:
+                partes = detalle.split(prefijo, 1)
+                if len(partes) > 1:
+                    concepto_bizum = partes[1].strip()
+                break
+        operacion_limpia = "BIZUM"
+        id_empresa_limpio = ""
+        nombre_empresa_limpio = ""
+
+    # Determinar categoría y subcategoría
+    categoria, subcategoria = categorizar(operacion_limpia, nombre_empresa_limpio)
+
+    # Limpiar importe y saldo (quitar puntos de miles)
+    importe_limpio = importe.replace('.', '').replace(',', '.')
+    saldo_limpio = saldo.replace('.', '').replace(',', '.')
+
+    try:
+        importe_float = float(importe_limpio)
+        saldo_float = float(saldo_limpio)
+    except ValueError as e:
+        print(f"❌ Error convirtiendo números en línea: {f_oper} {f_valor} {concepto} {importe} {saldo}")
+        print(f"   Importe: {importe} -> {importe_limpio}")
+        print(f"   Saldo: {saldo} -> {saldo_limpio}")
+        print(f"   Error: {e}")
+        return None
+
+    tipo = "INGRESO" if importe_float > 0 else "GASTO"
+
+    return (año, mes, f_oper, f_valor, operacion_limpia, id_empresa_limpio, nombre_empresa_limpio, concepto_bizum,
+            categoria, subcategoria, tipo, abs(importe_float), saldo_float)
+
+
+def construir_operacion(año, mes, f_oper, f_valor, concepto, importe, saldo, detalle):
+    """Limpia y categoriza un movimiento. Devuelve el diccionario de la operación o None"""
+    valores = limpiar_movimiento(año, mes, f_oper, f_valor, concepto, importe, saldo, detalle)
+    return dict(zip(COLUMNAS, valores)) if valores is not None else None
+
+
+def iterar_operaciones(paginas):
+    """Pipeline página → movimientos → operaciones categorizadas, sin acumular nada en memoria"""
+    for movimiento in iterar_movimientos(paginas):
+        operacion = construir_operacion(*movimiento)
+        if operacion is not None:
+            yield operacion
+
+
+class ColumnasOperaciones:
+    """Acumula operaciones por columnas en lugar de como lista de diccionarios.
+
+    importe y saldo van en array('d'). Cada columna de texto se guarda
+    codificada por diccionario: un array('i') de códigos más los valores
+    distintos en orden de aparición, así que 'MAYO', '2025' o 'COMIDA' se
+    guardan una sola vez. a_dataframe() monta el DataFrame a partir de los
+    buffers, sin convertir fila a fila.
+    """
+
+    COLUMNAS_NUMERICAS = ('importe', 'saldo')
+
+    def __init__(self, columnas=COLUMNAS):
+        self.columnas = list(columnas)
+        self.datos = []
+        self.valores = []
+        for columna in self.columnas:
+            numerica = columna in self.COLUMNAS_NUMERICAS
+            self.datos.append(array('d') if numerica else array('i'))
+            self.valores.append(None if numerica else {})
+        self._obtener = itemgetter(*self.columnas)
+        # (append del buffer, diccionario de valores o None) por columna
+        self._destinos = [(datos.append, valores) for datos, valores in zip(self.datos, self.valores)]
+
+    def __len__(self):
+        return len(self.datos[0]) if self.datos else 0
+
+    def agregar(self, valores):
+        """Añade una operación dada como tupla en el orden de las columnas"""
+        for (agregar, distintos), valor in zip(self._destinos, valores):
+            if distintos is None:
+                agregar(valor)
+            else:
+                agregar(distintos.setdefault(valor, len(distintos)))
+
+    def agregar_operacion(self, operacion):
+        """Añade una operación dada como diccionario (p. ej. las del manifiesto)"""
+        self.agregar(self._obtener(operacion))
+
+    def filas(self, orden=None):
+        """Genera las operaciones como diccionarios, en el orden en que se añadieron o en el
+        de las posiciones de orden"""
+        distintos = [None if valores is None else list(valores) for valores in self.valores]
+        columnas = list(zip(self.columnas, self.datos, distintos))
+        for i in range(len(self)) if orden is None else orden:
+            yield {columna: datos[i] if valores is None else valores[datos[i]]
+                   for columna, datos, valores in columnas}
+
+    def a_dataframe(self, categoricas=COLUMNAS_CATEGORICAS):
+        """DataFrame con las columnas de categoricas como Categorical (a partir de los
+        códigos) y el resto de textos como object"""
+        import numpy as np
+        import pandas as pd
+
+        columnas = {}
+        for columna, datos, valores in zip(self.columnas, self.datos, self.valores):
+            if valores is None:
+                columnas[columna] = np.frombuffer(datos, dtype=np.float64).copy()
+                continue
+            codigos = np.frombuffer(datos, dtype=f'i{datos.itemsize}')
+            distintos = np.array(list(valores), dtype=object)
+            if columna in categoricas:
+                columnas[columna] = pd.Categorical.from_codes(codigos.copy(), categories=distintos)
+            else:
+                columnas[columna] = distintos[codigos]
+        return pd.DataFrame(columnas, columns=self.columnas)
+
+
+def iterar_valores_operaciones(paginas):
+    """Como iterar_operaciones, pero genera tuplas en el orden de COLUMNAS en lugar de diccionarios"""
+    for movimiento in iterar_movimientos(paginas):
+        valores = limpiar_movimiento(*movimiento)
+        if valores is not None:
+            yield valores
+
+
+def columnas_operaciones(paginas):
+    """Pipeline página → movimientos → ColumnasOperaciones, sin diccionarios por fila"""
+    columnas = ColumnasOperaciones()
+    for valores in iterar_valores_operaciones(paginas):
+        columnas.agregar(valores)
+    return columnas
+
+
 def procesar_operaciones(texto_completo):
-    """Procesa operaciones bancarias desde texto extraído"""
-    archivos = texto_completo.split("ARCHIVO: ")[1:]
-    operaciones = []
-
-    for archivo in archivos:
-        # Extraer mes y año
-        mes_match = re.search(r'EXTRACTODE(\w+)2025', archivo)
-        mes = mes_match.group(1) if mes_match else "DESCONOCIDO"
-        año = "2025"
-
-        for pagina in archivo.split("--- PÁGINA")[1:]:
-            lineas = pagina.split('\n')
-            i = 0
-
-            while i < len(lineas):
-                linea = lineas[i].strip()
-
-                # Patrón MUCHO más simple y flexible
-                patron = r'^(\d{2}/\d{2})\s+(\d{2}/\d{2})\s+([A-Z].*?)\s+(-?[\d.,]+)\s+(-?[\d.,]+)$'
-                match = re.match(patron, linea)
-
-                if match:
-                    f_oper, f_valor, concepto, importe, saldo = match.groups()
-
-                    # Buscar detalle en siguiente línea
-                    detalle = ""
-                    if i + 1 < len(lineas):
-                        siguiente = lineas[i + 1].strip()
-                        if (siguiente and
-                                not re.match(r'^\d{2}/\d{2}', siguiente) and
-                                not re.match(r'^SALDO', siguiente) and
-                                not re.match(r'^Todoslosimportes', siguiente) and
-                                not re.match(r'^F\d+', siguiente) and
-                                len(siguiente) > 5):
-                            detalle = siguiente
-                            i += 1
-
-                    # Separar empresa en ID y Nombre
-                    id_empresa, nombre_empresa = separar_empresa(detalle)
-
-                    # Procesar BIZUM
-                    concepto_bizum = ""
-                    operacion_limpia = formatear_concepto(concepto)
-                    id_empresa_limpio = id_empresa
-                    nombre_empresa_limpio = nombre_empresa
-
-                    if "BIZUM" in concepto and detalle:
-                        for prefijo in ["RECIBIDO:", "ENVIADO:", "COMPRA:"]:
-                            if prefijo in detalle:
-                                partes = detalle.split(prefijo, 1)
-                                if len(partes) > 1:
-                                    concepto_bizum = partes[1].strip()
-                                break
-                        operacion_limpia = "BIZUM"
-                        id_empresa_limpio = ""
-                        nombre_empresa_limpio = ""
-
-                    # Determinar categoría y subcategoría
-                    categoria, subcategoria = determinar_categoria(operacion_limpia, nombre_empresa_limpio)
-
-                    # Limpiar importe y saldo (quitar puntos de miles)
-                    importe_limpio = importe.replace('.', '').replace(',', '.')
-                    saldo_limpio = saldo.replace('.', '').replace(',', '.')
-
-                    try:
-                        importe_float = float(importe_limpio)
-                        saldo_float = float(saldo_limpio)
-                        tipo = "INGRESO" if importe_float > 0 else "GASTO"
-
-                        operaciones.append({
-                            'año': año,
-                            'mes': mes,
-                            'fecha_operacion': f_oper,
-                            'fecha_valor': f_valor,
-                            'operacion': operacion_limpia,
-                            'id_empresa': id_empresa_limpio,
-                            'nombre_empresa': nombre_empresa_limpio,
-                            'concepto': concepto_bizum,
-                            'categoria': categoria,
-                            'subcategoria': subcategoria,
-                            'tipo': tipo,
-                            'importe': abs(importe_float),
-                            'saldo': saldo_float
-                        })
-                    except ValueError as e:
-                        print(f"❌ Error convirtiendo números en línea: {linea}")
-                        print(f"   Importe: {importe} -> {importe_limpio}")
-                        print(f"   Saldo: {saldo} -> {saldo_limpio}")
-                        print(f"   Error: {e}")
-
-                i += 1
-
-    return operaciones
+    """Procesa operaciones bancarias desde texto extraído. Devuelve un DataFrame con las COLUMNAS"""
+    return columnas_operaciones(iterar_paginas_texto(texto_completo)).a_dataframe()
+
+
+def escribir_operaciones_csv(operaciones, ruta_csv, columnas=COLUMNAS):
+    """Escribe las operaciones en el CSV a medida que llegan.
+
+    Se escribe en un archivo temporal que sólo sustituye al CSV final si hay
+    al menos una operación. Devuelve el número de filas escritas.
+    """
+    ruta_temporal = f"{ruta_csv}.tmp"
+    filas = 0
+    with open(ruta_temporal, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columnas, lineterminator='\n')
+        writer.writeheader()
+        for operacion in operaciones:
+            writer.writerow(operacion)
+            filas += 1
+
+    if filas:
+        os.replace(ruta_temporal, ruta_csv)
+    else:
+        os.remove(ruta_temporal)
+    return filas
+
+
+def pyarrow_disponible():
+    """Indica si está instalado pyarrow, necesario para el almacén Feather"""
+    import importlib.util
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def tabla_operaciones(operaciones, columnas=COLUMNAS):
+    """Convierte las operaciones en un DataFrame con los tipos que usa AnalizadorGastos.
+
+    mes pasa a número, fecha_operacion a datetime (con el mismo formato '%d/%m'
+    que al leer el CSV), los textos vacíos a NaN y las columnas de texto
+    repetitivo a categóricas.
+    """
+    import pandas as pd
+
+    if isinstance(operaciones, pd.DataFrame):
+        df = operaciones[columnas].copy()
+    else:
+        df = pd.DataFrame(list(operaciones), columns=columnas)
+    df['año'] = pd.to_numeric(df['año'], errors='coerce').astype('Int16')
+    df['mes'] = df['mes'].map({nombre: numero for numero, nombre in enumerate(MESES, 1)}).astype('Int8')
+    df['fecha_operacion'] = pd.to_datetime(df['fecha_operacion'], format='%d/%m')
+    # Los textos vacíos quedan como NaN, igual que al leer el CSV con pandas
+    for columna in ['fecha_valor', 'id_empresa', 'nombre_empresa', 'concepto', 'subcategoria'] + COLUMNAS_CATEGORICAS:
+        df[columna] = df[columna].astype(str).mask(df[columna].isna() | (df[columna] == ''))
+    df['importe'] = pd.to_numeric(df['importe'], errors='coerce')
+    df['saldo'] = pd.to_numeric(df['saldo'], errors='coerce')
+    df.dropna(subset=['importe'], inplace=True)
+    for columna in COLUMNAS_CATEGORICAS:
+        df[columna] = df[columna].astype('category')
+    return df.reset_index(drop=True)
+
+
+def periodos_operaciones(df):
+    """Columnas (año, número de mes) de un DataFrame de operaciones; 0 donde no se conocen"""
+    import pandas as pd
+
+    año = pd.to_numeric(df['año'], errors='coerce').fillna(0).astype(int)
+    mes = df['mes'].map({nombre: numero for numero, nombre in enumerate(MESES, 1)}).fillna(0).astype(int)
+    return año, mes
+
+
+def cargar_catalogo(ruta_catalogo=RUTA_CATALOGO):
+    """Carga el catálogo de particiones; si no existe o es de otra versión, devuelve uno vacío"""
+    try:
+        with open(ruta_catalogo, 'r', encoding='utf-8') as f:
+            catalogo = json.load(f)
+        if catalogo.get('version') == VERSION_CATALOGO:
+            return catalogo
+    except (OSError, ValueError):
+        pass
+    return {'version': VERSION_CATALOGO, 'particiones': []}
+
+
+def escribir_particiones(operaciones, directorio=DIRECTORIO_PARTICIONES):
+    """Guarda las operaciones en una partición por año y mes y actualiza el catálogo.
+
+    operaciones puede ser un iterable de diccionarios o un DataFrame con
+    COLUMNAS. Cada partición es <año>/<mes>.feather, con los tipos de
+    tabla_operaciones, o <año>/<mes>.csv si no está pyarrow, más la columna
+    posicion (fila en el CSV completo) para poder reconstruir el orden
+    original. Sólo se reescriben las particiones cuyo contenido ha cambiado
+    (según el hash del catálogo) y se borran las de meses que ya no tienen
+    operaciones. El catálogo se escribe el último y de forma atómica. Devuelve
+    el número de particiones reescritas.
+    """
+    import pandas as pd
+
+    ruta_catalogo = os.path.join(directorio, 'catalogo.json')
+    anterior = {(p['año'], p['mes']): p for p in cargar_catalogo(ruta_catalogo)['particiones']}
+    extension = '.feather' if pyarrow_disponible() else '.csv'
+
+    if not isinstance(operaciones, pd.DataFrame):
+        operaciones = pd.DataFrame(list(operaciones), columns=COLUMNAS)
+    df = operaciones[COLUMNAS].copy()
+    df.insert(0, 'posicion', range(len(df)))
+
+    particiones = []
+    reescritas = 0
+    for (año, mes), parte in df.groupby(list(periodos_operaciones(df)), sort=True):
+        archivo = f"{año:04d}/{mes:02d}{extension}"
+        huella = hashlib.sha256(pd.util.hash_pandas_object(parte, index=False).to_numpy().tobytes()).hexdigest()
+        previa = anterior.get((año, mes))
+        ruta = os.path.join(directorio, archivo)
+        if not previa or previa['hash'] != huella or previa['archivo'] != archivo or not os.path.exists(ruta):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            ruta_temporal = f"{ruta}.tmp"
+            if extension == '.feather':
+                import pyarrow.feather as feather
+                feather.write_feather(tabla_operaciones(parte, ['posicion'] + COLUMNAS), ruta_temporal,
+                                      compression='uncompressed')
+            else:
+                parte.to_csv(ruta_temporal, index=False, encoding='utf-8', lineterminator='\n')
+            os.replace(ruta_temporal, ruta)
+            reescritas += 1
+        particiones.append({'año': int(año), 'mes': int(mes), 'archivo': archivo, 'filas': len(parte),
+                            'hash': huella})
+
+    os.makedirs(directorio, exist_ok=True)
+    ruta_temporal = f"{ruta_catalogo}.tmp"
+    with open(ruta_temporal, 'w', encoding='utf-8') as f:
+        json.dump({'version': VERSION_CATALOGO, 'particiones': particiones}, f, ensure_ascii=False, indent=2)
+    os.replace(ruta_temporal, ruta_catalogo)
+
+    vigentes = {p['archivo'] for p in particiones}
+    for previa in anterior.values():
+        if previa['archivo'] not in vigentes:
+            try:
+                os.remove(os.path.join(directorio, previa['archivo']))
+            except OSError:
+                pass
+    return reescritas
+
+
+def calcular_hash_archivo(ruta):
+    """SHA-256 del contenido de un archivo"""
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def cargar_manifiesto():
+    """Carga el manifiesto de ingesta; si no existe o es de otra versión, devuelve uno vacío"""
+    try:
+        with open(RUTA_MANIFIESTO, 'r', encoding='utf-8') as f:
+            manifiesto = json.load(f)
+        if manifiesto.get('version') == VERSION_MANIFIESTO:
+            return manifiesto
+    except (OSError, ValueError):
+        pass
+    return manifiesto_vacio()
+
+
+def manifiesto_vacio():
+    return {'version': VERSION_MANIFIESTO, 'firma_reglas': None, 'archivos': {}, 'salida': [], 'fusionados': {},
+            'generacion_almacen': 0}
+
+
+def firma_reglas():
+    """Hash de las reglas (categorías y reescritura de conceptos) usadas para generar
+    las operaciones guardadas"""
+    firmas = []
+    for ruta in (RUTA_CONFIG_CATEGORIAS, RUTA_CONFIG_REGLAS):
+        try:
+            firmas.append(calcular_hash_archivo(ruta))
+        except OSError:
+            firmas.append("")
+    return ":".join(firmas)
+
+
+class AlmacenExtractos:
+    """Textos de página y operaciones de los extractos, en dos archivos JSON Lines de sólo añadir.
+
+    Cada línea de paginas_extractos.<generación>.jsonl es el texto de una
+    página y cada línea de operaciones_extractos.<generación>.jsonl la lista
+    de valores de una operación en el orden de COLUMNAS. El manifiesto sólo
+    guarda, por extracto y lote fusionado, el rango de bytes [inicio, fin)
+    de sus páginas y operaciones, así que ni él ni la ingesta tienen que
+    tener en memoria los textos ni las operaciones de todos los PDFs.
+
+    Lo que se reprocesa o se olvida queda como bytes muertos hasta que
+    compactar() copia lo vivo a la generación siguiente; la anterior se
+    borra con borrar_generaciones_antiguas() después de guardar el manifiesto.
+    """
+
+    TIPOS = ('paginas', 'operaciones')
+
+    def __init__(self, manifiesto):
+        self.manifiesto = manifiesto
+        self.directorio = DIRECTORIO_CACHE
+        self._archivos = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+    @property
+    def generacion(self):
+        return self.manifiesto.setdefault('generacion_almacen', 0)
+
+    def ruta(self, tipo, generacion=None):
+        generacion = self.generacion if generacion is None else generacion
+        return os.path.join(self.directorio, f"{tipo}_extractos.{generacion}.jsonl")
+
+    def _archivo(self, tipo):
+        if tipo not in self._archivos:
+            os.makedirs(self.directorio, exist_ok=True)
+            self._archivos[tipo] = open(self.ruta(tipo), 'ab')
+        return self._archivos[tipo]
+
+    def posicion(self, tipo):
+        """Posición del final del archivo de tipo, donde empezará lo próximo que se añada"""
+        return self._archivo(tipo).tell()
+
+    def añadir(self, tipo, registro):
+        self._archivo(tipo).write(json.dumps(registro, ensure_ascii=False).encode('utf-8') + b'\n')
+
+    def escribir(self, tipo, registros):
+        """Añade los registros al final del archivo de tipo y devuelve su rango [inicio, fin)"""
+        inicio = self.posicion(tipo)
+        for registro in registros:
+            self.añadir(tipo, registro)
+        return [inicio, self.posicion(tipo)]
+
+    def escribir_operaciones(self, operaciones):
+        """Como escribir, para operaciones dadas como diccionarios"""
+        obtener = itemgetter(*COLUMNAS)
+        return self.escribir('operaciones', (list(obtener(operacion)) for operacion in operaciones))
+
+    def leer(self, tipo, rango):
+        """Genera los registros del rango [inicio, fin) del archivo de tipo"""
+        if tipo in self._archivos:
+            self._archivos[tipo].flush()
+        inicio, fin = rango
+        with open(self.ruta(tipo), 'rb') as f:
+            f.seek(inicio)
+            restante = fin - inicio
+            while restante > 0:
+                linea = f.readline()
+                restante -= len(linea)
+                yield json.loads(linea)
+
+    def leer_operaciones(self, rango):
+        """Como leer, pero genera las operaciones como diccionarios"""
+        for valores in self.leer('operaciones', rango):
+            yield dict(zip(COLUMNAS, valores))
+
+    def rangos(self):
+        """(tipo, registro del manifiesto) de cada rango en uso"""
+        for entrada in self.manifiesto['archivos'].values():
+            yield 'paginas', entrada
+            yield 'operaciones', entrada
+        for lote in self.manifiesto.get('fusionados', {}).values():
+            yield 'operaciones', lote
+
+    def compactar(self):
+        """Copia lo que sigue en uso a la generación siguiente si los bytes muertos superan
+        a los vivos. Devuelve True si ha compactado."""
+        vivos = sum(fin - inicio for tipo, registro in self.rangos() for inicio, fin in [registro[tipo]])
+        total = 0
+        for tipo in self.TIPOS:
+            if tipo in self._archivos:
+                total += self.posicion(tipo)
+            elif os.path.exists(self.ruta(tipo)):
+                total += os.path.getsize(self.ruta(tipo))
+        if total - vivos <= vivos:
+            return False
+
+        self.cerrar()
+        siguiente = self.generacion + 1
+        # a+b para leer creando el archivo si aún no existe (p. ej. sin páginas, sólo lotes)
+        origenes = {tipo: open(self.ruta(tipo), 'a+b') for tipo in self.TIPOS}
+        destinos = {tipo: open(self.ruta(tipo, siguiente), 'wb') for tipo in self.TIPOS}
+        try:
+            for tipo, registro in self.rangos():
+                inicio, fin = registro[tipo]
+                origenes[tipo].seek(inicio)
+                registro[tipo] = [destinos[tipo].tell(), destinos[tipo].tell() + fin - inicio]
+                destinos[tipo].write(origenes[tipo].read(fin - inicio))
+        finally:
+            for archivo in itertools.chain(origenes.values(), destinos.values()):
+                archivo.close()
+        self.manifiesto['generacion_almacen'] = siguiente
+        return True
+
+    def borrar_generaciones_antiguas(self):
+        """Borra los archivos de generaciones que ya no usa el manifiesto guardado"""
+        vigentes = {os.path.basename(self.ruta(tipo)) for tipo in self.TIPOS}
+        for ruta in Path(self.directorio).glob('*_extractos.*.jsonl'):
+            if ruta.name not in vigentes:
+                with contextlib.suppress(OSError):
+                    ruta.unlink()
+
+    def cerrar(self):
+        for archivo in self._archivos.values():
+            archivo.close()
+        self._archivos = {}
+
+
+def reprocesar_manifiesto(manifiesto, almacen):
+    """Regenera las operaciones guardadas a partir de los textos de página del almacén,
+    sin volver a abrir los PDFs (p. ej. al cambiar las reglas de categorización)."""
+    for entrada in manifiesto['archivos'].values():
+        textos = almacen.leer('paginas', entrada['paginas'])
+        paginas = ((entrada['nombre'], i, texto) for i, texto in enumerate(textos, 1))
+        entrada['operaciones'] = almacen.escribir_operaciones(iterar_operaciones(paginas))
+    # Los lotes fusionados no tienen páginas: sólo se vuelven a categorizar
+    for lote in manifiesto.get('fusionados', {}).values():
+        def recategorizar(operaciones):
+            for operacion in operaciones:
+                operacion['categoria'], operacion['subcategoria'] = categorizar(operacion['operacion'],
+                                                                                operacion['nombre_empresa'])
+                yield operacion
+        operaciones = almacen.leer_operaciones(lote['operaciones'])
+        lote['operaciones'] = almacen.escribir_operaciones(recategorizar(operaciones))
+    manifiesto['salida'] = []
+
+
+def guardar_manifiesto(manifiesto):
+    """Guarda el manifiesto de forma atómica"""
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    ruta_temporal = f"{RUTA_MANIFIESTO}.tmp"
+    with open(ruta_temporal, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False)
+    os.replace(ruta_temporal, RUTA_MANIFIESTO)
+
+
+def procesar_pendientes(paginas, pendientes, manifiesto, almacen):
+    """Parsea las páginas de los PDFs nuevos o modificados y añade al almacén sus textos
+    y operaciones a medida que llegan; el manifiesto sólo guarda sus rangos.
+
+    pendientes es un diccionario {ruta absoluta del archivo: hash}.
+    """
+    for nombre, paginas_archivo in itertools.groupby(paginas, key=lambda pagina: pagina[0]):
+        inicio_paginas = almacen.posicion('paginas')
+
+        def registrar(paginas_archivo=paginas_archivo):
+            for pagina in paginas_archivo:
+                almacen.añadir('paginas', pagina[2])
+                yield pagina
+
+        if _instrumentacion is None:
+            rango_operaciones = almacen.escribir_operaciones(iterar_operaciones(registrar()))
+        else:
+            operaciones = list(iterar_operaciones(_instrumentacion.medir_procesado(registrar())))
+            _instrumentacion.registrar_operaciones(nombre, operaciones)
+            rango_operaciones = almacen.escribir_operaciones(operaciones)
+        manifiesto['archivos'][pendientes[nombre]] = {
+            'nombre': nombre,
+            'paginas': [inicio_paginas, almacen.posicion('paginas')],
+            'operaciones': rango_operaciones
+        }
+
+
+@lru_cache(maxsize=8192)
+def fecha_completa(año, mes, fecha_operacion):
+    """'aaaa-mm-dd' de una operación a partir del año y mes del extracto y su fecha dd/mm.
+
+    Un movimiento de diciembre que sale en el extracto de enero es del año
+    anterior al del extracto.
+    """
+    dia, mes_operacion = fecha_operacion.split('/')
+    año = int(año)
+    if mes in MESES and int(mes_operacion) > MESES.index(mes) + 1:
+        año -= 1
+    return f"{año:04d}-{mes_operacion}-{dia}"
+
+
+@lru_cache(maxsize=8192)
+def normalizar_comercio(texto):
+    """Comercio en mayúsculas, sin tildes y sólo con letras y números"""
+    texto = unicodedata.normalize('NFKD', texto.upper())
+    return PATRON_NO_ALFANUMERICO.sub('', texto)
+
+
+def clave_operacion(operacion):
+    """Clave de deduplicación (fecha, importe con signo en céntimos, saldo en céntimos)
+    y comercio normalizado de una operación"""
+    importe = round(float(operacion['importe']) * 100)
+    if operacion['tipo'] != 'INGRESO':
+        importe = -importe
+    clave = (fecha_completa(operacion['año'], operacion['mes'], operacion['fecha_operacion']), importe,
+             round(float(operacion['saldo']) * 100))
+    return clave, normalizar_comercio(str(operacion['nombre_empresa'] or ''))
+
+
+class IndiceOperaciones:
+    """Índice hash de las operaciones ya fusionadas, para descartar duplicados en O(1).
+
+    La clave es (fecha, importe con signo, saldo): con el saldo acumulado, dos
+    movimientos distintos prácticamente nunca la comparten. Para cada clave
+    se guardan los comercios normalizados ya vistos; dos operaciones son la
+    misma si además un comercio es prefijo del otro o alguno está vacío,
+    porque los PDF y Movimientos.csv no escriben el comercio igual.
+    """
+
+    def __init__(self):
+        self.claves = {}
+        self.descartadas = []
+
+    def __len__(self):
+        return sum(len(vistos) for vistos in self.claves.values())
+
+    def buscar(self, clave, comercio):
+        """Origen (fuente, posición) de la operación ya indexada que coincide, o None"""
+        for comercio_visto, origen in self.claves.get(clave, ()):
+            if (not comercio or not comercio_visto or comercio.startswith(comercio_visto)
+                    or comercio_visto.startswith(comercio)):
+                return origen
+        return None
+
+    def fusionar(self, operaciones, fuente):
+        """Genera las operaciones de un lote que no están ya en el índice y las añade.
+
+        Las descartadas se apuntan en self.descartadas junto con la operación
+        con la que coinciden, para poder explicar qué se ha quitado.
+        """
+        for posicion, operacion in enumerate(operaciones, 1):
+            clave, comercio = clave_operacion(operacion)
+            origen = self.buscar(clave, comercio)
+            if origen is not None:
+                self.descartadas.append({'fuente': fuente, 'posicion': posicion, 'fecha': clave[0],
+                                         'importe': clave[1] / 100, 'saldo': clave[2] / 100,
+                                         'comercio': operacion['nombre_empresa'] or operacion['operacion'],
+                                         'duplicada_de': origen[0], 'posicion_original': origen[1]})
+                continue
+            self.claves.setdefault(clave, []).append((comercio, (fuente, posicion)))
+            yield operacion
+
+
+def iterar_operaciones_almacen(hashes, manifiesto, almacen, indice, nombres=None):
+    """Genera las operaciones de los PDFs (en el orden de hashes) y de los lotes fusionados,
+    sin duplicados, leyéndolas del almacén extracto a extracto.
+
+    nombres son las rutas de archivo de cada hash, para explicar los
+    duplicados (dos copias de un PDF comparten entrada en el manifiesto).
+    Si hay lotes fusionados (p. ej. Movimientos.csv) el resultado se ordena
+    por fecha, de forma estable, para intercalarlos con los extractos; para
+    eso se acumula por columnas en ColumnasOperaciones.
+    """
+    def fusionadas():
+        for i, hash_pdf in enumerate(hashes):
+            entrada = manifiesto['archivos'].get(hash_pdf)
+            if entrada:
+                yield from indice.fusionar(almacen.leer_operaciones(entrada['operaciones']),
+                                           nombres[i] if nombres else entrada['nombre'])
+        for lote in lotes:
+            yield from indice.fusionar(almacen.leer_operaciones(lote['operaciones']), lote['nombre'])
+
+    lotes = manifiesto.get('fusionados', {}).values()
+    if not lotes:
+        yield from fusionadas()
+        return
+
+    columnas = ColumnasOperaciones()
+    fechas = []
+    for operacion in fusionadas():
+        columnas.agregar_operacion(operacion)
+        fechas.append(fecha_completa(operacion['año'], operacion['mes'], operacion['fecha_operacion']))
+    yield from columnas.filas(sorted(range(len(fechas)), key=fechas.__getitem__))
+
+
+def mostrar_duplicados(descartadas, limite=20):
+    """Explica las operaciones descartadas por duplicadas y guarda la lista completa en CSV"""
+    print(f"🧹 {len(descartadas)} operaciones duplicadas descartadas (lista completa en {RUTA_CSV_DUPLICADOS})")
+    for fila in descartadas[:limite]:
+        print(f"   {fila['fecha']} {fila['importe']:>10.2f}€ saldo {fila['saldo']:>10.2f}€ "
+              f"{str(fila['comercio'])[:25]:25} {fila['fuente']} #{fila['posicion']} "
+              f"= {fila['duplicada_de']} #{fila['posicion_original']}")
+    if len(descartadas) > limite:
+        print(f"   ... y {len(descartadas) - limite} más")
+
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    with open(RUTA_CSV_DUPLICADOS, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(descartadas[0]), lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(descartadas)
+
+
+def escribir_almacen(manifiesto, hashes, almacen, nombres=None):
+    """Escribe el CSV de operaciones y las particiones a partir del almacén, sin duplicados.
+
+    Las operaciones van del almacén al CSV según se leen (la etapa
+    escritura_csv incluye la fusión) y a la vez se acumulan por columnas
+    para las particiones. Devuelve el número de operaciones escritas.
+    """
+    indice = IndiceOperaciones()
+    columnas = ColumnasOperaciones()
+
+    def acumular(operaciones):
+        for operacion in operaciones:
+            columnas.agregar_operacion(operacion)
+            yield operacion
+
+    with medir_etapa('escritura_csv'):
+        filas = escribir_operaciones_csv(acumular(iterar_operaciones_almacen(hashes, manifiesto, almacen,
+                                                                             indice, nombres)),
+                                         RUTA_CSV_OPERACIONES)
+    if indice.descartadas:
+        mostrar_duplicados(indice.descartadas)
+
+    if filas:
+        with medir_etapa('particiones'):
+            reescritas = escribir_particiones(columnas.a_dataframe())
+        print(f"🗂️  Particiones por mes actualizadas: {reescritas}")
+    return filas
+
+
+def fusionar_movimientos(operaciones, ruta_csv):
+    """Añade al almacén de operaciones las de un CSV de movimientos importado, sin duplicados.
+
+    El lote se guarda en el manifiesto (por el hash del archivo, así que
+    importar dos veces el mismo CSV no duplica nada) para que las siguientes
+    ingestas de PDFs lo conserven.
+    """
+    operaciones = operaciones.dropna(subset=['importe'])
+    manifiesto = cargar_manifiesto()
+    with AlmacenExtractos(manifiesto) as almacen:
+        manifiesto.setdefault('fusionados', {})[calcular_hash_archivo(ruta_csv)] = {
+            'nombre': os.path.basename(ruta_csv),
+            'operaciones': almacen.escribir('operaciones', operaciones[COLUMNAS].astype(object).values.tolist())
+        }
+        filas = escribir_almacen(manifiesto, manifiesto['salida'], almacen)
+    almacen.compactar()
+    guardar_manifiesto(manifiesto)
+    almacen.borrar_generaciones_antiguas()
+    print(f"✅ {len(operaciones)} movimientos de {ruta_csv} fusionados: {filas} operaciones en el almacén")
+
+
+def validar_extractor(archivos_pdf, extractor='rapido', referencia='pdfplumber'):
+    """Comprueba que extractor saca las mismas operaciones que referencia en cada PDF.
+
+    Muestra el resultado y el tiempo de extracción de cada archivo y devuelve
+    True si todos coinciden.
+    """
+    todos_iguales = True
+    tiempos = {referencia: 0.0, extractor: 0.0}
+    for archivo_pdf in archivos_pdf:
+        operaciones = {}
+        for nombre in (referencia, extractor):
+            t0 = time.perf_counter()
+            paginas = list(iterar_paginas_pdf([archivo_pdf], nombre))
+            tiempos[nombre] += time.perf_counter() - t0
+            operaciones[nombre] = list(iterar_operaciones(paginas))
+
+        esperadas, obtenidas = operaciones[referencia], operaciones[extractor]
+        if esperadas == obtenidas:
+            print(f"✅ {archivo_pdf.name}: {len(obtenidas)} operaciones iguales")
+            continue
+
+        todos_iguales = False
+        print(f"❌ {archivo_pdf.name}: {len(obtenidas)} operaciones con {extractor}, "
+              f"{len(esperadas)} con {referencia}")
+        for esperada, obtenida in itertools.zip_longest(esperadas, obtenidas):
+            if esperada != obtenida:
+                print(f"   {referencia}: {esperada}")
+                print(f"   {extractor}: {obtenida}")
+                break
+
+    print(f"⏱️  {referencia}: {tiempos[referencia]:.2f}s, {extractor}: {tiempos[extractor]:.2f}s")
+    return todos_iguales
+
+
+def categorizar_columnas(operacion, nombre_empresa):
+    """Categoriza columnas enteras de operación y empresa.
+
+    Cada pareja distinta pasa una sola vez por categorizar y el resultado se
+    reparte a todas las filas con numpy. Devuelve dos arrays (categoría,
+    subcategoría) alineados con las columnas de entrada.
+    """
+    import numpy as np
+    import pandas as pd
+
+    parejas = pd.MultiIndex.from_arrays([operacion, nombre_empresa])
+    codigos, distintas = pd.factorize(parejas)
+    categorias = [categorizar(op, empresa) for op, empresa in distintas]
+    categoria = np.array([c for c, _ in categorias], dtype=object)[codigos]
+    subcategoria = np.array([s for _, s in categorias], dtype=object)[codigos]
+    return categoria, subcategoria
+
+
+def recategorizar_operaciones(ruta_csv=RUTA_CSV_OPERACIONES):
+    """Vuelve a aplicar las reglas de categorización al histórico ya guardado, sin abrir los PDFs.
+
+    Trabaja por columnas sobre el CSV completo y sólo modifica las filas cuyo
+    resultado cambia; después reescribe el CSV y las particiones afectadas y
+    muestra cuánto dinero cambia de categoría. Devuelve el número de
+    operaciones modificadas.
+    """
+    import pandas as pd
+
+    t0 = time.perf_counter()
+    df = pd.read_csv(ruta_csv, dtype=str, keep_default_na=False, encoding='utf-8')
+    categoria, subcategoria = categorizar_columnas(df['operacion'], df['nombre_empresa'])
+    cambia = ((df['categoria'].to_numpy(dtype=object) != categoria) |
+              (df['subcategoria'].to_numpy(dtype=object) != subcategoria))
+
+    if not cambia.any():
+        print(f"✅ Ninguna de las {len(df)} operaciones cambia de categoría")
+        return 0
+
+    cambios = pd.DataFrame({
+        'antes': df['categoria'][cambia].to_numpy(dtype=object),
+        'subcategoria_antes': df['subcategoria'][cambia].to_numpy(dtype=object),
+        'despues': categoria[cambia],
+        'subcategoria_despues': subcategoria[cambia],
+        'importe': pd.to_numeric(df['importe'][cambia]).to_numpy()
+    })
+    df.loc[cambia, 'categoria'] = categoria[cambia]
+    df.loc[cambia, 'subcategoria'] = subcategoria[cambia]
+
+    ruta_temporal = f"{ruta_csv}.tmp"
+    df.to_csv(ruta_temporal, index=False, encoding='utf-8', lineterminator='\n')
+    os.replace(ruta_temporal, ruta_csv)
+
+    # Con importe y saldo numéricos, como en el manifiesto, sólo cambia el hash
+    # de las particiones que tienen filas recategorizadas
+    df['importe'] = pd.to_numeric(df['importe'])
+    df['saldo'] = pd.to_numeric(df['saldo'])
+    reescritas = escribir_particiones(df)
+    guardar_memo_categorias()
+
+    print(f"🔁 {len(cambios)} de {len(df)} operaciones cambian de categoría "
+          f"({reescritas} particiones reescritas, {time.perf_counter() - t0:.2f}s)")
+    mostrar_diferencias_categorias(cambios)
+    return len(cambios)
+
+
+def mostrar_diferencias_categorias(cambios):
+    """Muestra los cambios de categoría y el importe que entra y sale de cada una"""
+    import pandas as pd
+
+    def etiqueta(categoria, subcategoria):
+        return f"{categoria}/{subcategoria}" if subcategoria else categoria
+
+    transiciones = cambios.groupby(['antes', 'subcategoria_antes', 'despues', 'subcategoria_despues'])['importe'] \
+        .agg(['count', 'sum']) \
+        .sort_values('sum', ascending=False)
+    for (antes, sub_antes, despues, sub_despues), fila in transiciones.iterrows():
+        print(f"  {etiqueta(antes, sub_antes):30} → {etiqueta(despues, sub_despues):30} "
+              f"{int(fila['count']):>5} op. {fila['sum']:>10.2f}€")
+
+    sale = cambios.groupby('antes')['importe'].sum()
+    entra = cambios.groupby('despues')['importe'].sum()
+    balance = pd.DataFrame({'sale': sale, 'entra': entra}).fillna(0)
+    balance['neto'] = balance['entra'] - balance['sale']
+
+    print(f"\n  {'Categoría':20} {'Sale':>11} {'Entra':>11} {'Neto':>11}")
+    print("  " + "-" * 56)
+    for categoria, fila in balance.sort_values('neto').iterrows():
+        print(f"  {categoria:20} {-fila['sale'] or 0.0:>10.2f}€ {fila['entra']:>+10.2f}€ {fila['neto']:>+10.2f}€")
+
+
+def importar_movimientos_csv(ruta_csv):
+    """Importa el CSV de movimientos exportado por CaixaBank ('Movimientos.csv').
+
+    El formato tiene dos líneas de preámbulo, columnas separadas por ';',
+    fechas dd/mm/aaaa, coma decimal y punto de miles, y viene ordenado del más
+    reciente al más antiguo. Todo se calcula por columnas con pandas; las
+    reglas bancarias y la categorización se aplican una vez por valor distinto.
+    Devuelve un DataFrame con las columnas de operaciones.csv en orden cronológico.
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(ruta_csv, sep=';', skiprows=2, decimal=',', thousands='.', encoding='utf-8',
+                     dtype={'Fecha': str, 'Fecha valor': str, 'Movimiento': str, 'Más dato': str})
+    df = df.iloc[::-1].reset_index(drop=True)
+
+    fecha = pd.to_datetime(df['Fecha'], format='%d/%m/%Y')
+    fecha_valor = pd.to_datetime(df['Fecha valor'], format='%d/%m/%Y')
+    movimiento = df['Movimiento'].fillna('').str.strip()
+    mas_dato = df['Más dato'].fillna('').str.strip()
+    importe = pd.to_numeric(df['Importe'], errors='coerce')
+    saldo = pd.to_numeric(df['Saldo'], errors='coerce')
+
+    # BIZUM: la operación es BIZUM y el concepto es el texto libre, como en los PDF
+    es_bizum = movimiento.str.upper().str.startswith('BIZUM')
+    # En los pagos con tarjeta, 'Más dato' sólo repite la fecha de la operación
+    mas_dato = mas_dato.mask(mas_dato.str.startswith('Fecha de operación'), '')
+
+    operacion = pd.Series(aplicar_reglas_bancarias_lote(movimiento.str.upper()), index=df.index)
+    operacion = operacion.mask(es_bizum, 'BIZUM')
+    nombre_empresa = movimiento.mask(es_bizum, '')
+
+    categoria, subcategoria = categorizar_columnas(operacion, nombre_empresa)
+
+    resultado = pd.DataFrame({
+        'año': fecha.dt.year.astype(str),
+        'mes': np.array(MESES, dtype=object)[fecha.dt.month.to_numpy() - 1],
+        'fecha_operacion': fecha.dt.strftime('%d/%m'),
+        'fecha_valor': fecha_valor.dt.strftime('%d/%m'),
+        'operacion': operacion,
+        'id_empresa': '',
+        'nombre_empresa': nombre_empresa,
+        'concepto': mas_dato,
+        'categoria': categoria,
+        'subcategoria': subcategoria,
+        'tipo': np.where(importe > 0, 'INGRESO', 'GASTO'),
+        'importe': importe.abs(),
+        'saldo': saldo
+    })
+    return resultado[COLUMNAS]
+
+
+def ingerir_extractos(archivos_pdf, procesos=1, paginas_por_tarea=PAGINAS_POR_TAREA,
+                      extractor=EXTRACTOR_POR_DEFECTO, sin_cache=False):
+    """Procesa los extractos nuevos o modificados de archivos_pdf y actualiza el CSV de
+    operaciones, las particiones por mes, el almacén de extractos, el manifiesto y la
+    memoria de categorías."""
+    with medir_etapa('manifiesto'):
+        manifiesto = cargar_manifiesto()
+        if sin_cache:
+            # Los lotes fusionados no salen de los PDFs, así que se conservan (con la
+            # generación del almacén en la que están sus operaciones)
+            manifiesto = dict(manifiesto_vacio(), fusionados=manifiesto.get('fusionados', {}),
+                              generacion_almacen=manifiesto.get('generacion_almacen', 0))
+        almacen = AlmacenExtractos(manifiesto)
+        firma = firma_reglas()
+        if manifiesto['archivos'] and manifiesto.get('firma_reglas') != firma:
+            print("🔄 Reglas de categorización modificadas: regenerando operaciones guardadas")
+            reprocesar_manifiesto(manifiesto, almacen)
+        manifiesto['firma_reglas'] = firma
+        # Por ruta absoluta: dos carpetas pueden tener PDFs distintos con el mismo nombre
+        claves = [clave_extracto(archivo_pdf) for archivo_pdf in archivos_pdf]
+        hashes = {clave: calcular_hash_archivo(clave) for clave in claves}
+    orden_hashes = [hashes[clave] for clave in claves]
+
+    pendientes = [archivo_pdf for archivo_pdf, clave in zip(archivos_pdf, claves)
+                  if hashes[clave] not in manifiesto['archivos']]
+
+    if (not pendientes and manifiesto['salida'] == orden_hashes and os.path.exists(RUTA_CSV_OPERACIONES)
+            and os.path.exists(RUTA_CATALOGO)):
+        almacen.cerrar()
+        print("✅ Sin extractos nuevos ni modificados")
+        return
+
+    estadisticas = {}
+    with almacen:
+        if pendientes:
+            print(f"📄 Procesando {len(pendientes)} de {len(archivos_pdf)} extractos")
+            if procesos == 1:
+                paginas = iterar_paginas_pdf(pendientes, extractor)
+            else:
+                paginas = iterar_paginas_paralelo(pendientes, procesos or None, paginas_por_tarea, estadisticas,
+                                                  extractor)
+            if _instrumentacion is not None:
+                paginas = _instrumentacion.medir_extraccion(paginas)
+            procesar_pendientes(paginas, {clave: hashes[clave] for clave in map(clave_extracto, pendientes)},
+                                manifiesto, almacen)
+
+        # Olvidar los extractos que ya no están en la carpeta
+        manifiesto['archivos'] = {h: manifiesto['archivos'][h] for h in orden_hashes if h in manifiesto['archivos']}
+
+        if escribir_almacen(manifiesto, orden_hashes, almacen, claves):
+            manifiesto['salida'] = orden_hashes
+    with medir_etapa('guardado_cache'):
+        almacen.compactar()
+        guardar_manifiesto(manifiesto)
+        almacen.borrar_generaciones_antiguas()
+        guardar_memo_categorias()
+
+    if estadisticas:
+        mostrar_rendimiento_workers(estadisticas)
+
+
+def configurar(config=None):
+    """Aplica la configuración de la API: {'categorias': ruta, 'reglas_bancarias': ruta}.
+
+    Las claves que falten se quedan como están. Si cambia alguna ruta se
+    descarta todo lo cargado con la anterior: mapeo y autómata de categorías,
+    reglas compiladas, cachés y memoria de categorías.
+    """
+    global RUTA_CONFIG_CATEGORIAS, RUTA_CONFIG_REGLAS, Mapeo_CATEGORIAS, _reglas_compiladas, _memo_categorias
+    config = config or {}
+    categorias = config.get('categorias', RUTA_CONFIG_CATEGORIAS)
+    reglas = config.get('reglas_bancarias', RUTA_CONFIG_REGLAS)
+    if (categorias, reglas) == (RUTA_CONFIG_CATEGORIAS, RUTA_CONFIG_REGLAS):
+        return
+
+    RUTA_CONFIG_CATEGORIAS, RUTA_CONFIG_REGLAS = categorias, reglas
+    Mapeo_CATEGORIAS = None
+    _reglas_compiladas = None
+    _memo_categorias = None
+    aplicar_reglas_bancarias.cache_clear()
+
+
+def reiniciar_caches():
+    """Vacía las cachés en memoria de conceptos, reglas bancarias, fechas y comercios, y la
+    memoria de categorías, para medir en frío. La memoria de categorías guardada
+    en disco no se vuelve a leer."""
+    global _memo_categorias
+    for funcion in (aplicar_reglas_bancarias, segmentar_concepto, fecha_completa, normalizar_comercio):
+        funcion.cache_clear()
+    _memo_categorias = {'firma': firma_categorias(), 'categorias': {}, 'nuevas': 0}
+
+
+def resolver_extractos(rutas):
+    """Lista de PDFs a partir de rutas a PDFs o a carpetas con PDFs"""
+    archivos_pdf = []
+    for ruta in ([rutas] if isinstance(rutas, (str, os.PathLike)) else rutas):
+        ruta = Path(ruta)
+        archivos_pdf.extend(listar_extractos([ruta]) if ruta.is_dir() else [ruta])
+    return archivos_pdf
+
+
+def iterar_extractos(rutas, config=None, extractor=EXTRACTOR_POR_DEFECTO, procesos=1):
+    """API: genera las operaciones (diccionarios) de los extractos de rutas, sin duplicados.
+
+    rutas son PDFs o carpetas. No usa el manifiesto ni escribe nada en disco:
+    si el diccionario compilado falta o está desactualizado, se compila sólo
+    en memoria.
+    """
+    configurar(config)
+    cargar_diccionario(guardar=False)
+    archivos_pdf = resolver_extractos(rutas)
+    if procesos == 1:
+        paginas = iterar_paginas_pdf(archivos_pdf, extractor)
+    else:
+        paginas = iterar_paginas_paralelo(archivos_pdf, procesos or None, extractor=extractor)
+    indice = IndiceOperaciones()
+    for nombre, paginas_archivo in itertools.groupby(paginas, key=lambda pagina: pagina[0]):
+        yield from indice.fusionar(iterar_operaciones(paginas_archivo), nombre)
+
+
+def leer_extractos(rutas, config=None, extractor=EXTRACTOR_POR_DEFECTO, procesos=1):
+    """API: DataFrame con las operaciones de los extractos de rutas, ya con sus tipos.
+
+    Es lo que usa AnalizadorGastos para leer los PDFs en memoria, sin el
+    CSV intermedio: mes numérico, fecha_operacion datetime, textos vacíos
+    como NaN y columnas categóricas, como en tabla_operaciones.
+    """
+    columnas = ColumnasOperaciones()
+    for operacion in iterar_extractos(rutas, config, extractor, procesos):
+        columnas.agregar_operacion(operacion)
+    return tabla_operaciones(columnas.a_dataframe())
+
+
+class IngestaBloqueada(Exception):
+    """Otro proceso tiene el bloqueo de la ingesta"""
+
+
+def bloqueo_abandonado(ruta):
+    """True si el proceso que creó el bloqueo ya no existe"""
+    try:
+        with open(ruta, 'r', encoding='ascii') as f:
+            pid = int(f.read().strip() or 0)
+        antiguedad = time.time() - os.path.getmtime(ruta)
+    except FileNotFoundError:
+        return True
+    except (OSError, ValueError):
+        return False
+
+    if os.name == 'nt' or pid <= 0:
+        # Sin pid (o en Windows, donde os.kill terminaría el proceso) sólo cuenta la antigüedad
+        return antiguedad > BLOQUEO_ABANDONADO
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+@contextlib.contextmanager
+def bloqueo_ingesta(ruta=RUTA_BLOQUEO):
+    """Bloqueo entre procesos para que dos ingestas no escriban el almacén a la vez.
+
+    El archivo de bloqueo se crea con O_CREAT | O_EXCL, que es atómico, y
+    guarda el pid. Si ese proceso ya no existe el bloqueo se retira; si
+    sigue vivo se lanza IngestaBloqueada.
+    """
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    for _ in range(2):
+        try:
+            descriptor = os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if not bloqueo_abandonado(ruta):
+                raise IngestaBloqueada(ruta)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(ruta)
+    else:
+        raise IngestaBloqueada(ruta)
+
+    try:
+        os.write(descriptor, str(os.getpid()).encode('ascii'))
+        os.close(descriptor)
+        yield
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(ruta)
+
+
+def listar_extractos(carpetas):
+    """PDFs de las carpetas, en orden de carpeta y de nombre"""
+    return [ruta for carpeta in carpetas for ruta in sorted(Path(carpeta).glob("*.pdf"))]
+
+
+def estado_carpetas(carpetas):
+    """{ruta: (tamaño, fecha de modificación)} de los PDFs de las carpetas"""
+    estado = {}
+    for ruta in listar_extractos(carpetas):
+        try:
+            informacion = ruta.stat()
+        except FileNotFoundError:
+            continue
+        estado[ruta] = (informacion.st_size, informacion.st_mtime_ns)
+    return estado
+
+
+def vigilar_carpetas(carpetas, intervalo=INTERVALO_VIGILANCIA, **opciones):
+    """Modo demonio: sondea las carpetas cada intervalo segundos e ingiere los cambios.
+
+    Un cambio (PDF nuevo, modificado o borrado) se ingiere cuando el estado de
+    las carpetas es igual en dos sondeos seguidos, para no leer un PDF a
+    medio copiar. La ingesta es la incremental de ingerir_extractos, bajo
+    bloqueo_ingesta; opciones se le pasa tal cual. Termina con Ctrl+C.
+    """
+    print(f"👀 Vigilando {', '.join(str(carpeta) for carpeta in carpetas)} cada {intervalo}s "
+          f"(Ctrl+C para terminar)")
+    anterior = None
+    ingerido = None
+    try:
+        while True:
+            actual = estado_carpetas(carpetas)
+            if actual and actual == anterior and actual != ingerido:
+                try:
+                    with bloqueo_ingesta():
+                        print(f"🕒 {datetime.now():%H:%M:%S} Cambios en los extractos")
+                        ingerir_extractos(list(actual), **opciones)
+                    ingerido = actual
+                except IngestaBloqueada:
+                    print("⏳ Hay otra ingesta en curso, se reintenta en el próximo sondeo")
+                except Exception as e:
+                    # Un extracto defectuoso no debe parar la vigilancia; se reintenta
+                    # cuando vuelva a cambiar algo en las carpetas
+                    print(f"❌ Error en la ingesta: {e}")
+                    ingerido = actual
+            anterior = actual
+            time.sleep(intervalo)
+    except KeyboardInterrupt:
+        print("\n👋 Vigilancia terminada")
 
 
 def main():
-    directorio = Path(".")
-    archivos_pdf = list(directorio.glob("*.pdf"))
+    parser = argparse.ArgumentParser(description="Extrae las operaciones de los extractos PDF")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="procesos para extraer los PDFs en paralelo (0 = uno por núcleo, 1 = en serie)")
+    parser.add_argument("--paginas-por-tarea", type=int, default=PAGINAS_POR_TAREA,
+                        help="páginas máximas por tarea al repartir extractos grandes")
+    parser.add_argument("--extractor", choices=sorted(EXTRACTORES), default=EXTRACTOR_POR_DEFECTO,
+                        help="backend para sacar el texto de los PDFs (rapido necesita pypdfium2)")
+    parser.add_argument("--validar-extractor", action="store_true",
+                        help="compara las operaciones de --extractor (rapido si no se indica) con las de pdfplumber y termina")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="ignora el manifiesto y vuelve a procesar todos los PDFs")
+    parser.add_argument("--construir-diccionario", action="store_true",
+                        help="recompila el diccionario de dics/*.txt y termina")
+    parser.add_argument("--recategorizar", action="store_true",
+                        help="vuelve a categorizar las operaciones guardadas con las reglas actuales y termina")
+    parser.add_argument("--instrumentar", action="store_true",
+                        help="mide tiempos por etapa, archivo y página y cuenta líneas, cachés y filas sin categoría")
+    parser.add_argument("--informe", default=RUTA_INFORME_INGESTA,
+                        help=f"JSON del informe de --instrumentar (por defecto {RUTA_INFORME_INGESTA})")
+    parser.add_argument("--ver-informe", nargs="?", const=RUTA_INFORME_INGESTA, metavar="JSON",
+                        help="muestra el resumen en una línea de un informe guardado y termina")
+    parser.add_argument("--carpeta", nargs="+", default=[DIRECTORIO_LECTOR],
+                        help=f"carpetas con los extractos PDF (por defecto {DIRECTORIO_LECTOR})")
+    parser.add_argument("--vigilar", action="store_true",
+                        help="se queda en marcha e ingiere los extractos nuevos que aparezcan en las carpetas")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_VIGILANCIA,
+                        help="segundos entre sondeos de --vigilar")
+    parser.add_argument("--movimientos", metavar="CSV",
+                        help="importa un CSV de movimientos de CaixaBank en lugar de los PDFs")
+    parser.add_argument("--fusionar", action="store_true",
+                        help="con --movimientos, los añade al almacén de operaciones descartando duplicados")
+    parser.add_argument("--salida", default=None,
+                        help=f"CSV de salida de --movimientos (por defecto {RUTA_CSV_MOVIMIENTOS})")
+    args = parser.parse_args()
+
+    if args.movimientos:
+        operaciones = importar_movimientos_csv(args.movimientos)
+        guardar_memo_categorias()
+        if args.fusionar:
+            try:
+                with bloqueo_ingesta():
+                    fusionar_movimientos(operaciones, args.movimientos)
+            except IngestaBloqueada:
+                print("⏳ Hay otra ingesta en curso; vuelve a intentarlo cuando termine")
+            return
+        operaciones.to_csv(args.salida or RUTA_CSV_MOVIMIENTOS, index=False, encoding='utf-8')
+        print(f"✅ {len(operaciones)} movimientos importados de {args.movimientos}")
+        return
+
+    if args.recategorizar:
+        try:
+            with bloqueo_ingesta():
+                recategorizar_operaciones()
+        except IngestaBloqueada:
+            print("⏳ Hay una ingesta en curso; vuelve a intentarlo cuando termine")
+        return
+
+    if args.ver_informe:
+        with open(args.ver_informe, 'r', encoding='utf-8') as f:
+            print(resumen_informe(json.load(f)))
+        return
+
+    if args.construir_diccionario:
+        print(f"📚 Diccionario compilado: {construir_diccionario()} palabras")
+        return
+
+    if args.vigilar:
+        vigilar_carpetas(args.carpeta, args.intervalo, procesos=args.procesos,
+                         paginas_por_tarea=args.paginas_por_tarea, extractor=args.extractor)
+        return
+
+    archivos_pdf = listar_extractos(args.carpeta)
 
     if not archivos_pdf:
         return
 
-    texto_completo = ""
-    for archivo_pdf in archivos_pdf:
-        texto_pdf = extraer_texto_pdf(archivo_pdf)
-        texto_completo += texto_pdf + "\n" + "=" * 80 + "\n\n"
+    if args.validar_extractor:
+        # Con el extractor por defecto se valida el rápido, que es el alternativo
+        extractor = 'rapido' if args.extractor == 'pdfplumber' else args.extractor
+        validar_extractor(archivos_pdf, extractor)
+        return
 
-    if operaciones := procesar_operaciones(texto_completo):
-        pd.DataFrame(operaciones).to_csv("../Archivos csv/operaciones.csv", index=False, encoding='utf-8')
+    instrumentacion = activar_instrumentacion() if args.instrumentar else None
+    try:
+        with bloqueo_ingesta():
+            ingerir_extractos(archivos_pdf, args.procesos, args.paginas_por_tarea, args.extractor, args.sin_cache)
+    except IngestaBloqueada:
+        print("⏳ Hay otra ingesta en curso (p. ej. lector.py --vigilar); no se procesa nada")
+    finally:
+        if instrumentacion is not None:
+            informe = instrumentacion.informe()
+            guardar_informe(informe, args.informe)
+            print(resumen_informe(informe))
+            print(f"📝 Informe guardado en {args.informe}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
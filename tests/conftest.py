@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+DIRECTORIO_PROYECTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRECTORIO_LECTOR = os.path.join(DIRECTORIO_PROYECTO, 'Archivos PDF')
+for directorio in (DIRECTORIO_PROYECTO, DIRECTORIO_LECTOR):
+    if directorio not in sys.path:
+        sys.path.insert(0, directorio)
+
+
+@pytest.fixture(scope='session')
+def ruta_diccionario(tmp_path_factory):
+    """Diccionario compilado una sola vez por sesión, fuera del árbol de trabajo"""
+    import lector
+
+    ruta = str(tmp_path_factory.mktemp('diccionario') / 'diccionario.bin')
+    lector.construir_diccionario(ruta_salida=ruta)
+    return ruta
+
+
+@pytest.fixture
+def diccionario_temporal(ruta_diccionario, monkeypatch):
+    """lector con el diccionario compilado fuera del proyecto y la caché de conceptos vacía"""
+    import lector
+
+    monkeypatch.setattr(lector, 'RUTA_DICCIONARIO_COMPILADO', ruta_diccionario)
+    monkeypatch.setattr(lector.construir_diccionario, '__defaults__', (lector.DIRECTORIO_DICS, ruta_diccionario))
+    monkeypatch.setattr(lector, '_palabras_espanol', None)
+    lector.segmentar_concepto.cache_clear()
+    yield lector
+    lector.segmentar_concepto.cache_clear()
+
+
+@pytest.fixture
+def lector_temporal(tmp_path, monkeypatch, diccionario_temporal):
+    """lector con el manifiesto, el CSV, las particiones y la memoria de categorías en tmp_path"""
+    lector = diccionario_temporal
+
+    cache = tmp_path / '.cache'
+    particiones = tmp_path / 'particiones'
+    monkeypatch.setattr(lector, 'DIRECTORIO_CACHE', str(cache))
+    monkeypatch.setattr(lector, 'RUTA_MANIFIESTO', str(cache / 'manifiesto_ingesta.json'))
+    monkeypatch.setattr(lector, 'RUTA_CSV_DUPLICADOS', str(cache / 'duplicados.csv'))
+    monkeypatch.setattr(lector, 'RUTA_MEMO_CATEGORIAS', str(cache / 'memo_categorias.json'))
+    monkeypatch.setattr(lector, '_memo_categorias', None)
+    monkeypatch.setattr(lector, 'RUTA_CSV_OPERACIONES', str(tmp_path / 'operaciones.csv'))
+    monkeypatch.setattr(lector, 'DIRECTORIO_PARTICIONES', str(particiones))
+    monkeypatch.setattr(lector, 'RUTA_CATALOGO', str(particiones / 'catalogo.json'))
+    monkeypatch.setattr(lector.escribir_particiones, '__defaults__', (str(particiones),))
+    return lector
@@ -0,0 +1,48 @@
+import os
+
+import lector
+
+
+def operacion(i):
+    return {'año': '2025', 'mes': 'ENERO', 'fecha_operacion': f"{i % 28 + 1:02d}/01", 'fecha_valor': '01/01',
+            'operacion': 'COMPRA', 'id_empresa': '', 'nombre_empresa': f"COMERCIO {i}", 'concepto': 'ñ',
+            'categoria': 'OTROS', 'subcategoria': 'VARIOS', 'tipo': 'GASTO', 'importe': i + 0.5, 'saldo': 100.0}
+
+
+def test_rangos_del_almacen(lector_temporal):
+    manifiesto = lector_temporal.manifiesto_vacio()
+    with lector.AlmacenExtractos(manifiesto) as almacen:
+        rango_a = almacen.escribir_operaciones(map(operacion, range(3)))
+        rango_b = almacen.escribir_operaciones(map(operacion, range(3, 5)))
+        rango_paginas = almacen.escribir('paginas', ["página 1\nEXTRACTO", "página 2"])
+        assert list(almacen.leer_operaciones(rango_a)) == list(map(operacion, range(3)))
+        assert list(almacen.leer_operaciones(rango_b)) == list(map(operacion, range(3, 5)))
+        assert list(almacen.leer('paginas', rango_paginas)) == ["página 1\nEXTRACTO", "página 2"]
+
+
+def test_compactar_conserva_lo_vivo(lector_temporal):
+    manifiesto = lector_temporal.manifiesto_vacio()
+    with lector.AlmacenExtractos(manifiesto) as almacen:
+        for i in range(3):
+            manifiesto['archivos'][f"hash{i}"] = {
+                'nombre': f"extracto{i}.pdf",
+                'paginas': almacen.escribir('paginas', [f"texto {i}"]),
+                'operaciones': almacen.escribir_operaciones(map(operacion, range(i * 10, i * 10 + 10)))
+            }
+        manifiesto['fusionados']['lote'] = {'nombre': 'Movimientos.csv',
+                                            'operaciones': almacen.escribir_operaciones([operacion(99)])}
+        # Menos bytes muertos que vivos: no se compacta
+        del manifiesto['archivos']['hash0']
+        assert not almacen.compactar()
+        del manifiesto['archivos']['hash1']
+        assert almacen.compactar()
+
+    assert manifiesto['generacion_almacen'] == 1
+    assert list(almacen.leer('paginas', manifiesto['archivos']['hash2']['paginas'])) == ["texto 2"]
+    assert list(almacen.leer_operaciones(manifiesto['archivos']['hash2']['operaciones'])) == \
+        list(map(operacion, range(20, 30)))
+    assert list(almacen.leer_operaciones(manifiesto['fusionados']['lote']['operaciones'])) == [operacion(99)]
+
+    almacen.borrar_generaciones_antiguas()
+    assert sorted(os.listdir(lector.DIRECTORIO_CACHE)) == ['operaciones_extractos.1.jsonl',
+                                                           'paginas_extractos.1.jsonl']
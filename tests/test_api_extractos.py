@@ -0,0 +1,21 @@
+import os
+
+from conftest import DIRECTORIO_LECTOR
+
+EXTRACTO = f"{DIRECTORIO_LECTOR}/summary--context_.data_.rel_1759850241423.pdf"
+
+
+def test_leer_extractos_no_escribe_en_disco(diccionario_temporal, tmp_path, monkeypatch):
+    lector = diccionario_temporal
+    ruta_diccionario = str(tmp_path / '.cache' / 'diccionario.bin')
+    monkeypatch.setattr(lector, 'DIRECTORIO_CACHE', str(tmp_path / '.cache'))
+    monkeypatch.setattr(lector, 'RUTA_DICCIONARIO_COMPILADO', ruta_diccionario)
+    monkeypatch.setattr(lector.construir_diccionario, '__defaults__', (lector.DIRECTORIO_DICS, ruta_diccionario))
+
+    df = lector.leer_extractos(EXTRACTO)
+
+    assert len(df) > 0
+    assert list(tmp_path.iterdir()) == []
+    # El diccionario compilado en memoria segmenta igual que el guardado
+    assert lector.segmentar_concepto('RECIBIDAENEUROS') == 'RECIBIDA EN EUROS'
+    assert not os.path.exists(ruta_diccionario)
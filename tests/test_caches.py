@@ -0,0 +1,9 @@
+def test_reiniciar_caches(lector_temporal):
+    lector = lector_temporal
+    lector.segmentar_concepto('RECIBIDAENEUROS')
+    lector.normalizar_comercio('Mercadona')
+    lector.categorizar('COMPRA', 'MERCADONA')
+    lector.reiniciar_caches()
+    assert lector.segmentar_concepto.cache_info().currsize == 0
+    assert lector.normalizar_comercio.cache_info().currsize == 0
+    assert lector.cargar_memo_categorias()['categorias'] == {}
@@ -0,0 +1,78 @@
+import itertools
+import random
+
+import lector
+
+OPERACIONES = [
+    "BIZUM", "BIZUM RECIBIDO", "TRANSFERENCIA A FAVOR DE", "ABONO POR TRANSFERENCIA", "NOMINA",
+    "ABONO NOMINA", "PAGO CON TARJETA EN RESTAURANTES Y CAFETERIAS", "PAGO CON TARJETA EN SUPERMERCADOS",
+    "PAGO CON TARJETA DE COMPRAS", "PAGO CON TARJETA EN GASOLINERAS", "ADEUDO A SU CARGO",
+    "RECIBO DOMICILIADO", "COMISIONES POR SERVICIOS", "",
+]
+
+
+def determinar_categoria_original(operacion, nombre_empresa, mapeo):
+    """determinar_categoria antes del autómata: recorre el mapeo palabra a palabra"""
+    if operacion == "BIZUM":
+        return "BIZUM", ""
+
+    if "TRANSFERENCIA" in operacion:
+        return "TRANSFERENCIAS", ""
+
+    if "NOMINA" in operacion:
+        return "TRANSFERENCIAS", "NÓMINA"
+
+    nombre_empresa_upper = nombre_empresa.upper()
+    for palabra, (categoria, subcategoria) in mapeo.items():
+        if palabra in nombre_empresa_upper:
+            return categoria, subcategoria
+
+    operacion_upper = operacion.upper()
+    for palabra, (categoria, subcategoria) in mapeo.items():
+        if palabra in operacion_upper:
+            return categoria, subcategoria
+
+    if "PAGO CON TARJETA" in operacion:
+        if "RESTAURANTES" in operacion:
+            return "COMIDA", "RESTAURANTE"
+        elif "SUPERMERCADOS" in operacion:
+            return "COMIDA", "SUPERMERCADO"
+        elif "COMPRAS" in operacion:
+            return "COMPRAS", "VARIOS"
+
+    return "OTROS", "VARIOS"
+
+
+def parejas_sinteticas(palabras, azar):
+    """Operaciones habituales con nombres de empresa como los de los extractos: id, palabra clave, ciudad"""
+    parejas = set()
+    for _ in range(2000):
+        operacion = azar.choice(OPERACIONES)
+        palabra = azar.choice(palabras)
+        nombre = azar.choice([
+            f"4188202100000000{palabra} ELCHE ES",
+            f"N2025251000000000{palabra.lower()}-Centro",
+            f"{palabra[:len(palabra) // 2]} {palabra[len(palabra) // 2:]}",
+            "EMPRESA SIN PALABRA CLAVE",
+            "",
+        ])
+        parejas.add((operacion, nombre))
+    return parejas
+
+
+def test_mismo_resultado_que_el_recorrido_en_orden():
+    mapeo = lector.obtener_mapeo_categorias()
+    palabras = list(mapeo)
+    azar = random.Random(4)
+
+    parejas = parejas_sinteticas(palabras, azar)
+    # Dos palabras clave en el mismo texto: gana la primera del mapeo, no la primera del texto
+    parejas.update(('COMPRA', a + ' ' + b) for a, b in itertools.permutations(palabras[:60], 2))
+    parejas.update((a + b, '') for a, b in itertools.permutations(palabras[-40:], 2))
+    parejas.update((azar.choice(palabras) + ' PAGO CON TARJETA EN RESTAURANTES', azar.choice(palabras).lower())
+                   for _ in range(500))
+    parejas.update(('PAGO CON TARJETA DE COMPRAS', palabra[:-1]) for palabra in palabras)
+
+    for operacion, nombre_empresa in parejas:
+        assert lector.determinar_categoria(operacion, nombre_empresa) == \
+            determinar_categoria_original(operacion, nombre_empresa, mapeo), (operacion, nombre_empresa)
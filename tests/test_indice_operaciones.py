@@ -0,0 +1,55 @@
+import random
+
+import lector
+
+
+def mismo_comercio(a, b):
+    return not a or not b or a.startswith(b) or b.startswith(a)
+
+
+def fusionar_por_pares(lotes):
+    """Referencia cuadrática: compara cada operación con todas las ya aceptadas"""
+    aceptadas, resultado = [], []
+    for operaciones in lotes:
+        for operacion in operaciones:
+            clave, comercio = lector.clave_operacion(operacion)
+            if any(clave == clave_vista and mismo_comercio(comercio, comercio_visto)
+                   for clave_vista, comercio_visto in aceptadas):
+                continue
+            aceptadas.append((clave, comercio))
+            resultado.append(operacion)
+    return resultado
+
+
+def operacion_aleatoria(azar):
+    return {
+        'año': '2025', 'mes': azar.choice(['ENERO', 'FEBRERO']),
+        'fecha_operacion': f"{azar.randint(1, 3):02d}/{azar.choice(['01', '02', '12'])}",
+        'tipo': azar.choice(['GASTO', 'INGRESO']),
+        'importe': azar.choice([1.0, 2.5, 10.0]), 'saldo': azar.choice([100.0, 101.5]),
+        'nombre_empresa': azar.choice(['', 'MERCADONA', 'Mercadona S.A.', 'MERCA', 'LIDL', None]),
+        'operacion': 'COMPRA',
+    }
+
+
+def test_fusionar_coincide_con_la_comparacion_por_pares():
+    azar = random.Random(19)
+    for _ in range(50):
+        lotes = [[operacion_aleatoria(azar) for _ in range(azar.randint(0, 40))] for _ in range(3)]
+        indice = lector.IndiceOperaciones()
+        obtenidas = [operacion for i, lote in enumerate(lotes) for operacion in indice.fusionar(lote, f"lote{i}")]
+        assert obtenidas == fusionar_por_pares(lotes)
+        assert len(indice) == len(obtenidas)
+        assert len(indice.descartadas) == sum(map(len, lotes)) - len(obtenidas)
+
+
+def test_descartadas_explican_con_que_operacion_coinciden():
+    original = {'año': '2025', 'mes': 'ENERO', 'fecha_operacion': '02/01', 'tipo': 'GASTO',
+                'importe': 12.5, 'saldo': 300.0, 'nombre_empresa': 'MERCADONA', 'operacion': 'COMPRA'}
+    copia = dict(original, nombre_empresa='Mercadona Valencia')
+    indice = lector.IndiceOperaciones()
+    assert list(indice.fusionar([original], 'extracto.pdf')) == [original]
+    assert list(indice.fusionar([copia], 'Movimientos.csv')) == []
+    assert indice.descartadas == [{'fuente': 'Movimientos.csv', 'posicion': 1, 'fecha': '2025-01-02',
+                                   'importe': -12.5, 'saldo': 300.0, 'comercio': 'Mercadona Valencia',
+                                   'duplicada_de': 'extracto.pdf', 'posicion_original': 1}]
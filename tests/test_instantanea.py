@@ -0,0 +1,104 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import DIRECTORIO_PROYECTO
+
+from AnalizadorGastos import AnalizadorGastos
+
+NUM_FILAS = 40
+
+
+@pytest.fixture
+def analizador(tmp_path):
+    """AnalizadorGastos sobre una copia recortada de operaciones.csv, sin configuración ni catálogo"""
+    origen = os.path.join(DIRECTORIO_PROYECTO, 'Archivos csv', 'operaciones.csv')
+    with open(origen, encoding='utf-8-sig') as f:
+        lineas = [next(f) for _ in range(NUM_FILAS + 1)]
+    ruta_csv = tmp_path / 'operaciones.csv'
+    ruta_csv.write_text(''.join(lineas), encoding='utf-8')
+
+    app = AnalizadorGastos.__new__(AnalizadorGastos)
+    app.csv_path = str(ruta_csv)
+    app.ruta_instantanea = str(tmp_path / '.cache' / 'instantanea_analisis.pkl')
+    return app
+
+
+def tocar(ruta):
+    """Mueve la fecha de modificación un segundo hacia delante"""
+    estado = os.stat(ruta)
+    os.utime(ruta, ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000_000))
+
+
+def sin_csv(monkeypatch, app):
+    """Hace fallar cualquier lectura del CSV: los datos tienen que salir de la instantánea"""
+    def fallar(*args, **kwargs):
+        raise AssertionError("se ha vuelto a leer el CSV")
+    monkeypatch.setattr(app, 'cargar_csv', fallar)
+
+
+def test_csv_sin_cambios_usa_la_instantanea(analizador, monkeypatch, capsys):
+    df = analizador.cargar_datos()
+    indice = analizador._indice_meses
+    assert os.path.exists(analizador.ruta_instantanea)
+    assert "(instantánea)" not in capsys.readouterr().out
+
+    sin_csv(monkeypatch, analizador)
+    reutilizado = analizador.cargar_datos()
+    assert "(instantánea)" in capsys.readouterr().out
+    assert reutilizado.equals(df)
+    assert analizador._indice_meses == indice
+
+
+def test_csv_reescrito_con_el_mismo_contenido_usa_la_instantanea(analizador, monkeypatch):
+    df = analizador.cargar_datos()
+    copia = analizador.csv_path + '.copia'
+    shutil.copyfile(analizador.csv_path, copia)
+    os.replace(copia, analizador.csv_path)
+    tocar(analizador.csv_path)
+
+    sin_csv(monkeypatch, analizador)
+    assert analizador.cargar_datos().equals(df)
+    # La clave se actualiza con la nueva fecha para no volver a calcular el hash
+    monkeypatch.setattr(analizador, 'calcular_hash_archivo',
+                        lambda ruta: pytest.fail("se ha vuelto a calcular el hash"))
+    assert analizador.cargar_datos().equals(df)
+
+
+def test_csv_con_otro_contenido_del_mismo_tamaño_invalida_la_instantanea(analizador, capsys):
+    df = analizador.cargar_datos()
+    with open(analizador.csv_path, encoding='utf-8') as f:
+        cabecera, primera, *resto = f.readlines()
+    campos = primera.split(',')
+    importe = campos[-2]
+    # Mismo número de caracteres, otro importe
+    nuevo = importe[:-1] + ('1' if importe[-1] != '1' else '2')
+    campos[-2] = nuevo
+    with open(analizador.csv_path, 'w', encoding='utf-8') as f:
+        f.writelines([cabecera, ','.join(campos)] + resto)
+    tocar(analizador.csv_path)
+    capsys.readouterr()
+
+    recargado = analizador.cargar_datos()
+    assert "(instantánea)" not in capsys.readouterr().out
+    assert not recargado.equals(df)
+    assert float(nuevo) in recargado.loc[recargado['index'] == 0, 'importe'].tolist()
+
+    # La instantánea nueva ya corresponde al CSV modificado
+    assert analizador.cargar_datos().equals(recargado)
+    assert "(instantánea)" in capsys.readouterr().out
+
+
+def test_csv_con_filas_nuevas_invalida_la_instantanea(analizador, capsys):
+    df = analizador.cargar_datos()
+    with open(analizador.csv_path, encoding='utf-8') as f:
+        ultima = f.readlines()[-1]
+    with open(analizador.csv_path, 'a', encoding='utf-8') as f:
+        f.write(ultima)
+    capsys.readouterr()
+
+    recargado = analizador.cargar_datos()
+    assert "(instantánea)" not in capsys.readouterr().out
+    assert len(recargado) == len(df) + 1
+    assert sum(fin - inicio for inicio, fin in analizador._indice_meses.values()) == len(recargado)
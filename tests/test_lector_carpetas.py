@@ -0,0 +1,36 @@
+import shutil
+
+import pandas as pd
+
+from conftest import DIRECTORIO_LECTOR
+
+EXTRACTO_A = 'summary--context_.data_.rel_1759850241423.pdf'
+EXTRACTO_B = 'summary--context_.data_.rel_1759860221616.pdf'
+
+
+def copiar(origen, carpeta):
+    carpeta.mkdir()
+    destino = carpeta / 'extracto.pdf'
+    shutil.copy(f"{DIRECTORIO_LECTOR}/{origen}", destino)
+    return destino
+
+
+def test_pdfs_con_el_mismo_nombre_en_dos_carpetas(lector_temporal, tmp_path):
+    lector = lector_temporal
+    pdf_a = copiar(EXTRACTO_A, tmp_path / 'a')
+    pdf_b = copiar(EXTRACTO_B, tmp_path / 'b')
+    esperadas = (len(list(lector.iterar_extractos([pdf_a]))), len(list(lector.iterar_extractos([pdf_b]))))
+    assert all(esperadas)
+
+    archivos_pdf = lector.listar_extractos([tmp_path / 'a', tmp_path / 'b'])
+    lector.ingerir_extractos(archivos_pdf)
+
+    manifiesto = lector.cargar_manifiesto()
+    assert len(manifiesto['archivos']) == 2
+    assert sorted(entrada['nombre'] for entrada in manifiesto['archivos'].values()) == \
+        [str(pdf_a.resolve()), str(pdf_b.resolve())]
+    assert len(pd.read_csv(lector.RUTA_CSV_OPERACIONES)) == sum(esperadas)
+
+    # Una segunda ingesta no encuentra nada pendiente ni descarta ninguno como duplicado
+    lector.ingerir_extractos(archivos_pdf)
+    assert len(pd.read_csv(lector.RUTA_CSV_OPERACIONES)) == sum(esperadas)
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+import lector
+from benchmark_ingesta import cargar_paginas_muestra, iterar_movimientos_por_lineas
+
+
+def comparar(paginas):
+    esperado = list(iterar_movimientos_por_lineas(paginas))
+    obtenido = [tuple(m) for m in lector.iterar_movimientos(paginas)]
+    assert obtenido == esperado
+
+
+def pagina(*lineas, cabecera="EXTRACTODEMARZO2025 Fechadeemisión: 01/03/2025"):
+    return ("extracto.pdf", 1, "\n".join((cabecera,) + lineas))
+
+
+MOVIMIENTO = "05/03 05/03 PAGOCONTARJETAENSUPERMERCADOS -12,50 1.234,56"
+
+
+@pytest.fixture(scope="module")
+def paginas_reales():
+    paginas = cargar_paginas_muestra()
+    if not paginas:
+        pytest.skip("no hay extractos PDF de ejemplo")
+    return paginas
+
+
+def test_mismos_movimientos_en_los_extractos_de_ejemplo(paginas_reales):
+    comparar(paginas_reales)
+
+
+@pytest.mark.parametrize("siguiente", [
+    "ABCDE",            # 5 caracteres: no es detalle
+    "ABCDEF",           # 6 caracteres: sí lo es
+    "  ABCDEF  ",
+    "ABC DE",
+    "",
+    "   ",
+    "SALDOANTERIOR 1.000,00",
+    "Todoslosimportesdeesteextractoseexpresanen:",
+    "F00201",
+    "F12",
+    "FACTURA 2025",
+    "06/03 06/03 BIZUM 10,00 1.244,56",
+    "06/03 algo más que una fecha",
+])
+def test_linea_siguiente_al_movimiento(siguiente):
+    comparar([pagina(MOVIMIENTO, siguiente, "4188202100000000CAFETERIA ELCHE ES")])
+
+
+def test_movimiento_en_la_ultima_linea_y_consecutivos():
+    comparar([pagina(MOVIMIENTO, MOVIMIENTO, "DETALLE DEL SEGUNDO", MOVIMIENTO)])
+    comparar([pagina("", MOVIMIENTO, "", MOVIMIENTO + "  ", "\tDETALLE CON TABULADOR\t")])
+
+
+def test_lineas_que_no_son_movimientos():
+    comparar([pagina(
+        "05/03 05/03 pagominúscula -1,00 2,00",
+        "05/03 05/03 SINIMPORTES",
+        "05/03 05/03 UNIMPORTE 3,00",
+        "5/03 05/03 FECHACORTA 1,00 2,00",
+        "05/03 05/03 CONCEPTO CON ESPACIOS -1.000,00 -2.000,00",
+        "detalle",
+    )])
+
+
+def test_mes_por_archivo_y_paginas_sin_cabecera():
+    comparar([
+        pagina(MOVIMIENTO, "DETALLE DE MARZO"),
+        ("extracto.pdf", 2, MOVIMIENTO + "\nDETALLE SIN CABECERA"),
+        ("otro.pdf", 1, "EXTRACTODEABRIL2025\n" + MOVIMIENTO),
+        pagina(MOVIMIENTO, cabecera="EXTRACTODEMAYO2025"),
+    ])
+
+
+def test_extracto_sin_cabecera_no_supone_el_año():
+    # El parser original suponía 2025; ahora el año sale de la cabecera
+    movimiento, = lector.iterar_movimientos([("otro.pdf", 1, MOVIMIENTO + "\nDETALLE SIN MES")])
+    assert (movimiento.año, movimiento.mes) == ("DESCONOCIDO", "DESCONOCIDO")
+
+
+def test_paginas_aleatorias():
+    aleatorio = random.Random(0)
+    piezas = [
+        MOVIMIENTO, "  " + MOVIMIENTO, MOVIMIENTO + " ", "06/03 07/03 BIZUM 10,00 -5,00",
+        "4188202100000000SUPERMERCADOCENTRAL ELCHE ES", "ABCDE", "ABCDEF", " X Y Z ", "",
+        "SALDOANTERIOR 1,00", "F00201", "EURO 1.234,56", "Todoslosimportes", "\t", "01/01",
+    ]
+    for _ in range(500):
+        lineas = [aleatorio.choice(piezas) for _ in range(aleatorio.randint(0, 12))]
+        comparar([pagina(*lineas)])
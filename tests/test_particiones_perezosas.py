@@ -0,0 +1,62 @@
+import csv
+
+import pytest
+
+import AnalizadorGastos as analizador
+import lector
+
+MESES = [(2025, 'JULIO'), (2025, 'AGOSTO'), (2025, 'SEPTIEMBRE'), (2025, 'OCTUBRE')]
+
+
+class Salir(Exception):
+    pass
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """AnalizadorGastos con la configuración por defecto, un CSV y sus particiones en tmp_path"""
+    monkeypatch.setattr(analizador, 'DIRECTORIO_PROYECTO', str(tmp_path))
+    operaciones = []
+    saldo = 1000.0
+    for año, mes in MESES:
+        numero = lector.MESES.index(mes) + 1
+        for dia in range(1, 4):
+            saldo -= 10
+            operaciones.append({
+                'año': año, 'mes': mes, 'fecha_operacion': f"{dia:02d}/{numero:02d}",
+                'fecha_valor': f"{dia:02d}/{numero:02d}", 'operacion': 'PAGO CON TARJETA EN SUPERMERCADOS',
+                'id_empresa': '4188202100000000', 'nombre_empresa': 'SUPERMERCADOCENTRAL ELCHE ES',
+                'concepto': '', 'categoria': 'COMIDA', 'subcategoria': 'SUPERMERCADO', 'tipo': 'GASTO',
+                'importe': 10.0, 'saldo': saldo
+            })
+    with open(tmp_path / 'operaciones.csv', 'w', newline='', encoding='utf-8-sig') as f:
+        escritor = csv.DictWriter(f, fieldnames=lector.COLUMNAS)
+        escritor.writeheader()
+        escritor.writerows(operaciones)
+    lector.escribir_particiones(operaciones, str(tmp_path / 'particiones'))
+
+    cargas = []
+    cargar_particion = analizador.AnalizadorGastos.cargar_particion
+
+    def contar(self, entrada):
+        cargas.append((entrada['año'], entrada['mes']))
+        return cargar_particion(self, entrada)
+    monkeypatch.setattr(analizador.AnalizadorGastos, 'cargar_particion', contar)
+
+    app = analizador.AnalizadorGastos()
+    app.cargas = cargas
+    return app
+
+
+def test_arranque_solo_lee_la_particion_del_ultimo_mes(app, monkeypatch):
+    assert app.catalogo is not None
+    assert app.cargas == [(2025, 10)]
+
+    def salir():
+        raise Salir
+    # Justo después de la comprobación inicial de ejecutar() se mira si hay datos nuevos
+    monkeypatch.setattr(app, 'recargar_si_cambia', salir)
+    with pytest.raises(Salir):
+        app.ejecutar()
+    assert app.cargas == [(2025, 10)]
+    assert not app._df_cargado
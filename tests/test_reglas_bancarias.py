@@ -0,0 +1,73 @@
+import itertools
+import random
+
+import lector
+
+
+def aplicar_reglas_bancarias_original(texto):
+    """aplicar_reglas_bancarias antes de pasar las reglas a config (str.replace en cascada)"""
+    patrones = [
+        (r'ABONODENOMINAPOR', 'ABONO DENOMINA POR '),
+        (r'PAGOCONTARJETA', 'PAGO CON TARJETA '),
+        (r'ENRESTAURANTES', 'EN RESTAURANTES '),
+        (r'YCAFETERIAS', 'Y CAFETERIAS'),
+        (r'ENESPECTACULOS', 'EN ESPECTACULOS '),
+        (r'MUSEOSYDEPORTES', 'MUSEOS Y DEPORTES'),
+        (r'DECOMPRAS', 'DE COMPRAS '),
+        (r'ADISTANCIA', 'A DISTANCIA '),
+        (r'YSUSCRIPCIONES', 'Y SUSCRIPCIONES'),
+        (r'ADEUDOASUCARGO', 'ADEUDO A SU CARGO'),
+        (r'ENSUPERMERCADOS', 'EN SUPERMERCADOS'),
+        (r'DESERVICIOS', 'DE SERVICIOS '),
+        (r'VARIOS', 'VARIOS'),
+        (r'ENSECTORDEL', 'EN SECTOR DEL '),
+        (r'AUTOMOVIL', 'AUTOMOVIL'),
+        (r'RETEFECTIVO', 'RET EFECTIVO '),
+        (r'ADEBITOCONTARJ', 'A DEBITO CONTARJ '),
+        (r'ENCAJEROAUT', 'EN CAJERO AUT'),
+        (r'CARGOPORCOMPRA', 'CARGO POR COMPRA '),
+        (r'ENCOMERCIOS', 'EN COMERCIOS'),
+        (r'ABONODELINEM', 'ABONO DELINEM '),
+        (r'PAGODEDESEMPLEO', 'PAGO DE DESEMPLEO'),
+        (r'ENMODA', 'EN MODA '),
+        (r'CALZADOYCOMPLEMENTOS', 'CALZADO Y COMPLEMENTOS'),
+        (r'ENDEPORTES', 'EN DEPORTES '),
+        (r'YJUGUETES', 'Y JUGUETES'),
+        (r'ENDISCOS', 'EN DISCOS '),
+        (r'LIBROSFOTOS', 'LIBROS FOTOS '),
+        (r'YPC', 'Y PC'),
+        (r'ENHOGAR', 'EN HOGAR '),
+        (r'MUEBLESDECORACION', 'MUEBLES DECORACION '),
+        (r'YELECTR', 'Y ELECTR'),
+        (r'ENDROGUERIAS', 'EN DROGUERIAS '),
+        (r'YPERFUMERIAS', 'Y PERFUMERIAS'),
+        (r'COMISIONESPORSERVICIOS', 'COMISIONES POR SERVICIOS'),
+        (r'COMPRAENCOMERCIOEXTRANJERO', 'COMPRA EN COMERCIO EXTRANJERO '),
+        (r'COMISION3%INCLUIDA', 'COMISION 3% INCLUIDA'),
+        (r'ABONOBONIFICACION', 'ABONO BONIFICACION '),
+        (r'PACKVIAJES', 'PACK VIAJES'),
+    ]
+
+    resultado = texto
+    for patron, reemplazo in patrones:
+        resultado = resultado.replace(patron, reemplazo)
+
+    return resultado.strip()
+
+
+PATRONES = [patron for patron, _ in lector.cargar_reglas_bancarias()]
+
+
+def test_casos_con_reglas_solapadas():
+    assert lector.aplicar_reglas_bancarias("CARGOPORCOMPRADEBITOCONTARJ") == 'CARGO POR COMPRA  DEBITO CONTARJ'
+    assert lector.aplicar_reglas_bancarias("YELECTRETEFECTIVO") == 'Y ELECTRET EFECTIVO'
+
+
+def test_coincide_con_los_reemplazos_en_cascada():
+    textos = [a + b for a, b in itertools.product(PATRONES, repeat=2)]
+    azar = random.Random(7)
+    fragmentos = PATRONES + ['A', 'EN', 'Y', 'DE', 'POR', 'MERCADONA', ' ', '3%']
+    textos += [''.join(azar.choices(fragmentos, k=azar.randint(1, 6))) for _ in range(5000)]
+    for texto in textos:
+        assert lector.aplicar_reglas_bancarias(texto) == aplicar_reglas_bancarias_original(texto), texto
+    assert lector.aplicar_reglas_bancarias_lote(textos) == [aplicar_reglas_bancarias_original(t) for t in textos]
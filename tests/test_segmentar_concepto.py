@@ -0,0 +1,35 @@
+import pytest
+
+import lector
+
+pytestmark = pytest.mark.usefixtures('diccionario_temporal')
+
+
+@pytest.mark.parametrize('concepto, esperado', [
+    ('ORDENESPAGOEMITIDASENMONEDALOCAL', 'ORDENES PAGO EMITIDAS EN MONEDA LOCAL'),
+    ('ABONOPORTRANSFERENCIAASUFAVORRECIBIDAENEUROS', 'ABONO POR TRANSFERENCIA A SU FAVOR RECIBIDA EN EUROS'),
+    ('RECIBIDAENEUROS', 'RECIBIDA EN EUROS'),
+    ('ADEUDODOMICILIADO', 'ADEUDO DOMICILIADO'),
+    ('PAGOCONTARJETA', 'PAGO CON TARJETA'),
+    ('RECIBOLUZYGAS', 'RECIBO LUZ Y GAS'),
+    ('COMPRAONLINE', 'COMPRA ONLINE'),
+    ('TRANSFERENCIAS', 'TRANSFERENCIAS'),
+    # Un tramo desconocido se deja entero entre palabras conocidas
+    ('PAGOXYZCOMPRA', 'PAGO XYZ COMPRA'),
+    # Si no empieza por una palabra conocida, no se toca
+    ('BIZUM', 'BIZUM'),
+])
+def test_segmentar_concepto(concepto, esperado):
+    assert lector.segmentar_concepto(concepto) == esperado
+
+
+def test_sin_letras_sueltas_ni_palabras_cortas_fuera_de_la_lista():
+    for concepto in ('ORDENESPAGOEMITIDASENMONEDALOCAL', 'RECIBIDAENEUROS', 'ADEUDODOMICILIADO'):
+        for fragmento in lector.segmentar_concepto(concepto).split():
+            assert len(fragmento) >= lector.LONGITUD_MINIMA_PALABRA or fragmento in lector.PALABRAS_CORTAS
+
+
+def test_participios_de_los_verbos():
+    assert lector.normalizar_entrada_diccionario('emitir') == ['EMITIR', 'EMITIDO', 'EMITIDA']
+    assert lector.normalizar_entrada_diccionario('aplazar1') == ['APLAZAR', 'APLAZADO', 'APLAZADA']
+    assert lector.normalizar_entrada_diccionario('abacalero, ra') == ['ABACALERO', 'ABACALERA']